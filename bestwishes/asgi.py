@@ -3,4 +3,12 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bestwishes.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up. Event streams are answered before Django,
+# everything else goes to it; serve with any ASGI server, e.g.
+# `uvicorn bestwishes.asgi:application`.
+from bestwishes.live import EventStreamApp  # noqa: E402
+from wishlists.live import ROUTES  # noqa: E402
+
+application = EventStreamApp(django_application, ROUTES)
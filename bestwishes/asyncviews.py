@@ -0,0 +1,243 @@
+"""
+Async list and retrieve for DRF viewsets.
+
+DRF views are synchronous, so under ASGI Django runs each of them in a
+worker thread that stays blocked for as long as the database takes. With
+``AsyncReadMixin`` the read actions named in ``async_actions`` are served
+by coroutines instead: the session user is loaded, the conditional-GET
+state aggregated, the page read and the many-to-many ids fetched through
+Django's async ORM (``aget``, ``aaggregate``, ``async for``), while
+permissions, filtering, pagination links and serialization are the very
+same code as the sync path. Other actions, and every write, keep running
+the regular sync view.
+
+Each mixin of the read path provides an async twin of its method (``alist``
+next to ``list``, ``aretrieve`` next to ``retrieve``); this mixin sits last,
+right before the DRF base class, and plays the part of ``ListModelMixin`` /
+``RetrieveModelMixin``. It is on with ``ASYNC_READ_VIEWS = True`` only:
+behind WSGI, as the app is served now, every async view costs an event loop
+per request. ``async_read_views()`` switches it for benchmarks and tests.
+"""
+import importlib
+from contextlib import contextmanager
+from functools import update_wrapper
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+    get_user,
+    get_user_model,
+    load_backend,
+)
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.backends.db import SessionStore as DatabaseSessionStore
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.test import override_settings
+from django.urls import clear_url_caches
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from rest_framework import exceptions
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.relations import ManyRelatedField
+from rest_framework.response import Response
+
+
+URL_MODULES = ("gifts.urls", "wishlists.urls", "users.urls")
+
+
+@contextmanager
+def async_read_views(enabled: bool = True):
+    """Serve the URLs with (or without) the async read views; routers build views at import."""
+    try:
+        with override_settings(ASYNC_READ_VIEWS=enabled):
+            _reload_urls()
+            yield
+    finally:
+        _reload_urls()
+
+
+def _reload_urls() -> None:
+    for name in (*URL_MODULES, settings.ROOT_URLCONF):
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+async def aget_user(request):
+    """
+    ``django.contrib.auth.get_user`` on the async ORM for the common case:
+    database sessions, ``ModelBackend`` or a backend with an ``aget_user``
+    coroutine, and a session hash that verifies. Anything else (other
+    session engines or backends, a session to flush or re-key) is handed to
+    ``get_user`` itself.
+    """
+    session = request.session
+    if type(session) is not DatabaseSessionStore:
+        return await sync_to_async(get_user)(request)
+    if not hasattr(session, "_session_cache"):
+        await _aload_session(session)
+
+    User = get_user_model()
+    try:
+        user_id = User._meta.pk.to_python(session[SESSION_KEY])
+        backend_path = session[BACKEND_SESSION_KEY]
+    except KeyError:
+        return AnonymousUser()
+    if backend_path not in settings.AUTHENTICATION_BACKENDS:
+        return AnonymousUser()
+    backend = load_backend(backend_path)
+    if hasattr(backend, "aget_user"):
+        user = await backend.aget_user(user_id)
+    elif type(backend) is ModelBackend:
+        user = await User._default_manager.filter(pk=user_id).afirst()
+        if user is not None and not backend.user_can_authenticate(user):
+            user = None
+    else:
+        return await sync_to_async(get_user)(request)
+    if user is None:
+        return AnonymousUser()
+    session_hash = session.get(HASH_SESSION_KEY)
+    if session_hash and constant_time_compare(session_hash, user.get_session_auth_hash()):
+        return user
+    return await sync_to_async(get_user)(request)
+
+
+async def _aload_session(session: DatabaseSessionStore) -> None:
+    """What ``SessionStore.load()`` does, through the async ORM."""
+    data = None
+    if session.session_key:
+        data = await (
+            session.model.objects
+            .filter(session_key=session.session_key, expire_date__gt=timezone.now())
+            .values_list("session_data", flat=True)
+            .afirst()
+        )
+        if data is None:
+            session._session_key = None
+    session._session_cache = session.decode(data) if data is not None else {}
+    # As on a sync read: the response then varies on Cookie.
+    session.accessed = True
+
+
+class AsyncReadMixin:
+    async_actions = ("list", "retrieve")
+
+    @classmethod
+    def as_view(cls, actions=None, **initkwargs):
+        view = super().as_view(actions, **initkwargs)
+        if not settings.ASYNC_READ_VIEWS or not set(actions.values()) & set(cls.async_actions):
+            return view
+
+        async def async_view(request, *args, **kwargs):
+            method = request.method.lower()
+            action = actions.get(method) or (actions.get("get") if method == "head" else None)
+            if action not in cls.async_actions:
+                return await sync_to_async(view)(request, *args, **kwargs)
+
+            # The set-up of DRF's sync view function, then the async dispatch.
+            self = cls(**initkwargs)
+            if "get" in actions and "head" not in actions:
+                actions["head"] = actions["get"]
+            self.action_map = actions
+            for handler_method, handler_action in actions.items():
+                setattr(self, handler_method, getattr(self, handler_action))
+            self.request = request
+            self.args = args
+            self.kwargs = kwargs
+            return await self.adispatch(request, *args, **kwargs)
+
+        # Name, ``cls``, ``actions``, ``initkwargs`` and ``csrf_exempt`` of the sync view.
+        return update_wrapper(async_view, view)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """``APIView.dispatch`` awaiting the ``a<action>`` handler."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.ainitial(request, *args, **kwargs)
+            response = await getattr(self, f"a{self.action}")(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def ainitial(self, request, *args, **kwargs):
+        """
+        Authenticate without blocking, then run the regular ``initial()``
+        (permissions, throttles, content negotiation) on the known user.
+        """
+        await self.aperform_authentication(request)
+        self.initial(request, *args, **kwargs)
+
+    async def aperform_authentication(self, request) -> None:
+        """
+        What ``Request._authenticate`` does, in the configured order of the
+        authenticators: the session user is loaded through ``aget_user`` and
+        schemes marked ``offline`` verify their header without I/O, so both
+        run in place. At the first other scheme, which may look users up in
+        its own way, the whole walk is repeated in a worker thread; the
+        schemes before it find nothing again without I/O.
+        """
+        for authenticator in request.authenticators:
+            if isinstance(authenticator, SessionAuthentication):
+                request._request.user = await aget_user(request._request)
+            elif not getattr(authenticator, "offline", False):
+                await sync_to_async(self.perform_authentication)(request)
+                return
+            try:
+                user_auth_tuple = authenticator.authenticate(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([item async for item in queryset], many=True).data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return Response(self.get_serializer(await self.aget_object()).data)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+
+    async def aget_object(self):
+        """
+        ``get_object`` through the async ORM. Many-to-many fields of the
+        serializer are prefetched with the object (through the field's
+        ``prefetch_lookup`` if it reads another relation), so serializing it
+        needs no further query.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        many = [
+            getattr(field, "prefetch_lookup", field.source) for field in self.get_serializer()._readable_fields
+            if isinstance(field, ManyRelatedField)
+        ]
+        if many:
+            queryset = queryset.prefetch_related(*many)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            obj = await queryset.aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
@@ -0,0 +1,44 @@
+import time
+from typing import Callable
+
+from django.core.cache import cache
+
+# Returned by cache.get() when the key is missing; lets ``None`` be cached.
+_MISSING = object()
+
+
+def get_or_build(key: str, build: Callable, *, timeout: int, lock_timeout: int, wait: float, poll: float = 0.05):
+    """
+    Return the cached value of ``key``, building it with ``build()`` on a miss.
+
+    Single flight: of the callers that miss at the same time, only the one
+    that wins the ``cache.add`` lock builds; the others poll the cache for
+    up to ``wait`` seconds for its result. If the builder does not deliver
+    in time (it crashed, or the lock expired), the waiter builds the value
+    itself rather than failing the request. With a shared cache backend
+    (Redis) this holds across processes; with the local-memory backend only
+    within one process.
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    lock_key = f"{key}:lock"
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = build()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+    value = build()
+    cache.set(key, value, timeout)
+    return value
@@ -0,0 +1,93 @@
+import hashlib
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    Answer ``If-None-Match`` / ``If-Modified-Since`` on list and retrieve.
+
+    Before anything is serialized, one aggregate query summarizes the rows
+    the response would contain (the aggregates of
+    ``get_list_state_aggregates`` / ``get_object_state_aggregates``).
+    The ETag is a hash of that summary, and Last-Modified is its newest
+    timestamp. When the client's copy is still current the view answers
+    ``304 Not Modified`` without loading a single row.
+
+    States should include a row count next to the newest ``updated_at`` so
+    that deletions change the ETag too.
+    """
+
+    def get_list_state_aggregates(self) -> dict:
+        return {"updated": Max("updated_at"), "count": Count("pk")}
+
+    def get_object_state_aggregates(self) -> dict:
+        return self.get_list_state_aggregates()
+
+    def list(self, request, *args, **kwargs):
+        state = self.filter_queryset(self.get_queryset()).aggregate(**self.get_list_state_aggregates())
+        return self._conditional(request, state, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            state = self._object_queryset().aggregate(**self.get_object_state_aggregates())
+        except (TypeError, ValueError, ValidationError):
+            state = None
+        if not state or not state.get("count"):
+            # Let the regular path produce the 404.
+            return super().retrieve(request, *args, **kwargs)
+        return self._conditional(request, state, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        state = await self.filter_queryset(self.get_queryset()).aaggregate(**self.get_list_state_aggregates())
+        return await self._aconditional(request, state, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        try:
+            state = await self._object_queryset().aaggregate(**self.get_object_state_aggregates())
+        except (TypeError, ValueError, ValidationError):
+            state = None
+        if not state or not state.get("count"):
+            return await super().aretrieve(request, *args, **kwargs)
+        return await self._aconditional(request, state, super().aretrieve, *args, **kwargs)
+
+    def _object_queryset(self):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        return self.get_queryset().filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def _conditional(self, request, state, render, *args, **kwargs):
+        etag, last_modified = self._validators(request, state)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = render(request, *args, **kwargs)
+        return self._with_validators(response, etag, last_modified)
+
+    async def _aconditional(self, request, state, render, *args, **kwargs):
+        etag, last_modified = self._validators(request, state)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await render(request, *args, **kwargs)
+        return self._with_validators(response, etag, last_modified)
+
+    @staticmethod
+    def _validators(request, state):
+        timestamps = [value for value in state.values() if isinstance(value, datetime)]
+        last_modified = int(max(timestamps).timestamp()) if timestamps else None
+        fingerprint = "|".join(
+            [str(request.user.pk), request.get_full_path()]
+            + [f"{key}={value.isoformat() if isinstance(value, datetime) else value}" for key, value in sorted(state.items())]
+        )
+        return quote_etag(hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()), last_modified
+
+    @staticmethod
+    def _with_validators(response, etag, last_modified):
+        response.headers["ETag"] = etag
+        if last_modified is not None:
+            response.headers["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("Cookie", "Authorization"))
+        return response
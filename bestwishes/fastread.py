@@ -0,0 +1,250 @@
+"""
+Read-only fast path for list endpoints.
+
+``ModelSerializer`` spends most of a list request building model instances
+and walking its field machinery row by row. For plain column fields the
+representation is a pure function of the column value, so it can be
+compiled once per serializer into ``(field name, column, converter)``
+triples and applied straight to ``.values()`` rows. Many-to-many primary
+key lists are loaded for the whole page with one query on the through
+table.
+
+Serializers with any field the compiler does not understand (nested
+serializers, method fields, custom ``to_representation``) are not compiled
+and keep using the regular path.
+"""
+import decimal
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# ``to_representation`` implementations that return a database value as is
+# (CharField's also covers URLField, EmailField, SlugField, ...).
+IDENTITY_REPRESENTATIONS = {
+    serializers.IntegerField.to_representation,
+    serializers.CharField.to_representation,
+    serializers.ChoiceField.to_representation,
+    serializers.BooleanField.to_representation,
+}
+
+_readers: dict = {}
+
+
+@dataclass(frozen=True)
+class ColumnField:
+    name: str
+    column: str
+    convert: Optional[Callable]
+
+
+@dataclass(frozen=True)
+class ManyPrimaryKeyField:
+    name: str
+    through: type
+    source_column: str
+    target_column: str
+
+
+class ValuesReader:
+    """Build serializer-identical representations from ``.values()`` rows."""
+
+    def __init__(self, model, fields: list, many: list):
+        self.model = model
+        self.fields = fields
+        self.many = many
+
+    @property
+    def columns(self) -> list[str]:
+        pk = self.model._meta.pk.attname
+        return list(dict.fromkeys([pk, *(field.column for field in self.fields)]))
+
+    def represent(self, rows) -> list[dict]:
+        data = self._represent_columns(rows)
+        if self.many and rows:
+            ids = self._ids(rows)
+            for field in self.many:
+                self._attach(field, rows, data, self._group(self._many_pairs(field, ids)))
+        return data
+
+    async def arepresent(self, rows) -> list[dict]:
+        """``represent`` with the many-to-many lists loaded through the async ORM."""
+        data = self._represent_columns(rows)
+        if self.many and rows:
+            ids = self._ids(rows)
+            for field in self.many:
+                pairs = [pair async for pair in self._many_pairs(field, ids)]
+                self._attach(field, rows, data, self._group(pairs))
+        return data
+
+    def _represent_columns(self, rows) -> list[dict]:
+        fields = [(field.name, field.column, field.convert) for field in self.fields]
+        data = []
+        for row in rows:
+            item = {}
+            for name, column, convert in fields:
+                value = row[column]
+                item[name] = value if convert is None or value is None else convert(value)
+            data.append(item)
+        return data
+
+    def _ids(self, rows) -> list:
+        pk = self.model._meta.pk.attname
+        return [row[pk] for row in rows]
+
+    def _attach(self, field: ManyPrimaryKeyField, rows, data: list[dict], related: dict) -> None:
+        pk = self.model._meta.pk.attname
+        for row, item in zip(rows, data):
+            item[field.name] = related.get(row[pk], [])
+
+    @staticmethod
+    def _many_pairs(field: ManyPrimaryKeyField, ids: list):
+        return (
+            field.through.objects
+            .filter(**{f"{field.source_column}__in": ids})
+            .order_by(*(field.through._meta.ordering or ["pk"]))
+            .values_list(field.source_column, field.target_column)
+        )
+
+    @staticmethod
+    def _group(pairs) -> dict:
+        related = defaultdict(list)
+        for source_id, target_id in pairs:
+            related[source_id].append(target_id)
+        return related
+
+
+def get_reader(serializer) -> Optional[ValuesReader]:
+    """Return the compiled reader for ``serializer``'s readable fields, or ``None``."""
+    key = (type(serializer), frozenset(serializer.selected_fields or ()) or None)
+    if key not in _readers:
+        _readers[key] = _compile(serializer)
+    return _readers[key]
+
+
+def _compile(serializer) -> Optional[ValuesReader]:
+    if type(serializer).to_representation is not serializers.Serializer.to_representation:
+        return None
+    model = serializer.Meta.model
+    fields, many = [], []
+    for field in serializer._readable_fields:
+        if field.source == "*" or "." in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+
+        if isinstance(field, serializers.ManyRelatedField):
+            child = field.child_relation
+            if (
+                type(child) is not serializers.PrimaryKeyRelatedField
+                or child.pk_field is not None
+                or not model_field.many_to_many
+                or model_field.model is not model
+            ):
+                return None
+            through = model_field.remote_field.through
+            many.append(ManyPrimaryKeyField(
+                name=field.field_name,
+                through=through,
+                source_column=through._meta.get_field(model_field.m2m_field_name()).attname,
+                target_column=through._meta.get_field(model_field.m2m_reverse_field_name()).attname,
+            ))
+            continue
+
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        convert = _converter(field)
+        if convert is False:
+            return None
+        fields.append(ColumnField(name=field.field_name, column=model_field.attname, convert=convert))
+    return ValuesReader(model, fields, many)
+
+
+def _converter(field):
+    """A callable for non-null column values, ``None`` for identity, ``False`` if unsupported."""
+    to_representation = type(field).to_representation
+    if to_representation is serializers.DecimalField.to_representation:
+        return _decimal_converter(field)
+    if to_representation is serializers.BigIntegerField.to_representation:
+        return str if getattr(field, "coerce_to_string", api_settings.COERCE_BIGINT_TO_STRING) else None
+    if to_representation is serializers.PrimaryKeyRelatedField.to_representation:
+        return None if field.pk_field is None else False
+    if to_representation in IDENTITY_REPRESENTATIONS:
+        return None
+    return False
+
+
+def _decimal_converter(field: serializers.DecimalField):
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+        return field.to_representation
+
+    exponent = decimal.Decimal(".1") ** field.decimal_places
+    rounding = field.rounding
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    fallback = field.to_representation
+
+    def convert(value):
+        if value.__class__ is not decimal.Decimal:
+            return fallback(value)
+        return f"{value.quantize(exponent, rounding=rounding, context=context):f}"
+
+    return convert
+
+
+class FastListMixin:
+    """
+    Serve ``list`` from ``.values()`` rows through a compiled ``ValuesReader``.
+
+    Falls back to the regular serializer when the serializer cannot be
+    compiled. Filtering, ordering and pagination are unchanged.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        reader = get_reader(serializer)
+        if reader is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*reader.columns, *self._ordering_columns(queryset))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(reader.represent(page))
+        return Response(reader.represent(list(rows)))
+
+    async def alist(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        reader = get_reader(serializer)
+        if reader is None:
+            return await super().alist(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        rows = queryset.values(*reader.columns, *self._ordering_columns(queryset))
+        page = await self.apaginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(await reader.arepresent(page))
+        return Response(await reader.arepresent([row async for row in rows]))
+
+    def _ordering_columns(self, queryset):
+        """Ordering keys the cursor paginator reads back from each row."""
+        names = [name for name in queryset.query.order_by if isinstance(name, str)]
+        ordering = getattr(self.paginator, "ordering", None) or ()
+        names += [ordering] if isinstance(ordering, str) else list(ordering)
+        columns = []
+        for name in (name.lstrip("-") for name in names):
+            try:
+                field = queryset.model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.concrete and not field.many_to_many:
+                columns.append(name)
+        return columns
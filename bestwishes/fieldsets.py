@@ -0,0 +1,106 @@
+from functools import cached_property
+from typing import Iterable, Optional
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = "fields"
+OMIT_PARAM = "omit"
+
+
+def requested_fields(query_params, available: Iterable[str]) -> Optional[set]:
+    """
+    Resolve ``?fields=a,b`` / ``?omit=c`` against the ``available`` field names.
+
+    Returns ``None`` when neither parameter is given, so callers can keep
+    their default (full) representation.
+    """
+    fields = query_params.get(FIELDS_PARAM)
+    omit = query_params.get(OMIT_PARAM)
+    if fields is None and omit is None:
+        return None
+
+    available = set(available)
+    selected = set(available)
+    errors = {}
+    for param, value in ((FIELDS_PARAM, fields), (OMIT_PARAM, omit)):
+        if value is None:
+            continue
+        names = {name.strip() for name in value.split(",") if name.strip()}
+        unknown = names - available
+        if unknown:
+            errors[param] = [f"Unknown field(s): {', '.join(sorted(unknown))}."]
+            continue
+        selected = selected & names if param == FIELDS_PARAM else selected - names
+    if errors:
+        raise ValidationError(errors)
+    return selected
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Let clients pick the fields of the representation with ``?fields=``
+    (keep only these) and ``?omit=`` (drop these).
+
+    Only the top-level serializer of a response reacts to the query params;
+    nested serializers keep their full representation. Input fields are not
+    affected, so writes validate exactly as before.
+    """
+
+    @cached_property
+    def selected_fields(self) -> Optional[set]:
+        request = self.context.get("request")
+        if request is None or not self._is_response_root():
+            return None
+        return requested_fields(request.query_params, self.fields.keys())
+
+    @property
+    def _readable_fields(self):
+        selected = self.selected_fields
+        for field in super()._readable_fields:
+            if selected is None or field.field_name in selected:
+                yield field
+
+    def _is_response_root(self) -> bool:
+        parent = self.parent
+        return parent is None or (isinstance(parent, ListSerializer) and parent.parent is None)
+
+
+class SparseFieldsetViewMixin:
+    """
+    Load only the columns the sparse fieldset needs on read requests.
+
+    Ordering fields are kept so the cursor paginator does not fall back to
+    one deferred-field query per row.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method not in SAFE_METHODS:
+            return queryset
+
+        serializer = self.get_serializer()
+        selected = serializer.selected_fields
+        if selected is None:
+            return queryset
+
+        model = queryset.model
+        columns = {
+            field.source for name, field in serializer.fields.items()
+            if name in selected and _is_concrete(model, field.source)
+        }
+        columns.update(
+            name.lstrip("-") for name in queryset.query.order_by
+            if isinstance(name, str) and _is_concrete(model, name.lstrip("-"))
+        )
+        return queryset.only(model._meta.pk.name, *columns)
+
+
+def _is_concrete(model, name: str) -> bool:
+    try:
+        field = model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return field.concrete and not field.many_to_many
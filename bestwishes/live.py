@@ -0,0 +1,287 @@
+"""
+Live updates over Server-Sent Events.
+
+Messages are published to named channels through a broker and fanned out
+by a per-process Hub to the open event streams subscribed to the channel.
+Every stream is a coroutine waiting on its own bounded queue, so idle
+connections cost a few objects each rather than a thread. Publishing never
+waits for a client: when a slow client's queue is full it is emptied and
+replaced by a single ``resync`` event telling the client to reload.
+
+The broker is pluggable (``LIVE_BROKER``). LocalBroker delivers within the
+process only; RedisBroker (requires the ``redis`` package) relays through
+Redis pub/sub so writes made by any process reach the streams held by every
+ASGI worker.
+
+Streams are served by EventStreamApp, a plain ASGI app in front of Django
+(see bestwishes/asgi.py): Django 4.2 does not notice that a client went
+away while it streams a response, so an idle stream would never be freed.
+Every ``LIVE_REAUTHORIZE_INTERVAL`` seconds a stream runs its authorizer
+again and ends once it no longer grants the same channel (a changed
+password, a revoked share link, a deleted wishlist); the client's
+reconnect then gets the 403 or 404.
+"""
+import asyncio
+import io
+import json
+import logging
+import re
+import threading
+from typing import Callable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RESYNC = {"event": "resync", "data": {}}
+
+
+class Subscription:
+    """One stream's view of a channel: a bounded queue filled by the Hub."""
+
+    def __init__(self, hub: "Hub", channel: str, max_size: int):
+        self.hub = hub
+        self.channel = channel
+        self.queue = asyncio.Queue(max_size)
+        self.dropped = 0
+
+    def put(self, message: dict) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # The client does not keep up: what it missed is replaced by
+            # one event telling it to reload.
+            self.dropped += self.queue.qsize() + 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class Hub:
+    """Fan-out of channel messages to the subscriptions of this process, bound to one event loop."""
+
+    def __init__(self, broker, queue_size: int):
+        self.broker = broker
+        self.queue_size = queue_size
+        self.channels: dict[str, set[Subscription]] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listener = None
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Open a subscription; must be called from the event loop serving the streams."""
+        loop = asyncio.get_running_loop()
+        if loop is not self.loop:
+            if self._listener is not None and not self.loop.is_closed():
+                # The previous loop's listener and its broker connection would run on unused.
+                self.loop.call_soon_threadsafe(self._listener.cancel)
+            self.loop, self._listener = loop, loop.create_task(self.broker.listen(self))
+        subscription = Subscription(self, channel, self.queue_size)
+        self.channels.setdefault(channel, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self.channels.get(subscription.channel)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.channels[subscription.channel]
+
+    def dispatch(self, channel: str, message: dict) -> None:
+        """Deliver a message to the channel's subscriptions; runs in the event loop."""
+        for subscription in list(self.channels.get(channel, ())):
+            subscription.put(message)
+
+    def dispatch_threadsafe(self, channel: str, message: dict) -> None:
+        """Deliver from any thread, e.g. a sync view or a ``sync_to_async`` worker."""
+        if self.loop is None or self.loop.is_closed():
+            return  # no stream was ever opened in this process
+        self.loop.call_soon_threadsafe(self.dispatch, channel, message)
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self.channels.values())
+
+
+class LocalBroker:
+    """Delivers to the streams of this process only: development, tests, single-process servers."""
+
+    def publish(self, channel: str, message: dict) -> None:
+        get_hub().dispatch_threadsafe(channel, message)
+
+    async def listen(self, hub: Hub) -> None:
+        return None
+
+
+class RedisBroker:
+    """Relays messages through Redis pub/sub to the Hub of every process."""
+
+    prefix = "live:"
+
+    def __init__(self, url: Optional[str] = None):
+        self.url = url or settings.REDIS_URL
+        self._client = None
+
+    def publish(self, channel: str, message: dict) -> None:
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+    async def listen(self, hub: Hub) -> None:
+        import redis.asyncio as aioredis
+
+        while True:
+            client = aioredis.from_url(self.url)
+            try:
+                async with client.pubsub() as pubsub:
+                    await pubsub.psubscribe(self.prefix + "*")
+                    async for item in pubsub.listen():
+                        if item["type"] == "pmessage":
+                            channel = item["channel"].decode()[len(self.prefix):]
+                            hub.dispatch(channel, json.loads(item["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Live update listener lost Redis; reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await client.aclose()
+
+
+_hub: Optional[Hub] = None
+_hub_lock = threading.Lock()
+
+
+def get_hub() -> Hub:
+    global _hub
+    with _hub_lock:
+        if _hub is None:
+            _hub = Hub(import_string(settings.LIVE_BROKER)(), settings.LIVE_QUEUE_SIZE)
+        return _hub
+
+
+def publish(channel: str, message: dict) -> None:
+    """Send ``message`` (``{"event": ..., "data": ...}``) to the streams of ``channel``."""
+    try:
+        get_hub().broker.publish(channel, message)
+    except Exception:
+        # Live updates are best effort; the write that triggered them stands.
+        logger.exception("Could not publish a live update on %s", channel)
+
+
+def format_event(message: dict) -> bytes:
+    return f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n".encode()
+
+
+class EventStreamApp:
+    """
+    ASGI app serving ``text/event-stream`` responses on the given routes and
+    passing every other request to ``app``.
+
+    ``routes`` pairs path regexes with sync authorizers called as
+    ``authorize(request, **match.groupdict())``; they return the channel to
+    stream, ``None`` for a 404, or raise PermissionDenied for a 403.
+    """
+
+    def __init__(self, app, routes: list[tuple[str, Callable]]):
+        self.app = app
+        self.routes = [(re.compile(pattern), authorize) for pattern, authorize in routes]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            for pattern, authorize in self.routes:
+                match = pattern.match(scope["path"])
+                if match:
+                    return await self.stream(scope, receive, send, authorize, match.groupdict())
+        return await self.app(scope, receive, send)
+
+    async def stream(self, scope, receive, send, authorize, kwargs):
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            channel = await sync_to_async(_authorize)(authorize, request, kwargs)
+        except PermissionDenied:
+            return await _reject(send, 403, "You do not have permission to perform this action.")
+        if channel is None:
+            return await _reject(send, 404, "Not found.")
+
+        subscription = get_hub().subscribe(channel)
+        disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+        next_message = None
+        loop = asyncio.get_running_loop()
+        reauthorize_at = loop.time() + settings.LIVE_REAUTHORIZE_INTERVAL
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/event-stream"),
+                    (b"cache-control", b"no-cache"),
+                    (b"x-accel-buffering", b"no"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": b"retry: 5000\n\n", "more_body": True})
+            while True:
+                if next_message is None:
+                    next_message = asyncio.ensure_future(subscription.get())
+                done, _ = await asyncio.wait(
+                    {next_message, disconnected},
+                    timeout=min(settings.LIVE_HEARTBEAT_INTERVAL, max(reauthorize_at - loop.time(), 0)),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if disconnected in done:
+                    break
+                if loop.time() >= reauthorize_at:
+                    if await _reauthorize(scope, authorize, kwargs) != channel:
+                        await send({"type": "http.response.body", "body": b"", "more_body": False})
+                        break
+                    reauthorize_at = loop.time() + settings.LIVE_REAUTHORIZE_INTERVAL
+                if next_message in done:
+                    body, next_message = format_event(next_message.result()), None
+                else:
+                    # Keeps proxies from closing an idle connection.
+                    body = b": keep-alive\n\n"
+                await send({"type": "http.response.body", "body": body, "more_body": True})
+        finally:
+            subscription.close()
+            for task in (next_message, disconnected):
+                if task is not None:
+                    task.cancel()
+
+
+def _authorize(authorize, request, kwargs) -> Optional[str]:
+    # Outside Django's request handler, so connections are tidied here.
+    close_old_connections()
+    try:
+        return authorize(request, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def _reauthorize(scope, authorize, kwargs) -> Optional[str]:
+    """The channel the authorizer grants now, on a fresh request; ``None`` if it refuses."""
+    try:
+        return await sync_to_async(_authorize)(authorize, ASGIRequest(scope, io.BytesIO()), kwargs)
+    except PermissionDenied:
+        return None
+
+
+async def _reject(send, status: int, detail: str) -> None:
+    await send({"type": "http.response.start", "status": status, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": json.dumps({"detail": detail}).encode()})
+
+
+async def _wait_for_disconnect(receive) -> None:
+    while (await receive())["type"] != "http.disconnect":
+        pass
@@ -0,0 +1,149 @@
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Keyset pagination with an opaque cursor.
+
+    Every page is a ``WHERE (key, id) > (%s, %s) ORDER BY key, id LIMIT n``
+    index range scan and no ``COUNT(*)`` is ever issued. The ordering key
+    defaults to the primary key and may be switched by an ``OrderingFilter``
+    on the view; the primary key is always appended as a tie-breaker so
+    positions stay unique even for non-unique keys such as ``cost``.
+    NULL keys sort as if they were greater than any value.
+    """
+    ordering = "id"
+    tiebreaker = "id"
+    page_size = settings.API_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = settings.API_MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        lead = ordering[0]
+        if lead.lstrip("-") == self.tiebreaker:
+            return (lead,)
+        descending = lead.startswith("-")
+        return (lead, f"-{self.tiebreaker}" if descending else self.tiebreaker)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self._page_queryset(queryset, request, view)
+        if page is None:
+            return None
+        return self._set_page(list(page))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` reading the page through the async ORM."""
+        page = self._page_queryset(queryset, request, view)
+        if page is None:
+            return None
+        return self._set_page([row async for row in page])
+
+    def _page_queryset(self, queryset, request, view):
+        """The (lazy) page plus one row to look ahead, or ``None`` when not paginating."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor.reverse if self.cursor else False
+        current_position = self._load_position(self.cursor.position) if self.cursor else None
+
+        queryset = queryset.order_by(*self._order_expressions(reverse))
+        if current_position is not None:
+            # Walk backwards when exactly one of (cursor, ordering) is reversed.
+            backwards = reverse != self.ordering[0].startswith("-")
+            queryset = queryset.filter(self._seek(current_position, backwards))
+        return queryset[:self.page_size + 1]
+
+    def _set_page(self, results):
+        reverse = self.cursor.reverse if self.cursor else False
+        self.page = results[:self.page_size]
+
+        has_following_position = len(results) > len(self.page)
+        following_position = (
+            self._get_position_from_instance(results[-1], self.ordering)
+            if has_following_position else None
+        )
+        current_position = self.cursor.position if self.cursor else None
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _order_expressions(self, reverse):
+        expressions = []
+        for field in self.ordering:
+            descending = field.startswith("-") != reverse
+            expression = F(field.lstrip("-"))
+            expressions.append(
+                expression.desc(nulls_first=True) if descending else expression.asc(nulls_last=True)
+            )
+        return expressions
+
+    def _seek(self, position, backwards):
+        """Build the filter selecting rows strictly after (or before) ``position``."""
+        fields = [field.lstrip("-") for field in self.ordering]
+        if len(fields) == 1:
+            lookup = "lt" if backwards else "gt"
+            return Q(**{f"{fields[0]}__{lookup}": position[0]})
+
+        key, tiebreaker = fields
+        value, pk = position
+        if backwards:
+            if value is None:
+                return Q(**{f"{key}__isnull": False}) | Q(**{f"{key}__isnull": True, f"{tiebreaker}__lt": pk})
+            return Q(**{f"{key}__lt": value}) | Q(**{key: value, f"{tiebreaker}__lt": pk})
+        if value is None:
+            return Q(**{f"{key}__isnull": True, f"{tiebreaker}__gt": pk})
+        return (
+            Q(**{f"{key}__gt": value})
+            | Q(**{f"{key}__isnull": True})
+            | Q(**{key: value, f"{tiebreaker}__gt": pk})
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip("-")
+            value = instance[name] if isinstance(instance, dict) else getattr(instance, name)
+            position.append(str(value) if isinstance(value, Decimal) else value)
+        return json.dumps(position)
+
+    def _load_position(self, encoded):
+        if encoded is None:
+            return None
+        try:
+            position = json.loads(encoded)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+
+class RankCursorPagination(KeysetCursorPagination):
+    """Keyset pagination for search results annotated with a ``rank``, best match first."""
+    ordering = "-rank"
@@ -81,4 +81,117 @@ STATIC_URL = '/static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-AUTH_USER_MODEL = "users.User"
\ No newline at end of file
+AUTH_USER_MODEL = "users.User"
+
+
+API_PAGE_SIZE = int(os.environ.get("API_PAGE_SIZE", "50"))
+API_MAX_PAGE_SIZE = int(os.environ.get("API_MAX_PAGE_SIZE", "500"))
+
+GIFTS_BULK_MAX_ITEMS = int(os.environ.get("GIFTS_BULK_MAX_ITEMS", "1000"))
+GIFTS_BULK_BATCH_SIZE = 500
+
+GIFT_ENRICHMENT_ENABLED = os.environ.get("GIFT_ENRICHMENT_ENABLED", "0") == "1"
+GIFT_ENRICHMENT_WORKERS = 8
+GIFT_ENRICHMENT_MAX_PENDING = 1000
+GIFT_ENRICHMENT_PER_HOST = 2
+GIFT_ENRICHMENT_CACHE_TTL = 60 * 60
+GIFT_ENRICHMENT_BATCH_SIZE = 100
+GIFT_ENRICHMENT_FLUSH_INTERVAL = 2.0
+GIFT_ENRICHMENT_TIMEOUT = 5.0
+GIFT_ENRICHMENT_ALLOW_PRIVATE_HOSTS = False
+
+EXPORT_CHUNK_SIZE = 2000
+IMPORT_BATCH_SIZE = 2000
+IMPORT_MAX_REPORTED_ERRORS = 1000
+
+# Wishlists whose ordering keys grow past this length get rebalanced by
+# `manage.py rebalance_positions`.
+WISHLIST_POSITION_MAX_LENGTH = 32
+WISHLIST_POSITION_BATCH_SIZE = 1000
+
+# Wishlists recomputed per statement by `manage.py reconcile_wishlist_summaries`.
+WISHLIST_SUMMARY_BATCH_SIZE = 1000
+
+# Shared cache: Redis when REDIS_URL is set (requires the `redis` package),
+# process-local memory otherwise.
+REDIS_URL = os.environ.get("REDIS_URL")
+CACHES = {
+    "default": (
+        {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL}
+        if REDIS_URL
+        else {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+    ),
+}
+
+# Login throttling (users/throttling.py), as (limit, window in seconds):
+# attempts per client IP, failed attempts per email, and attempts in total,
+# which bounds the CPU spent on password hashing. A key over its limit is
+# locked out for LOGIN_LOCKOUT_BASE seconds, doubled on each repeat within
+# LOGIN_LOCKOUT_MEMORY, up to LOGIN_LOCKOUT_MAX.
+LOGIN_THROTTLE_IP = (20, 300)
+LOGIN_THROTTLE_EMAIL = (5, 900)
+LOGIN_THROTTLE_GLOBAL = (300, 60)
+LOGIN_LOCKOUT_BASE = 60
+LOGIN_LOCKOUT_MAX = 3600
+LOGIN_LOCKOUT_MEMORY = 86400
+
+# Background deletion (`manage.py run_deletion_jobs`): rows deleted per
+# batch, pause between batches, how long a running job may go without
+# progress before another worker resumes it, and the idle poll interval.
+DELETION_BATCH_SIZE = 500
+DELETION_BATCH_PAUSE = 0.05
+DELETION_JOB_STALE_AFTER = 5 * 60
+DELETION_JOB_POLL_INTERVAL = 5.0
+
+# Public share links: rendered responses are cached per wishlist version.
+SHARE_CACHE_TTL = 5 * 60
+SHARE_CACHE_LOCK_TIMEOUT = 10
+SHARE_CACHE_WAIT = 2.0
+
+# Serve list/retrieve of gifts and wishlists and users/me as async views
+# (bestwishes/asyncviews.py). Off while the app is served through WSGI
+# (runserver), where async views only add an event loop per request; turn
+# on together with an ASGI server (bestwishes.asgi).
+ASYNC_READ_VIEWS = os.environ.get("ASYNC_READ_VIEWS", "0") == "1"
+
+# Live updates over Server-Sent Events (bestwishes/live.py): the broker
+# relaying published events to every ASGI worker, the events buffered per
+# slow client before it is told to resync, the keep-alive interval, and how
+# often an open stream checks that its client may still read it.
+LIVE_BROKER = "bestwishes.live.RedisBroker" if REDIS_URL else "bestwishes.live.LocalBroker"
+LIVE_QUEUE_SIZE = 100
+LIVE_HEARTBEAT_INTERVAL = 15.0
+LIVE_REAUTHORIZE_INTERVAL = 60.0
+
+# Delta sync (`/sync/`): changes returned per response by default and at most.
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+
+# Session users are resolved by users.backends.CachedModelBackend: an LRU
+# of USER_CACHE_SIZE users per process, each kept USER_CACHE_TTL seconds,
+# in front of the shared cache (USER_CACHE_SHARED_TTL seconds). ModelBackend
+# only keeps sessions logged in before it valid; it can go once those have
+# expired (SESSION_COOKIE_AGE).
+AUTHENTICATION_BACKENDS = [
+    "users.backends.CachedModelBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+USER_CACHE_SIZE = 10000
+USER_CACHE_TTL = 10
+USER_CACHE_SHARED_TTL = 300
+
+# Signed API tokens (users/tokens.py): lifetimes in seconds of the access
+# token, verified without a database read, and of the refresh token.
+ACCESS_TOKEN_LIFETIME = 300
+REFRESH_TOKEN_LIFETIME = 14 * 24 * 3600
+
+REST_FRAMEWORK = {
+    # Session first: unauthenticated requests keep getting 403, not 401.
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "rest_framework.authentication.SessionAuthentication",
+        "users.authentication.SignedTokenAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+    "DEFAULT_PAGINATION_CLASS": "bestwishes.pagination.KeysetCursorPagination",
+    "PAGE_SIZE": API_PAGE_SIZE,
+}
@@ -1,9 +1,12 @@
 from django.urls import path, include
 from django.contrib import admin
 
+from wishlists.views import SyncView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path('users/', include('users.urls')),
     path('wishlists/', include('wishlists.urls')),
     path('gifts/', include('gifts.urls')),
+    path('sync/', SyncView.as_view(), name='sync'),
 ]
@@ -0,0 +1,14 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save
+
+
+class GiftsConfig(AppConfig):
+    name = "gifts"
+
+    def ready(self):
+        from .models import Gift
+        from .search import ensure_sqlite_search_index
+        from .signals import send_on_save
+
+        post_migrate.connect(ensure_sqlite_search_index, sender=self)
+        post_save.connect(send_on_save, sender=Gift)
@@ -0,0 +1,461 @@
+# gifts/enrichment.py
+"""
+Background enrichment of gifts from the page behind ``Gift.link``.
+
+The pipeline fetches product pages on a bounded thread pool, extracts the
+OpenGraph title, price and image, and writes them back to gifts in batches.
+Only empty gift fields are filled, so values entered by the user always win;
+a gift created from a link alone gets its name from the page title.
+
+- at most ``max_pending`` links are queued; ``submit`` blocks or drops beyond that
+- at most ``per_host`` concurrent requests go to the same host
+- results are cached by normalized URL for ``cache_ttl`` seconds, so a popular
+  product is fetched once no matter how many users add it
+
+Pages are fetched with an opener that checks the host of every request,
+redirects included, and connects to the address it checked, so neither a
+redirect nor a DNS answer changing between check and connect reaches an
+internal address.
+"""
+import http.client
+import ipaddress
+import logging
+import re
+import socket
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from html.parser import HTMLParser
+from typing import Callable, Optional
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+from urllib.request import (
+    HTTPErrorProcessor,
+    HTTPHandler,
+    HTTPRedirectHandler,
+    HTTPSHandler,
+    OpenerDirector,
+    Request,
+)
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from gifts.models import Gift
+from gifts.signals import gifts_changed
+
+logger = logging.getLogger(__name__)
+
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "yclid", "mc_")
+DEFAULT_PORTS = {"http": 80, "https": 443}
+MAX_PAGE_BYTES = 512 * 1024
+MAX_IMAGE_URL_LENGTH = Gift._meta.get_field("image").max_length
+
+
+@dataclass(frozen=True)
+class LinkMetadata:
+    title: Optional[str] = None
+    price: Optional[Decimal] = None
+    image: Optional[str] = None
+
+    def __bool__(self) -> bool:
+        return any((self.title, self.price is not None, self.image))
+
+
+class EnrichmentError(Exception):
+    pass
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of ``url`` used as the cache key."""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set."""
+
+    def __init__(self, *, ttl: float, max_entries: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key) -> bool:
+        sentinel = object()
+        return self.get(key, sentinel) is not sentinel
+
+
+class _OpenGraphParser(HTMLParser):
+    PRICE_PROPERTIES = ("product:price:amount", "og:price:amount")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.meta: dict[str, str] = {}
+        self.title_parts: list[str] = []
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or attrs.get("itemprop") or "").lower()
+            content = attrs.get("content")
+            if key and content and key not in self.meta:
+                self.meta[key] = content.strip()
+        elif tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+
+
+def parse_price(value: Optional[str]) -> Optional[Decimal]:
+    if not value:
+        return None
+    number = re.sub(r"[^\d.,]", "", value)
+    if "," in number and "." in number:
+        # Whichever separator comes last is the decimal point.
+        thousands = "," if number.rfind(".") > number.rfind(",") else "."
+        number = number.replace(thousands, "")
+    number = number.replace(",", ".")
+    try:
+        price = Decimal(number).quantize(Decimal("0.01"))
+    except InvalidOperation:
+        return None
+    return price if 0 <= price < Decimal("1e8") else None
+
+
+def extract_metadata(html: str, base_url: str) -> LinkMetadata:
+    parser = _OpenGraphParser()
+    parser.feed(html)
+    meta = parser.meta
+
+    title = meta.get("og:title") or "".join(parser.title_parts).strip() or None
+    price = next((parse_price(meta[key]) for key in parser.PRICE_PROPERTIES if key in meta), None)
+    image = meta.get("og:image") or meta.get("og:image:url")
+    if image:
+        image = urljoin(base_url, image)
+        if urlsplit(image).scheme not in ("http", "https") or len(image) > MAX_IMAGE_URL_LENGTH:
+            image = None
+    return LinkMetadata(title=title[:255] if title else None, price=price, image=image)
+
+
+def _ensure_public_host(host: str) -> Optional[str]:
+    """
+    Refuse to fetch internal addresses unless explicitly allowed; returns the
+    checked address to connect to, or None when private hosts are allowed.
+    """
+    if settings.GIFT_ENRICHMENT_ALLOW_PRIVATE_HOSTS:
+        return None
+    try:
+        addresses = [info[4][0] for info in socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)]
+    except socket.gaierror as exc:
+        raise EnrichmentError(f"Cannot resolve {host}: {exc}")
+    for address in addresses:
+        ip = ipaddress.ip_address(address.split("%", 1)[0])
+        if not ip.is_global:
+            raise EnrichmentError(f"Refusing to fetch non-public address {address}")
+    return addresses[0]
+
+
+def _checked_connection(connection_class, req):
+    """
+    ``connection_class`` for ``req``, connecting to the address its host was
+    checked at; the host itself is kept for headers, SNI and certificates.
+    """
+    address = _ensure_public_host(urlsplit(req.full_url).hostname)
+    if address is None:
+        return connection_class
+
+    def connect(host, **kwargs):
+        connection = connection_class(host, **kwargs)
+        # HTTPConnection.connect() opens its socket through this attribute.
+        connection._create_connection = lambda target, *args: socket.create_connection((address, target[1]), *args)
+        return connection
+
+    return connect
+
+
+class _PublicHTTPHandler(HTTPHandler):
+    def http_open(self, req):
+        return self.do_open(_checked_connection(http.client.HTTPConnection, req), req)
+
+
+class _PublicHTTPSHandler(HTTPSHandler):
+    def https_open(self, req):
+        return self.do_open(_checked_connection(http.client.HTTPSConnection, req), req, context=self._context)
+
+
+class _RedirectHandler(HTTPRedirectHandler):
+    max_redirections = 5
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        # The target's host is checked by the handlers above when it is opened.
+        if urlsplit(newurl).scheme not in ("http", "https"):
+            raise EnrichmentError(f"Refusing to follow redirect to {newurl!r}")
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def _build_opener() -> OpenerDirector:
+    # Deliberately without ProxyHandler and the non-HTTP handlers of build_opener().
+    opener = OpenerDirector()
+    for handler in (_PublicHTTPHandler(), _PublicHTTPSHandler(), _RedirectHandler(), HTTPErrorProcessor()):
+        opener.add_handler(handler)
+    return opener
+
+
+_opener = _build_opener()
+
+
+def fetch_page(url: str, *, timeout: float = None) -> str:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise EnrichmentError(f"Unsupported URL {url!r}")
+
+    request = Request(url, headers={"User-Agent": "BestWishesBot/1.0", "Accept": "text/html"})
+    with _opener.open(request, timeout=timeout or settings.GIFT_ENRICHMENT_TIMEOUT) as response:
+        content_type = response.headers.get_content_type()
+        if content_type not in ("text/html", "application/xhtml+xml"):
+            raise EnrichmentError(f"Unexpected content type {content_type}")
+        charset = response.headers.get_content_charset() or "utf-8"
+        return response.read(MAX_PAGE_BYTES).decode(charset, errors="replace")
+
+
+class EnrichmentPipeline:
+    """
+    Fetch link metadata on a bounded thread pool and write it back in batches.
+
+    With ``flush_interval`` set, a writer thread flushes buffered results
+    every ``flush_interval`` seconds or as soon as ``batch_size`` results are
+    waiting; without it results are written by explicit ``flush()`` calls.
+    """
+
+    def __init__(
+        self,
+        *,
+        fetch: Callable[[str], str] = fetch_page,
+        max_workers: int = 8,
+        max_pending: int = 1000,
+        per_host: int = 2,
+        cache: Optional[TTLCache] = None,
+        cache_ttl: float = 3600,
+        batch_size: int = 100,
+        flush_interval: Optional[float] = None,
+    ):
+        self._fetch = fetch
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="gift-enrichment")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._per_host = per_host
+        self._host_slots: dict[str, threading.BoundedSemaphore] = {}
+        self._url_locks: defaultdict[str, threading.Lock] = defaultdict(threading.Lock)
+        self._lock = threading.Lock()
+        self.cache = cache or TTLCache(ttl=cache_ttl)
+        self.batch_size = batch_size
+
+        self._futures: set = set()
+        self._results: list[tuple[int, LinkMetadata]] = []
+        self._results_ready = threading.Condition(self._lock)
+        self._closed = False
+        self.stats: defaultdict[str, int] = defaultdict(int)
+
+        self._writer = None
+        if flush_interval:
+            self._writer = threading.Thread(
+                target=self._write_loop, args=(flush_interval,), name="gift-enrichment-writer", daemon=True
+            )
+            self._writer.start()
+
+    def submit(self, gift_id: int, url: str, *, block: bool = True) -> bool:
+        """Queue a gift for enrichment; returns False when the queue is full and ``block`` is False."""
+        if not self._slots.acquire(blocking=block):
+            self._count("dropped")
+            return False
+        future = self._executor.submit(self._process, gift_id, url)
+        with self._lock:
+            self._futures.add(future)
+        future.add_done_callback(self._done)
+        return True
+
+    def _done(self, future) -> None:
+        with self._lock:
+            self._futures.discard(future)
+        self._slots.release()
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _host_slot(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self._per_host)
+            return slot
+
+    def _process(self, gift_id: int, url: str) -> None:
+        key = normalize_url(url)
+        with self._lock:
+            url_lock = self._url_locks[key]
+        # Concurrent requests for the same URL wait for the first fetch
+        # instead of hitting the site again.
+        with url_lock:
+            metadata = self.cache.get(key)
+            if metadata is None:
+                metadata = self._fetch_metadata(key)
+                self.cache.set(key, metadata)
+            else:
+                self._count("cache_hits")
+        with self._lock:
+            self._url_locks.pop(key, None)
+            if metadata:
+                self._results.append((gift_id, metadata))
+                if len(self._results) >= self.batch_size:
+                    self._results_ready.notify()
+
+    def _fetch_metadata(self, url: str) -> LinkMetadata:
+        self._count("fetches")
+        host = urlsplit(url).netloc
+        try:
+            with self._host_slot(host):
+                html = self._fetch(url)
+            return extract_metadata(html, url)
+        except Exception as exc:
+            # Failures are cached as empty metadata so a broken link is not
+            # retried on every submission.
+            self._count("errors")
+            logger.info("Gift link enrichment failed for %s: %s", url, exc)
+            return LinkMetadata()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        """Wait until every submitted link has been fetched."""
+        with self._lock:
+            futures = set(self._futures)
+        wait(futures, timeout=timeout)
+
+    def flush(self) -> int:
+        """Write buffered results to the database; returns the number of gifts updated."""
+        with self._lock:
+            results, self._results = self._results, []
+        if not results:
+            return 0
+        return write_back(dict(results))
+
+    def _write_loop(self, interval: float) -> None:
+        while True:
+            with self._lock:
+                if not self._closed and len(self._results) < self.batch_size:
+                    self._results_ready.wait(interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing gift enrichment results failed")
+            finally:
+                close_old_connections()
+            if closed:
+                return
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._closed = True
+            self._results_ready.notify()
+        if self._writer is not None:
+            self._writer.join()
+        else:
+            self.flush()
+
+
+@transaction.atomic
+def write_back(results: dict[int, LinkMetadata]) -> int:
+    """Fill empty ``name``, ``cost`` and ``image`` fields of gifts from fetched metadata."""
+    gifts = Gift.objects.select_for_update().filter(id__in=list(results)).only("id", "name", "cost", "image")
+    now = timezone.now()
+    changed, fields, previous = [], set(), {}
+    for gift in gifts:
+        metadata = results[gift.id]
+        updates = {}
+        if not gift.name and metadata.title:
+            updates["name"] = metadata.title
+        if gift.cost is None and metadata.price is not None:
+            updates["cost"] = metadata.price
+        if not gift.image and metadata.image:
+            updates["image"] = metadata.image
+        if updates:
+            previous[gift.id] = {field: (getattr(gift, field), value) for field, value in updates.items()}
+            updates["updated_at"] = now
+            for field, value in updates.items():
+                setattr(gift, field, value)
+            fields.update(updates)
+            changed.append(gift)
+    if changed:
+        Gift.objects.bulk_update(changed, sorted(fields))
+        gifts_changed.send(sender=Gift, gift_ids=[gift.id for gift in changed], changes=previous)
+    return len(changed)
+
+
+_pipeline = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> EnrichmentPipeline:
+    """Process-wide pipeline configured from settings."""
+    global _pipeline
+    with _pipeline_lock:
+        if _pipeline is None:
+            _pipeline = EnrichmentPipeline(
+                max_workers=settings.GIFT_ENRICHMENT_WORKERS,
+                max_pending=settings.GIFT_ENRICHMENT_MAX_PENDING,
+                per_host=settings.GIFT_ENRICHMENT_PER_HOST,
+                cache_ttl=settings.GIFT_ENRICHMENT_CACHE_TTL,
+                batch_size=settings.GIFT_ENRICHMENT_BATCH_SIZE,
+                flush_interval=settings.GIFT_ENRICHMENT_FLUSH_INTERVAL,
+            )
+        return _pipeline
+
+
+def enqueue_gift(gift: Gift) -> None:
+    """Schedule enrichment of ``gift`` once the current transaction commits."""
+    if not settings.GIFT_ENRICHMENT_ENABLED or not gift.link:
+        return
+    if gift.name and gift.cost is not None and gift.image:
+        return
+    gift_id, link = gift.id, gift.link
+    transaction.on_commit(lambda: get_pipeline().submit(gift_id, link, block=False))
@@ -0,0 +1,52 @@
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import Gift
+
+
+class GiftFilterBackend(BaseFilterBackend):
+    """
+    Filter gifts by query parameters.
+
+    Supported parameters:
+    - ``status``: exact status match
+    - ``cost__gte`` / ``cost__lte``: inclusive cost range
+    - ``name``: case-sensitive name prefix
+
+    Each filter is combined with the ``user`` condition of the view queryset
+    and is served by one of the ``(user, ...)`` composite indexes on ``Gift``.
+    """
+
+    # Bounds are parsed like a cost: NaN, infinities and values the column
+    # cannot hold are rejected rather than reaching the database.
+    cost_field = serializers.DecimalField(
+        max_digits=Gift._meta.get_field("cost").max_digits,
+        decimal_places=Gift._meta.get_field("cost").decimal_places,
+    )
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+
+        status = params.get("status")
+        if status is not None:
+            if status not in Gift.Status.values:
+                raise ValidationError({"status": f'"{status}" is not a valid choice.'})
+            queryset = queryset.filter(status=status)
+
+        for lookup in ("cost__gte", "cost__lte"):
+            value = params.get(lookup)
+            if value is not None:
+                queryset = queryset.filter(**{lookup: self._parse_cost(lookup, value)})
+
+        name = params.get("name")
+        if name:
+            queryset = queryset.filter(name__startswith=name)
+
+        return queryset
+
+    def _parse_cost(self, param, value):
+        try:
+            return self.cost_field.to_internal_value(value)
+        except ValidationError as error:
+            raise ValidationError({param: error.detail})
@@ -0,0 +1,47 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from gifts.enrichment import EnrichmentPipeline
+from gifts.models import Gift
+
+
+class Command(BaseCommand):
+    help = "Fill missing cost and image of gifts from the OpenGraph metadata of their links."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", help="Only enrich gifts of this user.")
+        parser.add_argument("--workers", type=int, default=settings.GIFT_ENRICHMENT_WORKERS)
+        parser.add_argument("--per-host", type=int, default=settings.GIFT_ENRICHMENT_PER_HOST)
+
+    def handle(self, *args, email, workers, per_host, **options):
+        gifts = (
+            Gift.objects.exclude(link__isnull=True)
+            .exclude(link="")
+            .filter(Q(cost__isnull=True) | Q(image__isnull=True) | Q(image=""))
+            .order_by("id")
+        )
+        if email:
+            gifts = gifts.filter(user__email=email)
+
+        pipeline = EnrichmentPipeline(
+            max_workers=workers,
+            per_host=per_host,
+            cache_ttl=settings.GIFT_ENRICHMENT_CACHE_TTL,
+            batch_size=settings.GIFT_ENRICHMENT_BATCH_SIZE,
+        )
+        submitted = updated = 0
+        for gift_id, link in gifts.values_list("id", "link").iterator(chunk_size=2000):
+            pipeline.submit(gift_id, link)
+            submitted += 1
+            if submitted % pipeline.batch_size == 0:
+                updated += pipeline.flush()
+        pipeline.join()
+        updated += pipeline.flush()
+        pipeline.close()
+
+        stats = pipeline.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Submitted {submitted} gifts, updated {updated} "
+            f"({stats['fetches']} fetches, {stats['cache_hits']} cache hits, {stats['errors']} errors)."
+        ))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:51
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gifts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gift',
+            name='cost',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.AlterField(
+            model_name='gift',
+            name='image',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='gift',
+            name='link',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='gift',
+            index=models.Index(fields=['user', 'status'], name='gift_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gift',
+            index=models.Index(fields=['user', 'cost'], name='gift_user_cost_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gift',
+            index=models.Index(fields=['user', 'name'], name='gift_user_name_prefix_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
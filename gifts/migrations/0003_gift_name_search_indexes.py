@@ -0,0 +1,34 @@
+from django.db import migrations
+
+# PostgreSQL only: the expressions must match the ones used in gifts/search.py.
+# The SQLite FTS5 fallback is maintained by gifts.search.ensure_sqlite_search_index.
+CREATE_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS gift_name_search_idx ON gifts_gift "
+    "USING gin (to_tsvector('simple'::regconfig, name))",
+    "CREATE INDEX IF NOT EXISTS gift_name_trgm_idx ON gifts_gift USING gin (name gin_trgm_ops)",
+]
+DROP_SQL = [
+    "DROP INDEX IF EXISTS gift_name_trgm_idx",
+    "DROP INDEX IF EXISTS gift_name_search_idx",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gifts', '0002_gift_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(CREATE_SQL), _run(DROP_SQL)),
+    ]
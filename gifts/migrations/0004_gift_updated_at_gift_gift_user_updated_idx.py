@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gifts', '0003_gift_name_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gift',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='gift',
+            index=models.Index(fields=['user', 'updated_at'], name='gift_user_updated_idx'),
+        ),
+    ]
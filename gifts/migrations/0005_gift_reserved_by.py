@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('gifts', '0004_gift_updated_at_gift_gift_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gift',
+            name='reserved_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reserved_gifts', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -13,12 +13,42 @@ class Gift(models.Model):
     cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, validators=[MinValueValidator(0)])
     image = models.URLField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=Status.choices, default=Status.AVAILABLE)
+    updated_at = models.DateTimeField(auto_now=True)
 
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
         related_name="gifts",
     )
+    # Who holds the reservation; only they and the owner may release it.
+    reserved_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="reserved_gifts",
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "status"], name="gift_user_status_idx"),
+            models.Index(fields=["user", "cost"], name="gift_user_cost_idx"),
+            # varchar_pattern_ops lets PostgreSQL serve ``name LIKE 'prefix%'``
+            # from the index regardless of the database collation.
+            models.Index(
+                fields=["user", "name"],
+                name="gift_user_name_prefix_idx",
+                opclasses=["int8_ops", "varchar_pattern_ops"],
+            ),
+            models.Index(fields=["user", "updated_at"], name="gift_user_updated_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the row held when loaded, so a later save() can tell what it changed.
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def __str__(self) -> str:
         return self.name
@@ -0,0 +1,109 @@
+# gifts/search.py
+"""
+Ranked, typo-tolerant search over gift names.
+
+PostgreSQL combines full-text matching (``to_tsvector``/``websearch_to_tsquery``
+over a GIN expression index) with ``pg_trgm`` similarity (a GIN trigram index)
+so misspelled words still match: ``%`` compares the query with the whole name
+(``pg_trgm.similarity_threshold``, 0.3 by default), ``<%`` with its best-matching
+words (``pg_trgm.word_similarity_threshold``, 0.6), which finds a misspelled
+word inside a long name. Matches are ranked by length-normalized ``ts_rank``
+plus whole-name ``similarity``, so of two names containing the query the one
+closer to it comes first. SQLite, used for local runs and tests,
+falls back to an FTS5 table with the trigram tokenizer, queried with the
+trigrams of the search terms and ranked by ``bm25``.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+# Text search configuration of the GIN expression index; queries must use the
+# same expression for the planner to pick the index up.
+SEARCH_CONFIG = "simple"
+FTS_TABLE = "gifts_gift_fts"
+
+_PG_MATCH = (
+    "(to_tsvector('simple'::regconfig, \"gifts_gift\".\"name\") @@ websearch_to_tsquery('simple'::regconfig, %s)"
+    " OR %s %% \"gifts_gift\".\"name\" OR %s <%% \"gifts_gift\".\"name\")"
+)
+# ts_rank normalization 1 divides by 1 + log(document length). Both functions
+# return real; the sum is cast to double precision, which round-trips through
+# the pagination cursor exactly.
+_PG_RANK = (
+    "(ts_rank(to_tsvector('simple'::regconfig, \"gifts_gift\".\"name\"), websearch_to_tsquery('simple'::regconfig, %s), 1)"
+    " + similarity(%s, \"gifts_gift\".\"name\"))::double precision"
+)
+_SQLITE_MATCH = f'"gifts_gift"."id" IN (SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+_SQLITE_RANK = (
+    f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE}'
+    f' WHERE {FTS_TABLE} MATCH %s AND rowid = "gifts_gift"."id")'
+)
+
+
+def _trigram_query(query: str) -> str:
+    """FTS5 query matching any trigram of the search terms."""
+    trigrams = {
+        term[i:i + 3]
+        for term in re.findall(r"\w+", query.lower())
+        for i in range(len(term) - 2)
+    }
+    return " OR ".join(f'"{trigram}"' for trigram in sorted(trigrams))
+
+
+def search_gifts(queryset: QuerySet, query: str) -> QuerySet:
+    """Filter ``queryset`` to gifts matching ``query`` and annotate them with ``rank``."""
+    if connection.vendor == "postgresql":
+        return queryset.filter(
+            RawSQL(_PG_MATCH, [query, query, query], output_field=BooleanField())
+        ).annotate(rank=RawSQL(_PG_RANK, [query, query], output_field=FloatField()))
+
+    if connection.vendor == "sqlite":
+        match = _trigram_query(query)
+        if match:
+            return queryset.filter(
+                RawSQL(_SQLITE_MATCH, [match], output_field=BooleanField())
+            ).annotate(rank=RawSQL(_SQLITE_RANK, [match], output_field=FloatField()))
+
+    return queryset.filter(name__icontains=query.strip()).annotate(rank=Value(0.0, output_field=FloatField()))
+
+
+def ensure_sqlite_search_index(using="default", **kwargs) -> None:
+    """
+    Create the SQLite FTS5 table and its sync triggers if they are missing.
+
+    Runs after every ``migrate``: SQLite drops triggers whenever Django
+    rebuilds ``gifts_gift`` to alter it, so they are re-created here and the
+    index is rebuilt from the table.
+    """
+    from django.db import connections
+
+    conn = connections[using]
+    if conn.vendor != "sqlite":
+        return
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+            [f"{FTS_TABLE}_%"],
+        )
+        if cursor.fetchone()[0] == 3:
+            return
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"name, content='gifts_gift', content_rowid='id', tokenize='trigram')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON gifts_gift BEGIN "
+            f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON gifts_gift BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF name ON gifts_gift BEGIN "
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name) VALUES ('delete', old.id, old.name); "
+            f"INSERT INTO {FTS_TABLE}(rowid, name) VALUES (new.id, new.name); END"
+        )
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
@@ -1,8 +1,14 @@
+from collections.abc import Mapping
+
 from rest_framework import serializers
+from rest_framework.exceptions import ErrorDetail
+from bestwishes.fieldsets import SparseFieldsetSerializerMixin
 from .models import Gift
 
+NAME_REQUIRED = "This field is required unless a link is given."
+
 
-class GiftSerializer(serializers.ModelSerializer):
+class GiftSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Gift
         fields = [
@@ -14,4 +20,27 @@ class GiftSerializer(serializers.ModelSerializer):
             "status",
             "user",
         ]
-        read_only_fields = ["id", "user"]
\ No newline at end of file
+        read_only_fields = ["id", "user"]
+        # A gift added by its link alone is named from the page title, see gifts.enrichment.
+        extra_kwargs = {"name": {"required": False, "allow_blank": True}}
+
+    def to_internal_value(self, data):
+        # Reported alongside the field errors, as a missing required field would be.
+        unnamed = self._lacks_name_and_link(data)
+        try:
+            attrs = super().to_internal_value(data)
+        except serializers.ValidationError as exc:
+            if unnamed and isinstance(exc.detail, dict):
+                exc.detail.setdefault("name", [ErrorDetail(NAME_REQUIRED, code="required")])
+            raise
+        if unnamed:
+            raise serializers.ValidationError({"name": [NAME_REQUIRED]}, code="required")
+        return attrs
+
+    def _lacks_name_and_link(self, data) -> bool:
+        if not isinstance(data, Mapping) or (self.partial and self.instance is None):
+            # Bulk updates are checked against the stored gift by bulk_update_gifts.
+            return False
+        name = data.get("name", getattr(self.instance, "name", ""))
+        link = data.get("link", getattr(self.instance, "link", ""))
+        return not name and not link
@@ -0,0 +1,137 @@
+# gifts/services.py
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import APIException, NotFound, PermissionDenied, ValidationError
+
+from gifts.models import Gift
+from gifts.serializers import NAME_REQUIRED
+from gifts.signals import gifts_changed
+
+
+class GiftStatusConflict(APIException):
+    status_code = 409
+    default_detail = "Gift status has already changed."
+    default_code = "conflict"
+
+
+def _transition_status(
+    *, gift_id: int, from_status: str, to_status: str, visible: Q, allowed: Q, reserved_by
+) -> None:
+    """
+    Move a gift from ``from_status`` to ``to_status`` with one conditional UPDATE.
+
+    The status check happens inside the UPDATE itself, so of many concurrent
+    callers exactly one wins and no row lock outlives the statement. Only
+    gifts matching ``allowed`` are moved. The gift is only read again when
+    the transition failed, to tell a gift outside ``visible`` (404) from one
+    the user may not move (403) and from a status conflict (409).
+    """
+    # One transaction with the listeners (wishlist versions and summaries):
+    # a failing listener must not leave the move committed behind an error.
+    with transaction.atomic():
+        updated = Gift.objects.filter(allowed, id=gift_id, status=from_status).update(
+            status=to_status, reserved_by=reserved_by, updated_at=timezone.now()
+        )
+        if updated:
+            gifts_changed.send(sender=Gift, gift_ids=[gift_id], changes={gift_id: {"status": (from_status, to_status)}})
+    if updated:
+        return
+    gift = Gift.objects.filter(visible, id=gift_id).values("status").first()
+    if gift is None:
+        raise NotFound("Gift not found.")
+    if gift["status"] != from_status:
+        raise GiftStatusConflict(f"Gift is {gift['status']}, expected {from_status}.")
+    raise PermissionDenied("Only the gift's owner or the guest who reserved it can release it.")
+
+
+def reserve_gift(*, user, gift_id: int, scope: Optional[Q] = None) -> None:
+    """
+    Reserve one of the user's own gifts or, with ``scope``, one of the gifts
+    it selects, e.g. those of a wishlist whose share link the user presented
+    (see wishlists.services.reserve_shared_gift).
+    """
+    scope = Q(user=user) if scope is None else scope
+    _transition_status(
+        gift_id=gift_id,
+        from_status=Gift.Status.AVAILABLE,
+        to_status=Gift.Status.RESERVED,
+        visible=scope,
+        allowed=scope,
+        reserved_by=user,
+    )
+
+
+def unreserve_gift(*, user, gift_id: int, scope: Optional[Q] = None) -> None:
+    """
+    Release a reservation of one of the user's own gifts or, with ``scope``,
+    one the user holds on a gift it selects.
+    """
+    if scope is None:
+        visible = allowed = Q(user=user)
+    else:
+        visible, allowed = scope, scope & Q(reserved_by=user)
+    _transition_status(
+        gift_id=gift_id,
+        from_status=Gift.Status.RESERVED,
+        to_status=Gift.Status.AVAILABLE,
+        visible=visible,
+        allowed=allowed,
+        reserved_by=None,
+    )
+
+
+@transaction.atomic
+def bulk_create_gifts(*, user, items: list[dict]) -> list[Gift]:
+    """Insert validated gifts for ``user`` with a single multi-row INSERT."""
+    gifts = [Gift(user=user, **item) for item in items]
+    return Gift.objects.bulk_create(gifts, batch_size=settings.GIFTS_BULK_BATCH_SIZE)
+
+
+@transaction.atomic
+def bulk_update_gifts(*, user, changes: list[tuple[int, dict]]) -> list[Gift]:
+    """
+    Apply validated partial updates, given as ``(gift_id, data)`` pairs.
+
+    Ownership is checked for the whole batch with one ``SELECT ... WHERE id IN``
+    and the rows are written back with one ``bulk_update``.
+    """
+    ids = [gift_id for gift_id, _ in changes]
+    gifts = Gift.objects.filter(user=user).in_bulk(ids)
+    missing = [gift_id for gift_id in ids if gift_id not in gifts]
+    if missing:
+        raise NotFound({"not_found": missing})
+
+    # bulk_update() bypasses auto_now, so the timestamp is set explicitly.
+    now = timezone.now()
+    fields = {"updated_at"}
+    previous = {}
+    for gift_id, data in changes:
+        gift = gifts[gift_id]
+        for field, value in data.items():
+            before = getattr(gift, field)
+            if before != value:
+                previous.setdefault(gift_id, {})[field] = (before, value)
+            setattr(gift, field, value)
+        if not gift.name and not gift.link:
+            raise ValidationError({"name": [NAME_REQUIRED], "id": gift_id})
+        gift.updated_at = now
+        fields.update(data)
+
+    updated = [gifts[gift_id] for gift_id in ids]
+    if len(fields) > 1:
+        Gift.objects.bulk_update(updated, sorted(fields), batch_size=settings.GIFTS_BULK_BATCH_SIZE)
+        gifts_changed.send(sender=Gift, gift_ids=ids, changes=previous)
+    return updated
+
+
+@transaction.atomic
+def bulk_delete_gifts(*, user, gift_ids: Iterable[int]) -> int:
+    """Delete the user's gifts among ``gift_ids``; ids of other users are ignored."""
+    gifts = Gift.objects.filter(user=user, id__in=list(gift_ids))
+    gifts_changed.send(sender=Gift, gift_ids=gifts.values_list("id", flat=True), deleted=True)
+    _, deleted = gifts.delete()
+    return deleted.get(Gift._meta.label, 0)
@@ -0,0 +1,32 @@
+from django.dispatch import Signal
+
+# Sent with ``gift_ids`` (a list or a values_list queryset) whenever gifts
+# change, and before gifts are deleted (their wishlist memberships are gone
+# afterwards). ``Model.save()`` of an
+# existing gift sends it through ``send_on_save``; write paths that bypass
+# it (queryset updates, bulk operations, deletions) send it explicitly,
+# inside their transaction.
+#
+# Optional arguments: ``changes`` maps gift ids to ``{field: (before, after)}``
+# for the fields known to have changed; ``deleted`` is True when the gifts
+# are about to be deleted.
+gifts_changed = Signal()
+
+# Fields whose previous values ``send_on_save`` reports in ``changes``.
+TRACKED_FIELDS = ("cost", "status")
+
+
+def send_on_save(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    loaded = getattr(instance, "_loaded_values", {})
+    saved = [field for field in TRACKED_FIELDS if update_fields is None or field in update_fields]
+    changes = {
+        field: (loaded[field], getattr(instance, field))
+        for field in saved
+        if field in loaded and loaded[field] != getattr(instance, field)
+    }
+    # The saved values are the ones the next save() compares against.
+    instance._loaded_values = {**loaded, **{field: getattr(instance, field) for field in saved}}
+    if not created:
+        gifts_changed.send(sender=sender, gift_ids=[instance.pk], changes={instance.pk: changes})
@@ -1,9 +1,23 @@
 """ Integration tests for gift. Create"""
-from django.urls import reverse
+import asyncio
+from django.urls import resolve, reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.test import APIRequestFactory, APITestCase, force_authenticate
 from users.models import User
+from users.tokens import issue_tokens
 from gifts.models import Gift
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from gifts.enrichment import EnrichmentError, EnrichmentPipeline, fetch_page
+from gifts.views import GiftViewSet
+from wishlists.models import Wishlist, WishlistGift
+from bestwishes.asyncviews import async_read_views
+from bestwishes.pagination import KeysetCursorPagination
+from decimal import Decimal
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
 class GiftIntegrationTests(APITestCase):
     def setUp(self):
@@ -61,8 +75,8 @@ class GiftIntegrationTests(APITestCase):
         response = self.client.get(self.gifts_url, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK) #получили ответ и правильный статус
-        self.assertEqual(len(response.data), 1) #проверяем что у юзера1 1 подарок, и не создалось лишних
-        self.assertEqual(response.data[0]['name'], 'User1 Gift') #проверяем что что подарок правильный создался, и название подарка совпадает
+        self.assertEqual(len(response.data['results']), 1) #проверяем что у юзера1 1 подарок, и не создалось лишних
+        self.assertEqual(response.data['results'][0]['name'], 'User1 Gift') #проверяем что что подарок правильный создался, и название подарка совпадает
 
     def test_list_no_cross_user_gifts(self):
         """ Test that user2 cannot see gifts of user1. """
@@ -78,7 +92,40 @@ class GiftIntegrationTests(APITestCase):
         response = self.client.get(self.gifts_url, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK) #проверяем ответ и статус
-        self.assertEqual(len(response.data), 0)  # проверяем что юзеру2 недоступны подарки юзера1
+        self.assertEqual(len(response.data['results']), 0)  # проверяем что юзеру2 недоступны подарки юзера1
+
+    def test_list_is_cursor_paginated(self):
+        """ Test that the gift list is split into pages linked by opaque cursors. """
+        for i in range(5):
+            Gift.objects.create(name=f'Gift {i}', link='http://example.com', image='http://example.com/image.jpg', user=self.user1)
+
+        self.client.force_authenticate(user=self.user1)
+        response = self.client.get(self.gifts_url, {'page_size': 2}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertEqual([g['name'] for g in response.data['results']], ['Gift 0', 'Gift 1'])
+        self.assertIsNone(response.data['previous'])
+
+        names = []
+        next_url = response.data['next']
+        while next_url:
+            response = self.client.get(next_url, format='json')
+            names += [g['name'] for g in response.data['results']]
+            next_url = response.data['next']
+        self.assertEqual(names, ['Gift 2', 'Gift 3', 'Gift 4'])
+
+    def test_list_page_size_is_capped(self):
+        """ Test that a client cannot request more than the maximum page size. """
+        for i in range(3):
+            Gift.objects.create(name=f'Gift {i}', link='http://example.com', image='http://example.com/image.jpg', user=self.user1)
+
+        self.client.force_authenticate(user=self.user1)
+        with patch.object(KeysetCursorPagination, 'max_page_size', 2):
+            response = self.client.get(self.gifts_url, {'page_size': 1000}, format='json')
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
 
     def test_unauthenticated_access(self):
         """ Test that unauthenticated users cannot access gift endpoints. """
@@ -149,4 +196,618 @@ class GiftIntegrationTests(APITestCase):
         response = self.client.delete(gift_delete_url, format='json')
 
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT) #проверяем ответ и статус
-        self.assertFalse(Gift.objects.filter(id=gift.id).exists()) #проверяем что подарок удален из базы
\ No newline at end of file
+        self.assertFalse(Gift.objects.filter(id=gift.id).exists()) #проверяем что подарок удален из базы
+
+class GiftFilteringIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            email='example2@test.ru',
+            password='strongpassword123'
+        )
+        self.gifts_url = reverse("gift-list")
+
+        self.book = Gift.objects.create(name='Book', cost='15.00', user=self.user)
+        self.bike = Gift.objects.create(name='Bike', cost='300.00', status=Gift.Status.RESERVED, user=self.user)
+        self.board = Gift.objects.create(name='Board game', cost='40.00', user=self.user)
+        self.card = Gift.objects.create(name='Card', cost=None, user=self.user)
+        Gift.objects.create(name='Bottle', cost='20.00', user=self.other_user)
+
+        self.client.force_authenticate(user=self.user)
+
+    def _names(self, params):
+        response = self.client.get(self.gifts_url, params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [g['name'] for g in response.data['results']]
+
+    def test_filter_by_status(self):
+        self.assertEqual(self._names({'status': 'reserved'}), ['Bike'])
+
+    def test_filter_by_invalid_status(self):
+        response = self.client.get(self.gifts_url, {'status': 'lost'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data)
+
+    def test_filter_by_cost_range(self):
+        self.assertEqual(self._names({'cost__gte': '15', 'cost__lte': '40'}), ['Book', 'Board game'])
+
+    def test_filter_by_invalid_cost(self):
+        response = self.client.get(self.gifts_url, {'cost__gte': 'cheap'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('cost__gte', response.data)
+
+    def test_filter_by_non_finite_or_oversized_cost(self):
+        # NaN, бесконечность и числа, не помещающиеся в колонку, — 400, а не 500.
+        for value in ('NaN', 'Infinity', '-inf', '1e999', '123456789012', '1.001'):
+            response = self.client.get(self.gifts_url, {'cost__lte': value}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, value)
+            self.assertIn('cost__lte', response.data)
+
+    def test_filter_by_name_prefix(self):
+        self.assertEqual(self._names({'name': 'B'}), ['Book', 'Bike', 'Board game'])
+        self.assertEqual(self._names({'name': 'Bo'}), ['Book', 'Board game'])
+
+    def test_order_by_cost_puts_missing_cost_last(self):
+        self.assertEqual(self._names({'ordering': 'cost'}), ['Book', 'Board game', 'Bike', 'Card'])
+        self.assertEqual(self._names({'ordering': '-cost'}), ['Card', 'Bike', 'Board game', 'Book'])
+
+    def test_order_by_cost_pages_forward_and_back(self):
+        """ Test that cursors stay stable when paging over a non-unique, nullable key. """
+        Gift.objects.create(name='Pen', cost='15.00', user=self.user)
+
+        response = self.client.get(self.gifts_url, {'ordering': 'cost', 'page_size': 2}, format='json')
+        pages = [[g['name'] for g in response.data['results']]]
+        while response.data['next']:
+            response = self.client.get(response.data['next'], format='json')
+            pages.append([g['name'] for g in response.data['results']])
+        self.assertEqual(pages, [['Book', 'Pen'], ['Board game', 'Bike'], ['Card']])
+
+        response = self.client.get(response.data['previous'], format='json')
+        self.assertEqual([g['name'] for g in response.data['results']], ['Board game', 'Bike'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.gifts_url, {'cursor': 'not-a-cursor'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GiftBulkIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            email='example2@test.ru',
+            password='strongpassword123'
+        )
+        self.bulk_url = reverse("gift-bulk")
+        self.client.force_authenticate(user=self.user)
+
+    def test_bulk_create(self):
+        data = [
+            {'name': 'Book', 'cost': '15.00'},
+            {'name': 'Bike', 'link': 'http://example.com/bike'},
+        ]
+        response = self.client.post(self.bulk_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+        self.assertEqual([g['name'] for g in response.data], ['Book', 'Bike'])
+        self.assertEqual(Gift.objects.filter(user=self.user).count(), 2)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        data = [
+            {'name': 'Book', 'cost': '15.00'},
+            {'cost': '-1'},
+        ]
+        response = self.client.post(self.bulk_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('name', response.data[1])
+        self.assertIn('cost', response.data[1])
+        self.assertFalse(Gift.objects.exists())
+
+    def test_bulk_create_rejects_non_list(self):
+        response = self.client.post(self.bulk_url, {'name': 'Book'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update(self):
+        book = Gift.objects.create(name='Book', cost='15.00', user=self.user)
+        bike = Gift.objects.create(name='Bike', cost='300.00', user=self.user)
+        data = [
+            {'id': bike.id, 'status': Gift.Status.RESERVED},
+            {'id': book.id, 'name': 'Old book', 'cost': '5.00'},
+        ]
+        with self.assertNumQueries(6):  # savepoint, one SELECT, one UPDATE, wishlist versions and summaries, release
+            response = self.client.patch(self.bulk_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual([g['id'] for g in response.data], [bike.id, book.id])
+        book.refresh_from_db()
+        bike.refresh_from_db()
+        self.assertEqual((book.name, str(book.cost)), ('Old book', '5.00'))
+        self.assertEqual(bike.status, Gift.Status.RESERVED)
+
+    def test_bulk_update_keeps_name_or_link(self):
+        linked = Gift.objects.create(name='Lamp', link='http://example.com/lamp', user=self.user)
+        plain = Gift.objects.create(name='Book', user=self.user)
+
+        response = self.client.patch(self.bulk_url, [{'id': linked.id, 'name': ''}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+
+        response = self.client.patch(self.bulk_url, [{'id': plain.id, 'name': ''}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('name', response.data)
+        plain.refresh_from_db()
+        self.assertEqual(plain.name, 'Book')
+
+    def test_bulk_update_rejects_foreign_gifts(self):
+        own = Gift.objects.create(name='Book', user=self.user)
+        foreign = Gift.objects.create(name='Bike', user=self.other_user)
+        data = [
+            {'id': own.id, 'name': 'Mine'},
+            {'id': foreign.id, 'name': 'Stolen'},
+        ]
+        response = self.client.patch(self.bulk_url, data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['not_found'], [str(foreign.id)])
+        own.refresh_from_db()
+        self.assertEqual(own.name, 'Book')
+
+    def test_bulk_update_requires_ids(self):
+        response = self.client.patch(self.bulk_url, [{'name': 'Book'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user) for i in range(3)]
+        foreign = Gift.objects.create(name='Bike', user=self.other_user)
+        ids = [gifts[0].id, gifts[1].id, foreign.id]
+
+        response = self.client.delete(self.bulk_url, {'ids': ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(list(Gift.objects.filter(user=self.user)), [gifts[2]])
+        self.assertTrue(Gift.objects.filter(id=foreign.id).exists())
+
+
+class _ProductPageHandler(BaseHTTPRequestHandler):
+    hits = {}
+    redirect_to = None
+
+    def do_GET(self):
+        type(self).hits[self.path] = type(self).hits.get(self.path, 0) + 1
+        if self.path.startswith('/missing'):
+            self.send_error(404)
+            return
+        if self.path.startswith('/redirect'):
+            self.send_response(302)
+            self.send_header('Location', self.redirect_to)
+            self.end_headers()
+            return
+        body = (
+            '<html><head>'
+            '<meta property="og:title" content="Stub product">'
+            '<meta property="product:price:amount" content="42.50">'
+            '<meta property="og:image" content="/stub.jpg">'
+            '</head></html>'
+        ).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(GIFT_ENRICHMENT_ALLOW_PRIVATE_HOSTS=True)
+class GiftEnrichmentIntegrationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), _ProductPageHandler)
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        _ProductPageHandler.hits.clear()
+        self.user = User.objects.create_user(email='example@test.ru', password='strongpassword123')
+        self.pipeline = EnrichmentPipeline(max_workers=4, per_host=2)
+        self.addCleanup(self.pipeline.close)
+
+    def test_enriches_empty_fields_and_fetches_each_url_once(self):
+        gifts = [
+            Gift.objects.create(name='Pasted link', link=f'{self.base_url}/product?utm_source=mail&n={i % 2}', user=self.user)
+            for i in range(6)
+        ]
+        priced = Gift.objects.create(name='Mine', cost='10.00', link=f'{self.base_url}/product?n=0', user=self.user)
+
+        for gift in gifts + [priced]:
+            self.pipeline.submit(gift.id, gift.link)
+        self.pipeline.join()
+        updated = self.pipeline.flush()
+
+        self.assertEqual(updated, 7)
+        self.assertEqual(_ProductPageHandler.hits, {'/product?n=0': 1, '/product?n=1': 1})
+        gift = Gift.objects.get(id=gifts[0].id)
+        self.assertEqual(gift.name, 'Pasted link')
+        self.assertEqual(str(gift.cost), '42.50')
+        self.assertEqual(gift.image, f'{self.base_url}/stub.jpg')
+        priced.refresh_from_db()
+        self.assertEqual(str(priced.cost), '10.00')
+
+    def test_names_gift_added_by_link_alone(self):
+        gift = Gift.objects.create(name='', link=f'{self.base_url}/product', user=self.user)
+
+        self.pipeline.submit(gift.id, gift.link)
+        self.pipeline.join()
+
+        self.assertEqual(self.pipeline.flush(), 1)
+        gift.refresh_from_db()
+        self.assertEqual(gift.name, 'Stub product')
+
+    def test_failed_fetch_leaves_gift_untouched(self):
+        gift = Gift.objects.create(name='Broken', link=f'{self.base_url}/missing', user=self.user)
+
+        self.pipeline.submit(gift.id, gift.link)
+        self.pipeline.join()
+
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(self.pipeline.stats['errors'], 1)
+        gift.refresh_from_db()
+        self.assertIsNone(gift.cost)
+
+    @override_settings(GIFT_ENRICHMENT_ALLOW_PRIVATE_HOSTS=False)
+    def test_private_hosts_are_refused(self):
+        gift = Gift.objects.create(name='Internal', link=f'{self.base_url}/product', user=self.user)
+
+        self.pipeline.submit(gift.id, gift.link)
+        self.pipeline.join()
+
+        self.assertEqual(self.pipeline.flush(), 0)
+        self.assertEqual(_ProductPageHandler.hits, {})
+
+    def test_redirect_to_private_host_is_refused(self):
+        # 127.0.0.1 проходит как «публичный» адрес, localhost — нет.
+        def ensure_public_host(host):
+            if host != '127.0.0.1':
+                raise EnrichmentError(f'Refusing to fetch non-public address {host}')
+            return host
+
+        _ProductPageHandler.redirect_to = f'http://localhost:{self.server.server_port}/product'
+        with patch('gifts.enrichment._ensure_public_host', side_effect=ensure_public_host):
+            with self.assertRaises(EnrichmentError):
+                fetch_page(f'{self.base_url}/redirect')
+
+        self.assertEqual(_ProductPageHandler.hits, {'/redirect': 1})
+
+    def test_connects_to_the_checked_address(self):
+        # Имя не резолвится: соединение идёт на адрес, проверенный при открытии.
+        with patch('gifts.enrichment._ensure_public_host', return_value='127.0.0.1'):
+            html = fetch_page(f'http://shop.invalid:{self.server.server_port}/product')
+
+        self.assertIn('Stub product', html)
+        self.assertEqual(_ProductPageHandler.hits, {'/product': 1})
+
+
+class GiftSearchIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            email='example2@test.ru',
+            password='strongpassword123'
+        )
+        self.search_url = reverse("gift-search")
+
+        Gift.objects.create(name='Teddy bear', user=self.user)
+        Gift.objects.create(name='Big teddy bear with a bow', user=self.user)
+        Gift.objects.create(name='Board game', user=self.user)
+        Gift.objects.create(name='Teddy bear', user=self.other_user)
+
+        self.client.force_authenticate(user=self.user)
+
+    def _names(self, params):
+        response = self.client.get(self.search_url, params, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [g['name'] for g in response.data['results']]
+
+    def test_search_ranks_best_match_first(self):
+        self.assertEqual(self._names({'q': 'teddy bear'}), ['Teddy bear', 'Big teddy bear with a bow'])
+
+    def test_search_tolerates_typos(self):
+        self.assertIn('Teddy bear', self._names({'q': 'tedy baer'}))
+
+    def test_search_sees_renamed_gifts(self):
+        gift = Gift.objects.get(user=self.user, name='Board game')
+        gift.name = 'Puzzle'
+        gift.save()
+
+        self.assertEqual(self._names({'q': 'puzzle'}), ['Puzzle'])
+        self.assertEqual(self._names({'q': 'board'}), [])
+
+    def test_search_is_cursor_paginated(self):
+        response = self.client.get(self.search_url, {'q': 'teddy bear', 'page_size': 1}, format='json')
+        self.assertEqual([g['name'] for g in response.data['results']], ['Teddy bear'])
+
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual([g['name'] for g in response.data['results']], ['Big teddy bear with a bow'])
+        self.assertIsNone(response.data['next'])
+
+    def test_search_combines_with_filters(self):
+        Gift.objects.filter(name='Big teddy bear with a bow').update(status=Gift.Status.RESERVED)
+        self.assertEqual(self._names({'q': 'teddy', 'status': 'reserved'}), ['Big teddy bear with a bow'])
+
+    def test_search_requires_query(self):
+        response = self.client.get(self.search_url, {'q': ' '}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GiftReservationIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            email='example2@test.ru',
+            password='strongpassword123'
+        )
+        self.gift = Gift.objects.create(name='Bike', user=self.user)
+        self.client.force_authenticate(user=self.user)
+
+    def test_reserve_is_a_single_conditional_update(self):
+        url = reverse("gift-reserve", args=[self.gift.id])
+        # The conditional UPDATE, then the versions and summaries of the wishlists holding the gift,
+        # in one transaction (a savepoint and its release inside the test's own transaction).
+        with self.assertNumQueries(5):
+            response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.gift.id, 'status': Gift.Status.RESERVED})
+        self.gift.refresh_from_db()
+        self.assertEqual(self.gift.status, Gift.Status.RESERVED)
+
+    def test_reserve_twice_conflicts(self):
+        url = reverse("gift-reserve", args=[self.gift.id])
+        self.client.post(url)
+        response = self.client.post(url)
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_unreserve(self):
+        self.client.post(reverse("gift-reserve", args=[self.gift.id]))
+        response = self.client.post(reverse("gift-unreserve", args=[self.gift.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.gift.refresh_from_db()
+        self.assertEqual(self.gift.status, Gift.Status.AVAILABLE)
+
+    def test_unreserve_available_gift_conflicts(self):
+        response = self.client.post(reverse("gift-unreserve", args=[self.gift.id]))
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_reserve_foreign_gift_not_found(self):
+        foreign = Gift.objects.create(name='Car', user=self.other_user)
+        response = self.client.post(reverse("gift-reserve", args=[foreign.id]))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.status, Gift.Status.AVAILABLE)
+
+    def test_shared_gift_is_not_found_without_the_token(self):
+        # Гости бронируют только по ссылке (wishlists), не по id подарка.
+        wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        WishlistGift.objects.create(wishlist=wishlist, gift=self.gift)
+        self.client.post(reverse("wishlist-share", args=[wishlist.id]))
+
+        self.client.force_authenticate(user=self.other_user)
+        self.assertEqual(self.client.post(reverse("gift-reserve", args=[self.gift.id])).status_code, status.HTTP_404_NOT_FOUND)
+        self.gift.refresh_from_db()
+        self.assertEqual(self.gift.status, Gift.Status.AVAILABLE)
+
+
+class GiftConditionalGetIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.gift = Gift.objects.create(name='Bike', user=self.user)
+        self.gifts_url = reverse("gift-list")
+        self.detail_url = reverse("gift-detail", args=[self.gift.id])
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_list_poll_is_not_modified(self):
+        response = self.client.get(self.gifts_url)
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.gifts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_update_create_and_delete(self):
+        etags = {self.client.get(self.gifts_url)['ETag']}
+
+        self.client.patch(self.detail_url, {'name': 'Red bike'}, format='json')
+        etags.add(self.client.get(self.gifts_url)['ETag'])
+
+        other = Gift.objects.create(name='Book', user=self.user)
+        etag = self.client.get(self.gifts_url)['ETag']
+        etags.add(etag)
+        self.assertEqual(len(etags), 3)
+
+        other.delete()
+        response = self.client.get(self.gifts_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_list_etag_depends_on_query(self):
+        etag = self.client.get(self.gifts_url)['ETag']
+        response = self.client.get(self.gifts_url, {'status': 'reserved'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_reservation_changes_detail_etag(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        self.client.post(reverse("gift-reserve", args=[self.gift.id]))
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Gift.Status.RESERVED)
+
+    def test_detail_if_modified_since(self):
+        last_modified = self.client.get(self.detail_url)['Last-Modified']
+        response = self.client.get(self.detail_url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_of_missing_gift_is_not_found(self):
+        response = self.client.get(reverse("gift-detail", args=[self.gift.id + 100]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GiftSparseFieldsetIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        for cost in ('30.00', '10.00', '20.00'):
+            Gift.objects.create(name=f'Gift {cost}', cost=cost, link='https://example.com', user=self.user)
+        self.gifts_url = reverse("gift-list")
+        self.client.force_authenticate(user=self.user)
+
+    def test_fields_limits_representation_and_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.gifts_url, {'fields': 'id,name,status'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'status'})
+        page_sql = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"link"', page_sql)
+        self.assertNotIn('"image"', page_sql)
+
+    def test_omit_drops_fields(self):
+        response = self.client.get(self.gifts_url, {'omit': 'link,image,user'})
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'cost', 'status'})
+
+    def test_ordering_field_is_loaded_with_sparse_fields(self):
+        # Ключ курсора читается из уже загруженных строк, без дозапросов.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.gifts_url, {'fields': 'name', 'ordering': 'cost', 'page_size': 2})
+        self.assertEqual([gift['name'] for gift in response.data['results']], ['Gift 10.00', 'Gift 20.00'])
+        self.assertIsNotNone(response.data['next'])
+
+    def test_unknown_field_is_rejected(self):
+        response = self.client.get(self.gifts_url, {'fields': 'id,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_fields_do_not_restrict_input(self):
+        response = self.client.post(
+            f"{self.gifts_url}?fields=id",
+            {'name': 'Lamp', 'link': 'https://example.com/lamp', 'cost': '5.00'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {'id'})
+        self.assertEqual(Gift.objects.get(pk=response.data['id']).cost, Decimal('5.00'))
+
+
+class GiftAsyncReadIntegrationTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(async_read_views())
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        for cost in ('30.00', '10.00', '20.00'):
+            Gift.objects.create(name=f'Gift {cost}', cost=cost, user=self.user)
+        self.gift = Gift.objects.create(name='Bike', cost='15.00', status=Gift.Status.RESERVED, user=self.user)
+        self.client.force_login(self.user)
+
+    def sync_response(self, actions, path, **kwargs):
+        # Тот же запрос через обычное синхронное представление.
+        with override_settings(ASYNC_READ_VIEWS=False):
+            view = GiftViewSet.as_view(actions)
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.user)
+        return view(request, **kwargs)
+
+    def test_reads_are_coroutines_and_writes_are_not(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse("gift-list")).func))
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse("gift-detail", args=[self.gift.id])).func))
+        self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse("gift-reserve", args=[self.gift.id])).func))
+
+        with async_read_views(False):
+            self.assertFalse(asyncio.iscoroutinefunction(resolve(reverse("gift-list")).func))
+
+    def test_list_matches_sync_view(self):
+        for query in ('', '?ordering=cost&page_size=2', '?status=available&fields=id,name', '?cost__gte=12'):
+            response = self.client.get(reverse("gift-list") + query)
+            expected = self.sync_response({'get': 'list'}, reverse("gift-list") + query)
+            self.assertEqual(response.status_code, expected.status_code, query)
+            self.assertEqual(response.data, expected.data, query)
+            self.assertEqual(response['ETag'], expected['ETag'], query)
+
+    def test_detail_matches_sync_view(self):
+        url = reverse("gift-detail", args=[self.gift.id])
+        response = self.client.get(url)
+        self.assertEqual(response.data, self.sync_response({'get': 'retrieve'}, url, pk=self.gift.id).data)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_session_read_queries(self):
+        # Сессия, пользователь, состояние для ETag и страница.
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse("gift-list"))
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_access(self):
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        others = Gift.objects.create(name='Not mine', user=other)
+
+        self.assertEqual(self.client.get(reverse("gift-detail", args=[others.id])).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/gifts/abc/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse("gift-list"), {'status': 'lost'}).status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("gift-list")).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_authenticators_run_in_configured_order(self):
+        # Как в синхронном пути: сессия стоит первой, токен — после неё.
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        Gift.objects.create(name='Not mine', user=other)
+        header = f"Bearer {issue_tokens(other)['access']}"
+
+        response = self.client.get(reverse("gift-list"), HTTP_AUTHORIZATION=header)
+        self.assertEqual(len(response.data['results']), 4)
+
+        self.client.logout()
+        response = self.client.get(reverse("gift-list"), HTTP_AUTHORIZATION=header)
+        self.assertEqual([gift['name'] for gift in response.data['results']], ['Not mine'])
+
+    def test_writes_still_run_sync_view(self):
+        response = self.client.patch(reverse("gift-detail", args=[self.gift.id]), {'name': 'Red bike'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse("gift-detail", args=[self.gift.id])).data['name'], 'Red bike')
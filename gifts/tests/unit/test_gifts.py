@@ -1,9 +1,16 @@
 import unittest
+from decimal import Decimal
 from gifts.models import Gift
 from gifts.serializers import GiftSerializer
+from gifts.enrichment import LinkMetadata, TTLCache, extract_metadata, normalize_url, parse_price
 from django.test import TestCase
 from rest_framework.exceptions import ValidationError
 from unittest.mock import Mock, patch
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+from bestwishes.fastread import get_reader
+
+User = get_user_model()
 
 class TestGiftSerializerValidation(TestCase):
     """Unit tests for GiftSerializer validation logic."""
@@ -31,6 +38,11 @@ class TestGiftSerializerValidation(TestCase):
         self.assertFalse(is_valid)
         self.assertIn('name', serializer.errors)
 
+    def test_link_without_name_passes_validation(self):
+        """Test that a link alone is enough: the name comes from the page title."""
+        serializer = GiftSerializer(data={'link': 'http://example.com/product'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+
     def test_negative_cost_raises_validation_error(self):
         """Test that negative cost raises validation error."""
         data = {
@@ -131,3 +143,81 @@ class TestGiftSerializerValidation(TestCase):
     
 
 
+class TestLinkMetadataExtraction(unittest.TestCase):
+    """Unit tests for the link enrichment helpers."""
+
+    def test_normalize_url_drops_tracking_and_fragment(self):
+        url = 'HTTPS://Shop.Example.com:443/item?utm_source=x&b=2&a=1#reviews'
+        self.assertEqual(normalize_url(url), 'https://shop.example.com/item?a=1&b=2')
+
+    def test_normalize_url_keeps_custom_port(self):
+        self.assertEqual(normalize_url('http://localhost:8080'), 'http://localhost:8080/')
+
+    def test_parse_price_formats(self):
+        self.assertEqual(parse_price('1,299.50'), Decimal('1299.50'))
+        self.assertEqual(parse_price('1.299,50 EUR'), Decimal('1299.50'))
+        self.assertEqual(parse_price('$15'), Decimal('15.00'))
+        self.assertIsNone(parse_price('free'))
+
+    def test_extract_metadata_prefers_open_graph(self):
+        html = (
+            '<html><head><title>Fallback</title>'
+            '<meta property="og:title" content="Teddy Bear">'
+            '<meta property="product:price:amount" content="29.99">'
+            '<meta property="og:image" content="/img/bear.jpg">'
+            '</head></html>'
+        )
+        metadata = extract_metadata(html, 'http://shop.example.com/bear')
+        self.assertEqual(metadata, LinkMetadata(
+            title='Teddy Bear',
+            price=Decimal('29.99'),
+            image='http://shop.example.com/img/bear.jpg',
+        ))
+
+    def test_extract_metadata_falls_back_to_title(self):
+        metadata = extract_metadata('<title> Teddy Bear </title>', 'http://shop.example.com/')
+        self.assertEqual(metadata.title, 'Teddy Bear')
+        self.assertIsNone(metadata.price)
+
+    def test_ttl_cache_expires_entries(self):
+        now = [0.0]
+        cache = TTLCache(ttl=10, max_entries=2, clock=lambda: now[0])
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        now[0] = 11
+        self.assertIsNone(cache.get('a'))
+
+    def test_ttl_cache_evicts_least_recently_used(self):
+        cache = TTLCache(ttl=10, max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+
+
+class TestValuesReader(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='reader@test.ru', password='pass')
+        for cost in (None, '0', '0.5', '12.34', '99999999.99'):
+            Gift.objects.create(name=f'Gift {cost}', cost=cost, link=None, image='https://example.com/a b.png', user=self.user)
+
+    def test_matches_model_serializer(self):
+        queryset = Gift.objects.filter(user=self.user).order_by('id')
+        reader = get_reader(GiftSerializer())
+
+        expected = [dict(item) for item in GiftSerializer(queryset, many=True).data]
+        self.assertEqual(reader.represent(list(queryset.values(*reader.columns))), expected)
+
+    def test_serializer_with_method_fields_is_not_compiled(self):
+        class LabelledGiftSerializer(GiftSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(GiftSerializer.Meta):
+                fields = GiftSerializer.Meta.fields + ["label"]
+
+            def get_label(self, gift):
+                return gift.name.upper()
+
+        self.assertIsNone(get_reader(LabelledGiftSerializer()))
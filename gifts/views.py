@@ -1,16 +1,159 @@
-from rest_framework import viewsets
+from django.conf import settings
+from django.db import transaction
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from bestwishes.asyncviews import AsyncReadMixin
+from bestwishes.conditional import ConditionalGetMixin
+from bestwishes.fastread import FastListMixin
+from bestwishes.fieldsets import SparseFieldsetViewMixin
+from bestwishes.pagination import RankCursorPagination
+from .enrichment import enqueue_gift
+from .filters import GiftFilterBackend
 from .models import Gift
+from .search import search_gifts
 from .serializers import GiftSerializer
+from .signals import gifts_changed
+from .services import (
+    bulk_create_gifts,
+    bulk_update_gifts,
+    bulk_delete_gifts,
+    reserve_gift,
+    unreserve_gift,
+)
 
 
-class GiftViewSet(viewsets.ModelViewSet):
+class GiftViewSet(ConditionalGetMixin, SparseFieldsetViewMixin, FastListMixin, AsyncReadMixin, viewsets.ModelViewSet):
     queryset = Gift.objects.all()
     serializer_class = GiftSerializer
     permission_classes = [IsAuthenticated]
+    filter_backends = [GiftFilterBackend, OrderingFilter]
+    ordering_fields = ["id", "cost"]
 
     def get_queryset(self):
         return Gift.objects.filter(user=self.request.user)
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        gift = serializer.save(user=self.request.user)
+        enqueue_gift(gift)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # Sent first: the gift's wishlist memberships go with it.
+        gifts_changed.send(sender=Gift, gift_ids=[instance.pk], deleted=True)
+        instance.delete()
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        """
+        Create, update or delete many gifts in one transaction.
+        POST expects a list of gifts, PATCH a list of partial gifts with 'id',
+        DELETE an object with an 'ids' list.
+        """
+        if request.method == 'DELETE':
+            return self._bulk_delete(request)
+
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'Expected a non-empty list of gifts.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(items) > settings.GIFTS_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.GIFTS_BULK_MAX_ITEMS} gifts per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.method == 'PATCH':
+            return self._bulk_update(request, items)
+
+        serializer = self.get_serializer(data=items, many=True)
+        serializer.is_valid(raise_exception=True)
+        gifts = bulk_create_gifts(user=request.user, items=serializer.validated_data)
+        for gift in gifts:
+            enqueue_gift(gift)
+        return Response(self.get_serializer(gifts, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post'])
+    def reserve(self, request, pk=None):
+        """
+        Reserve an available gift.
+        Responds with 409 if the gift is no longer available.
+        """
+        gift_id = self._gift_id(pk)
+        reserve_gift(user=request.user, gift_id=gift_id)
+        return Response({'id': gift_id, 'status': Gift.Status.RESERVED}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def unreserve(self, request, pk=None):
+        """
+        Release a reserved gift.
+        Responds with 409 if the gift is not reserved.
+        """
+        gift_id = self._gift_id(pk)
+        unreserve_gift(user=request.user, gift_id=gift_id)
+        return Response({'id': gift_id, 'status': Gift.Status.AVAILABLE}, status=status.HTTP_200_OK)
+
+    @staticmethod
+    def _gift_id(pk):
+        try:
+            return int(pk)
+        except (TypeError, ValueError):
+            raise NotFound('Gift not found.')
+
+    @action(detail=False, methods=['get'], url_path='search', pagination_class=RankCursorPagination)
+    def search(self, request):
+        """
+        Search the user's gifts by name, best matches first.
+        Expects a 'q' query param; misspelled words still match.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'error': 'q is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = search_gifts(self.filter_queryset(self.get_queryset()), query)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def _bulk_update(self, request, items):
+        ids = [item.get('id') if isinstance(item, dict) else None for item in items]
+        if not all(isinstance(gift_id, int) for gift_id in ids) or len(set(ids)) != len(ids):
+            return Response(
+                {'error': "Every gift must have a unique integer 'id'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = self.get_serializer(data=items, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        gifts = bulk_update_gifts(
+            user=request.user,
+            changes=list(zip(ids, serializer.validated_data))
+        )
+        return Response(self.get_serializer(gifts, many=True).data, status=status.HTTP_200_OK)
+
+    def _bulk_delete(self, request):
+        ids = request.data.get('ids') if isinstance(request.data, dict) else None
+        if (
+            not isinstance(ids, list)
+            or not ids
+            or not all(isinstance(gift_id, int) for gift_id in ids)
+        ):
+            return Response(
+                {'error': "'ids' must be a non-empty list of integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(ids) > settings.GIFTS_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.GIFTS_BULK_MAX_ITEMS} gifts per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        deleted = bulk_delete_gifts(user=request.user, gift_ids=ids)
+        return Response({'deleted': deleted}, status=status.HTTP_200_OK)
@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
+
+
+class UsersConfig(AppConfig):
+    name = "users"
+
+    def ready(self):
+        from .models import User
+        from .signals import forget_cached_user
+
+        post_save.connect(forget_cached_user, sender=User)
+        post_delete.connect(forget_cached_user, sender=User)
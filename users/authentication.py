@@ -0,0 +1,32 @@
+from rest_framework import authentication, exceptions
+
+from .tokens import InvalidToken, user_from_access_token
+
+
+class SignedTokenAuthentication(authentication.BaseAuthentication):
+    """
+    ``Authorization: Bearer <access token>`` with the signed tokens of
+    users/tokens.py. Verifying one needs no database access, so async views
+    run it in place rather than in a worker thread (``offline``).
+    """
+
+    keyword = "Bearer"
+    offline = True
+
+    def authenticate(self, request):
+        parts = authentication.get_authorization_header(request).split()
+        if not parts or parts[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(parts) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            token = parts[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header.")
+        try:
+            return user_from_access_token(token), token
+        except InvalidToken as exc:
+            raise exceptions.AuthenticationFailed(str(exc))
+
+    def authenticate_header(self, request):
+        return self.keyword
@@ -0,0 +1,168 @@
+"""
+An authentication backend that keeps the users it loads.
+
+``AuthenticationMiddleware`` resolves the session's user through the
+backend's ``get_user()`` on every request. CachedModelBackend answers it
+from a bounded LRU in the process (``USER_CACHE_SIZE`` entries, for
+``USER_CACHE_TTL`` seconds), then from the shared cache (for
+``USER_CACHE_SHARED_TTL`` seconds), and reads the ``User`` table only when
+both miss. Entries are the row's field values; every call builds a new
+``User`` from them, so a request changing its ``request.user`` does not
+change the cached one.
+
+Both caches hold a user under a version kept in the shared cache, and every
+lookup reads that version first (one small cache read, no query).
+``forget_user()`` replaces it, so every process stops serving its copy at
+once. It runs after every ``User.save()`` and delete (see users/apps.py) and
+must be called by code that changes users with ``update()``. A copy read
+from the database before the version changed is stored under the old one
+and never served.
+
+Sessions are stamped with the path of the backend that logged them in;
+``django.contrib.auth.backends.ModelBackend`` stays in
+AUTHENTICATION_BACKENDS for the sessions created before this backend.
+
+The cached values include the password hash, which sessions are checked
+against; the shared cache must be as private as the database.
+"""
+import threading
+import uuid
+from collections import OrderedDict
+from time import monotonic
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+from .models import User
+
+PREFIX = "auth-user:v2"
+
+
+class LocalCache:
+    """A thread-safe LRU whose entries expire ``ttl`` seconds after they were stored."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._entries[key] = (monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_local = LocalCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+_stats = {"local_hits": 0, "shared_hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+class CachedModelBackend(ModelBackend):
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user = super().authenticate(request, username, password, **kwargs)
+        if user is None and password is not None:
+            # Ends authenticate() here: the ModelBackend kept for older
+            # sessions would hash the same password once more.
+            raise PermissionDenied
+        return user
+
+    def get_user(self, user_id):
+        user_id = User._meta.pk.to_python(user_id)
+        version = cache.get(_version_key(user_id))
+        fields = _local.get((user_id, version)) if version is not None else None
+        if fields is not None:
+            _count("local_hits")
+        else:
+            if version is None:
+                cache.add(_version_key(user_id), uuid.uuid4().hex, settings.USER_CACHE_SHARED_TTL)
+                version = cache.get(_version_key(user_id))
+            entry = cache.get(_key(user_id))
+            if entry is not None and entry[0] == version:
+                _count("shared_hits")
+                fields = entry[1]
+            else:
+                _count("misses")
+                user = User._default_manager.filter(pk=user_id).first()
+                if user is None:
+                    return None
+                fields = {field.attname: getattr(user, field.attname) for field in User._meta.concrete_fields}
+                cache.set(_key(user_id), (version, fields), settings.USER_CACHE_SHARED_TTL)
+            _local.set((user_id, version), fields)
+        user = User.from_db(User.objects.db, list(fields), list(fields.values()))
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        """``get_user`` for async views: an LRU hit of the current version is answered in place."""
+        user_id = User._meta.pk.to_python(user_id)
+        version = await cache.aget(_version_key(user_id))
+        fields = _local.get((user_id, version)) if version is not None else None
+        if fields is None:
+            return await sync_to_async(self.get_user)(user_id)
+        _count("local_hits")
+        user = User.from_db(User.objects.db, list(fields), list(fields.values()))
+        return user if self.user_can_authenticate(user) else None
+
+
+def forget_user(user_id) -> None:
+    """Retire the cached copies of a user that changed; again on commit, after readers of the old row."""
+    _forget(user_id)
+    transaction.on_commit(lambda: _forget(user_id))
+
+
+def stats() -> dict:
+    """Lookups of this process so far, and the LRU's size."""
+    with _stats_lock:
+        counters = dict(_stats)
+    return {**counters, "local_size": len(_local)}
+
+
+def reset() -> None:
+    _local.clear()
+    with _stats_lock:
+        for name in _stats:
+            _stats[name] = 0
+
+
+def _forget(user_id) -> None:
+    user_id = User._meta.pk.to_python(user_id)
+    cache.set(_version_key(user_id), uuid.uuid4().hex, settings.USER_CACHE_SHARED_TTL)
+    cache.delete(_key(user_id))
+
+
+def _key(user_id) -> str:
+    return f"{PREFIX}:{user_id}"
+
+
+def _version_key(user_id) -> str:
+    return f"{PREFIX}:{user_id}:version"
+
+
+def _count(name: str) -> None:
+    with _stats_lock:
+        _stats[name] += 1
@@ -0,0 +1,26 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from users import throttling
+
+
+class Command(BaseCommand):
+    help = (
+        "Print the login throttling counters: attempts hashed, successes, failures, "
+        "attempts refused (by lockout, per-IP limit, global limit) and lockouts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--json", action="store_true", dest="as_json", help="One JSON object, for monitoring scripts.")
+        parser.add_argument("--reset", action="store_true", help="Zero the counters after printing them.")
+
+    def handle(self, *args, as_json, reset, **options):
+        counters = throttling.stats()
+        if as_json:
+            self.stdout.write(json.dumps(counters))
+        else:
+            for name, value in counters.items():
+                self.stdout.write(f"{name:>16}: {value}")
+        if reset:
+            throttling.reset_stats()
@@ -32,6 +32,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Carried by API tokens; bumping it makes the refresh tokens issued so far invalid.
+    token_version = models.PositiveIntegerField(default=0)
 
     objects = UserManager()
 
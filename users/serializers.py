@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth import authenticate
+from . import throttling
 from .models import User
 
 
@@ -45,11 +46,16 @@ class UserLoginSerializer(serializers.Serializer):
         password = data.get('password')
 
         if email and password:
-            user = authenticate(username=email, password=password)
+            request = self.context.get('request')
+            # Refused attempts never reach the password hasher.
+            throttling.check(ip=request.META.get('REMOTE_ADDR') if request else None, email=email)
+            user = authenticate(request=request, username=email, password=password)
             if not user:
+                throttling.record_failure(email=email)
                 raise serializers.ValidationError(
                     "Invalid email or password."
                 )
+            throttling.record_success(email=email)
         else:
             raise serializers.ValidationError(
                 "Must include both email and password."
@@ -0,0 +1,5 @@
+from .backends import forget_user
+
+
+def forget_cached_user(sender, instance, **kwargs):
+    forget_user(instance.pk)
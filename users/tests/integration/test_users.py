@@ -1,7 +1,16 @@
 """ Integration tests for user registration and login. """
+import io
+import json
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
+from users import backends
 from users.models import User
 from users.serializers import UserRegistrationSerializer, UserLoginSerializer
 
@@ -97,4 +106,229 @@ class UserIntegrationTests(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertTrue(User.objects.filter(email='example@test.ru').exists())
-        self.assertIn("Invalid email or password", str(response.data))
\ No newline at end of file
+        self.assertIn("Invalid email or password", str(response.data))
+
+@override_settings(LOGIN_THROTTLE_EMAIL=(3, 900), LOGIN_THROTTLE_IP=(5, 300))
+class UserLoginThrottlingIntegrationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.login_url = reverse("login")
+
+    def login(self, password, email='example@test.ru', ip='10.0.0.1'):
+        return self.client.post(self.login_url, {'email': email, 'password': password}, format='json', REMOTE_ADDR=ip)
+
+    def test_locked_email_is_refused_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong', ip='10.0.0.1').status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch('users.serializers.authenticate') as authenticate:
+            response = self.login('strongpassword123', ip='10.0.0.2')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+        authenticate.assert_not_called()
+
+    def test_ip_flood_over_many_emails(self):
+        for i in range(5):
+            self.login('wrong', email=f'user{i}@test.ru')
+        self.assertEqual(self.login('strongpassword123').status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login('strongpassword123', ip='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    def test_stats_command(self):
+        self.login('wrong')
+        self.login('strongpassword123')
+        out = io.StringIO()
+        call_command('login_throttle_stats', '--json', '--reset', stdout=out)
+        counters = json.loads(out.getvalue())
+        self.assertEqual((counters['attempts'], counters['successes'], counters['failures']), (2, 1, 1))
+        self.assertEqual(self.login('strongpassword123').status_code, status.HTTP_200_OK)
+
+
+class UserTokenIntegrationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.api = self.client_class()
+
+    def obtain(self, password='strongpassword123'):
+        return self.client.post(reverse("token"), {'email': 'example@test.ru', 'password': password}, format='json')
+
+    def test_access_token_needs_no_queries(self):
+        """ Test that a bearer token is verified without reading sessions or users. """
+        tokens = self.obtain().data
+        self.assertEqual(tokens['token_type'], 'Bearer')
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+
+        with self.assertNumQueries(0):
+            response = self.api.get(reverse("user-me"))
+        self.assertEqual(response.data['email'], 'example@test.ru')
+
+        # Состояние для ETag и страница, без сессии и пользователя.
+        with self.assertNumQueries(2):
+            response = self.api.get(reverse("gift-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.api.post(reverse("gift-list"), {'name': 'Bike'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.user.gifts.get().name, 'Bike')
+
+    def test_bad_tokens_are_rejected(self):
+        tokens = self.obtain().data
+        for header in (f"Bearer {tokens['refresh']}", f"Bearer {tokens['access']}x", 'Bearer', 'Bearer a b'):
+            self.api.credentials(HTTP_AUTHORIZATION=header)
+            self.assertEqual(self.api.get(reverse("user-me")).status_code, status.HTTP_403_FORBIDDEN, header)
+        self.assertEqual(self.obtain('wrong').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_access_token_expires(self):
+        access = self.obtain().data['access']
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        with patch('django.core.signing.time.time', return_value=time.time() + 301):
+            self.assertEqual(self.api.get(reverse("user-me")).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_refresh_and_revocation_on_password_change(self):
+        tokens = self.obtain().data
+        response = self.client.post(reverse("token-refresh"), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('access', response.data)
+
+        self.api.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+        response = self.api.post(
+            reverse("user-change-password"),
+            {'old_password': 'strongpassword123', 'new_password': 'newpassword123'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        fresh = response.data['refresh']
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('newpassword123'))
+        # Сохранены только загруженные поля пользователя из токена.
+        self.assertEqual(self.user.email, 'example@test.ru')
+        self.assertIsNotNone(self.user.last_login)
+
+        response = self.client.post(reverse("token-refresh"), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse("token-refresh"), {'refresh': fresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refresh_refused_for_inactive_user(self):
+        refresh = self.obtain().data['refresh']
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post(reverse("token-refresh"), {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.post(reverse("token-refresh"), {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UserMeIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.me_url = reverse("user-me")
+
+    def test_me_with_session(self):
+        """ Test that /users/me/ loads the session user without extra queries. """
+        self.client.login(email='example@test.ru', password='strongpassword123')
+        with self.assertNumQueries(2):
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'example@test.ru')
+
+    def test_model_backend_sessions_stay_valid(self):
+        """ Test that sessions logged in before the cached backend still resolve. """
+        self.client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(self.me_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], 'example@test.ru')
+
+    def test_session_user_is_cached(self):
+        """ Test that repeated requests read the session but not the user row. """
+        self.client.login(email='example@test.ru', password='strongpassword123')
+        self.client.get(self.me_url)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.me_url)
+        self.assertEqual(response.data['email'], 'example@test.ru')
+
+    def test_cache_stats_for_staff_only(self):
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("user-cache-stats")).status_code, status.HTTP_403_FORBIDDEN)
+
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        backends.forget_user(self.user.pk)
+        response = self.client.get(reverse("user-cache-stats"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data),
+            {'pid', 'local_hits', 'shared_hits', 'misses', 'local_size'}
+        )
+
+    def test_password_change_ends_other_sessions(self):
+        self.client.login(email='example@test.ru', password='strongpassword123')
+        self.user.set_password('newpassword123')
+        self.user.save()
+
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_me_requires_authentication(self):
+        self.assertEqual(self.client.get(self.me_url).status_code, status.HTTP_403_FORBIDDEN)
+
+
+class UserListIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        for i in range(3):
+            User.objects.create_user(email=f'user{i}@test.ru')
+        self.users_url = reverse("user-list")
+
+    def test_user_list_is_cursor_paginated(self):
+        """ Test that the user list is returned page by page instead of the whole table. """
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.users_url, {'page_size': 3}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'], format='json')
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+
+
+class UserBackgroundDeletionIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+
+    def test_user_schedules_own_deletion(self):
+        """ Test that the account is deactivated at once and removed by the worker. """
+        self.client.login(email='example@test.ru', password='strongpassword123')
+        url = reverse("user-detail", args=[self.user.id])
+        response = self.client.delete(f"{url}?mode=background")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['kind'], 'user')
+        self.assertEqual(response.data['state'], 'pending')
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.client.get(reverse("user-me")).status_code, status.HTTP_403_FORBIDDEN)
+
+        call_command('run_deletion_jobs', once=True, stdout=io.StringIO())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+    def test_cannot_schedule_deletion_of_another_user(self):
+        self.client.force_authenticate(user=self.user)
+        url = reverse("user-detail", args=[self.other.id])
+        response = self.client.delete(f"{url}?mode=background")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(User.objects.get(pk=self.other.pk).is_active)
@@ -1,8 +1,11 @@
 import unittest
 from unittest.mock import Mock, patch
+from django.contrib.auth import authenticate
 from django.db import IntegrityError
-from django.test import TestCase
-from rest_framework.exceptions import ValidationError
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import Throttled, ValidationError
+from ... import backends, throttling
 from ...serializers import UserRegistrationSerializer, UserLoginSerializer
 from ...models import User
 
@@ -219,6 +222,164 @@ class TestUserLoginSerializerValidation(TestCase):
         
         self.assertFalse(is_valid)
 
+@override_settings(
+    LOGIN_THROTTLE_IP=(3, 60),
+    LOGIN_THROTTLE_EMAIL=(2, 60),
+    LOGIN_THROTTLE_GLOBAL=(10, 60),
+    LOGIN_LOCKOUT_BASE=10,
+    LOGIN_LOCKOUT_MAX=25,
+)
+class TestLoginThrottling(SimpleTestCase):
+    """Unit tests for the login throttle counters and lockouts."""
+
+    def setUp(self):
+        cache.clear()
+        self.now = 1_000_040.0  # 20 s into a 60 s bucket
+        patcher = patch('users.throttling.time.time', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_ip_limit_locks_out_with_doubling_duration(self):
+        for _ in range(3):
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+        with self.assertRaises(Throttled) as refused:
+            throttling.check(ip='10.0.0.1', email='b@example.com')
+        self.assertEqual(refused.exception.wait, 10)
+        # Другой IP не затронут.
+        throttling.check(ip='10.0.0.2', email='a@example.com')
+
+        self.now += 11
+        with self.assertRaises(Throttled) as refused:
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+        self.assertEqual(refused.exception.wait, 20)
+
+        self.now += 21
+        with self.assertRaises(Throttled) as refused:
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+        self.assertEqual(refused.exception.wait, 25)
+
+    def test_window_slides(self):
+        for _ in range(3):
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+        # Через 70 с окно покрывает половину прошлого бакета: 3 * 0.5 + 1 = 2.5 попытки.
+        self.now += 70
+        throttling.check(ip='10.0.0.1', email='a@example.com')
+        with self.assertRaises(Throttled):
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+
+    def test_failures_lock_email_and_success_clears_them(self):
+        throttling.record_failure(email='a@example.com')
+        throttling.record_success(email='A@example.com ')
+        throttling.record_failure(email='a@example.com')
+        throttling.check(ip=None, email='a@example.com')
+
+        throttling.record_failure(email='a@example.com')
+        with self.assertRaises(Throttled):
+            throttling.check(ip='10.0.0.9', email='a@example.com')
+
+    def test_global_limit_refuses_without_lockout(self):
+        for i in range(10):
+            throttling.check(ip=None, email=f'user{i}@example.com')
+        with self.assertRaises(Throttled):
+            throttling.check(ip=None, email='late@example.com')
+        self.now += 120
+        throttling.check(ip=None, email='late@example.com')
+        self.assertEqual(throttling.stats()['lockouts'], 0)
+
+    def test_stats(self):
+        throttling.check(ip='10.0.0.1', email='a@example.com')
+        throttling.record_failure(email='a@example.com')
+        throttling.record_failure(email='a@example.com')
+        with self.assertRaises(Throttled):
+            throttling.check(ip='10.0.0.1', email='a@example.com')
+
+        self.assertEqual(
+            throttling.stats(),
+            {'attempts': 1, 'successes': 0, 'failures': 2, 'refused_locked': 1,
+             'refused_ip': 0, 'refused_global': 0, 'lockouts': 1},
+        )
+        throttling.reset_stats()
+        self.assertEqual(set(throttling.stats().values()), {0})
+
+
+class TestLocalCache(unittest.TestCase):
+    """Unit tests for the per-process LRU in front of the shared user cache."""
+
+    def test_least_recently_used_is_evicted(self):
+        lru = backends.LocalCache(max_size=2, ttl=60)
+        lru.set(1, 'a')
+        lru.set(2, 'b')
+        lru.get(1)
+        lru.set(3, 'c')
+        self.assertEqual((lru.get(1), lru.get(2), lru.get(3)), ('a', None, 'c'))
+
+    def test_entries_expire(self):
+        lru = backends.LocalCache(max_size=2, ttl=10)
+        with patch('users.backends.monotonic', return_value=100.0):
+            lru.set(1, 'a')
+        with patch('users.backends.monotonic', return_value=109.0):
+            self.assertEqual(lru.get(1), 'a')
+        with patch('users.backends.monotonic', return_value=110.0):
+            self.assertIsNone(lru.get(1))
+        self.assertEqual(len(lru), 0)
+
+
+class TestCachedModelBackend(TestCase):
+    """Unit tests for the cached user lookup and its invalidation."""
+
+    def setUp(self):
+        backends.reset()
+        cache.clear()
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.backend = backends.CachedModelBackend()
+
+    def test_lookups_go_local_shared_then_database(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.backend.get_user(self.user.pk).email, 'test@example.com')
+        with self.assertNumQueries(0):
+            self.backend.get_user(str(self.user.pk))
+        backends._local.clear()
+        with self.assertNumQueries(0):
+            self.backend.get_user(self.user.pk)
+        self.assertEqual(backends.stats(), {'local_hits': 1, 'shared_hits': 1, 'misses': 1, 'local_size': 1})
+
+    def test_each_lookup_gets_its_own_user(self):
+        first = self.backend.get_user(self.user.pk)
+        first.email = 'changed@example.com'
+        self.assertEqual(self.backend.get_user(self.user.pk).email, 'test@example.com')
+        self.assertIsNone(self.backend.get_user(self.user.pk + 100))
+
+    def test_save_and_deactivation_invalidate(self):
+        self.backend.get_user(self.user.pk)
+        self.user.set_password('newpass123')
+        self.user.save()
+        self.assertTrue(self.backend.get_user(self.user.pk).check_password('newpass123'))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_forget_user(self):
+        self.backend.get_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.assertFalse(self.backend.get_user(self.user.pk).is_staff)
+        backends.forget_user(self.user.pk)
+        self.assertTrue(self.backend.get_user(self.user.pk).is_staff)
+
+    def test_forget_user_reaches_every_process(self):
+        # Локальный LRU не чистится: копию отсекает новая версия в общем кэше.
+        self.backend.get_user(self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        backends._forget(self.user.pk)
+        self.assertEqual(len(backends._local), 1)
+        self.assertIsNone(self.backend.get_user(self.user.pk))
+
+    def test_failed_login_hashes_once(self):
+        with patch.object(User, 'check_password', autospec=True, return_value=False) as check_password:
+            self.assertIsNone(authenticate(username='test@example.com', password='wrong'))
+        self.assertEqual(check_password.call_count, 1)
+
+
 class TestUserManager(TestCase):
     """Unit tests for UserManager methods."""
 
@@ -0,0 +1,128 @@
+"""
+Login flood protection.
+
+Every login attempt costs a full password hash, also for emails that do
+not exist, so a credential-stuffing burst can keep every core busy. Attempts
+are therefore counted, and refused with a 429, before ``authenticate()`` is
+called:
+
+- by client IP: every attempt counts;
+- globally: every attempt counts, which caps the CPU spent on hashing;
+- by email: failed attempts count, and a successful login clears them.
+
+Counts are sliding windows, estimated from the current and the previous
+fixed bucket (``prev * share of the window still covered + current``), kept
+in the shared cache so all processes see the same numbers. An IP or email
+that goes over its limit is locked out; every further lockout within
+``LOGIN_LOCKOUT_MEMORY`` doubles the duration, up to ``LOGIN_LOCKOUT_MAX``.
+The global limit never locks: it refuses while the window is full.
+
+``stats()`` returns the counters kept for monitoring (``manage.py
+login_throttle_stats``). With the local-memory cache, as in development,
+all of this holds per process only.
+"""
+import hashlib
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import Throttled
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "login-throttle"
+STATS = (
+    "attempts",
+    "successes",
+    "failures",
+    "refused_locked",
+    "refused_ip",
+    "refused_global",
+    "lockouts",
+)
+
+
+def check(*, ip: str | None, email: str) -> None:
+    """Raise Throttled unless an attempt for ``email`` from ``ip`` may be hashed now."""
+    keys = [_key("email", email)] + ([_key("ip", ip)] if ip else [])
+    locks = cache.get_many([f"{key}:lock" for key in keys])
+    if locks:
+        _count("refused_locked")
+        raise Throttled(wait=max(until - time.time() for until in locks.values()))
+
+    if ip:
+        limit, window = settings.LOGIN_THROTTLE_IP
+        if _hit(_key("ip", ip), window) > limit:
+            _count("refused_ip")
+            raise Throttled(wait=_lock_out(_key("ip", ip), "ip"))
+
+    limit, window = settings.LOGIN_THROTTLE_GLOBAL
+    if _hit(f"{PREFIX}:global", window) > limit:
+        _count("refused_global")
+        raise Throttled(wait=window / limit)
+    _count("attempts")
+
+
+def record_failure(*, email: str) -> None:
+    _count("failures")
+    limit, window = settings.LOGIN_THROTTLE_EMAIL
+    key = _key("email", email)
+    if _hit(key, window) >= limit:
+        _lock_out(key, "email")
+
+
+def record_success(*, email: str) -> None:
+    _count("successes")
+    key = _key("email", email)
+    _, window = settings.LOGIN_THROTTLE_EMAIL
+    bucket = int(time.time() // window)
+    cache.delete_many([f"{key}:{bucket}", f"{key}:{bucket - 1}", f"{key}:strikes"])
+
+
+def stats() -> dict[str, int]:
+    values = cache.get_many([f"{PREFIX}:stats:{name}" for name in STATS])
+    return {name: values.get(f"{PREFIX}:stats:{name}", 0) for name in STATS}
+
+
+def reset_stats() -> None:
+    cache.delete_many([f"{PREFIX}:stats:{name}" for name in STATS])
+
+
+def _key(scope: str, value: str) -> str:
+    # Hashed: emails and IPv6 addresses make poor cache keys, and stay out of the cache.
+    return f"{PREFIX}:{scope}:{hashlib.sha256(value.strip().lower().encode()).hexdigest()[:32]}"
+
+
+def _hit(key: str, window: int) -> float:
+    """Count one event for ``key`` and return the sliding-window estimate including it."""
+    now = time.time()
+    bucket = int(now // window)
+    current = _incr(f"{key}:{bucket}", 2 * window)
+    previous = cache.get(f"{key}:{bucket - 1}", 0)
+    return previous * (1 - (now % window) / window) + current
+
+
+def _lock_out(key: str, scope: str) -> float:
+    """Lock ``key`` out for the next duration of its doubling series; returns it in seconds."""
+    strikes = _incr(f"{key}:strikes", settings.LOGIN_LOCKOUT_MEMORY)
+    duration = min(settings.LOGIN_LOCKOUT_BASE * 2 ** (strikes - 1), settings.LOGIN_LOCKOUT_MAX)
+    cache.set(f"{key}:lock", time.time() + duration, math.ceil(duration))
+    _count("lockouts")
+    logger.warning("Login attempts locked out by %s for %ss (lockout %s)", scope, duration, strikes)
+    return duration
+
+
+def _count(name: str) -> None:
+    _incr(f"{PREFIX}:stats:{name}", None)
+
+
+def _incr(key: str, timeout: int | None) -> int:
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add() and incr().
+        cache.add(key, 1, timeout)
+        return 1
@@ -0,0 +1,80 @@
+"""
+Signed API tokens for clients that do not keep a session cookie.
+
+An access token is the user's id, email, flags and ``token_version``,
+signed with HMAC-SHA256 and timestamped (``django.core.signing``). It is
+verified against SECRET_KEY alone, so a request authenticated with it reads
+neither ``django_session`` nor the user row, and it is good for
+``ACCESS_TOKEN_LIFETIME`` seconds. The refresh token lives for
+``REFRESH_TOKEN_LIFETIME``; exchanging it reads the user once and only
+succeeds while the account is active and its ``token_version`` is still
+the one the token carries. ``revoke_tokens`` bumps the version (on a
+password change), so refresh tokens stop working at once and access
+tokens within their short lifetime. Email and staff changes likewise
+reach the token at the next refresh.
+
+Access and refresh tokens use different salts: one cannot stand in for the
+other. Keys are rotated with SECRET_KEY_FALLBACKS.
+"""
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+
+from .backends import forget_user
+from .models import User
+
+ACCESS_SALT = "users.tokens.access"
+REFRESH_SALT = "users.tokens.refresh"
+
+# The fields an access token carries, in the order of its claims.
+ACCESS_FIELDS = ("id", "email", "is_active", "is_staff", "token_version")
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def issue_tokens(user: User) -> dict:
+    return {
+        "access": signing.dumps([getattr(user, name) for name in ACCESS_FIELDS], salt=ACCESS_SALT),
+        "refresh": signing.dumps([user.pk, user.token_version], salt=REFRESH_SALT),
+        "token_type": "Bearer",
+        "expires_in": settings.ACCESS_TOKEN_LIFETIME,
+    }
+
+
+def user_from_access_token(token: str) -> User:
+    """
+    The user an access token was issued to, without a query. Fields the
+    token does not carry are deferred: reading one loads it from the
+    database, and ``save()`` writes only the fields that were loaded.
+    """
+    try:
+        claims = signing.loads(token, salt=ACCESS_SALT, max_age=settings.ACCESS_TOKEN_LIFETIME)
+    except signing.BadSignature:
+        raise InvalidToken("Invalid or expired token.")
+    if not isinstance(claims, list) or len(claims) != len(ACCESS_FIELDS):
+        raise InvalidToken("Invalid or expired token.")
+    values = dict(zip(ACCESS_FIELDS, claims))
+    # from_db() takes the loaded fields in model order.
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in values]
+    return User.from_db(User.objects.db, names, [values[name] for name in names])
+
+
+def refresh_tokens(token: str) -> dict:
+    """A new token pair for a valid refresh token of an active user."""
+    try:
+        user_id, version = signing.loads(token, salt=REFRESH_SALT, max_age=settings.REFRESH_TOKEN_LIFETIME)
+    except (signing.BadSignature, ValueError, TypeError):
+        raise InvalidToken("Invalid or expired refresh token.")
+    user = User.objects.filter(pk=user_id, is_active=True, token_version=version).first()
+    if user is None:
+        raise InvalidToken("Refresh token has been revoked.")
+    return issue_tokens(user)
+
+
+def revoke_tokens(user: User) -> None:
+    """Invalidate every token issued to ``user`` so far."""
+    User.objects.filter(pk=user.pk).update(token_version=F("token_version") + 1)
+    forget_user(user.pk)
+    user.refresh_from_db(fields=["token_version"])
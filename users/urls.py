@@ -4,6 +4,9 @@ from .views import (
     UserRegistrationView,
     UserLoginView,
     UserLogoutView,
+    TokenObtainView,
+    TokenRefreshView,
+    UserCacheStatsView,
     UserViewSet,
 )
 
@@ -13,6 +16,9 @@ router.register(r'', UserViewSet, basename='user')
 urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='register'),
     path('login/', UserLoginView.as_view(), name='login'),
+    path('token/', TokenObtainView.as_view(), name='token'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
+    path('cache-stats/', UserCacheStatsView.as_view(), name='user-cache-stats'),
     path('', include(router.urls)),
 ]
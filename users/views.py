@@ -1,10 +1,20 @@
+import os
+
 from rest_framework import viewsets, status, views
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from django.contrib.auth import login, logout
+from django.contrib.auth.signals import user_logged_in
+from django.urls import reverse
+from bestwishes.asyncviews import AsyncReadMixin
+from wishlists.deletion import schedule_user_deletion
+from wishlists.serializers import DeletionJobSerializer
+from . import backends
+from .authentication import SignedTokenAuthentication
 from .models import User
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, UserSerializer
+from .tokens import InvalidToken, issue_tokens, refresh_tokens, revoke_tokens
 
 
 class UserRegistrationView(views.APIView):
@@ -25,7 +35,7 @@ class UserLoginView(views.APIView):
     permission_classes = [AllowAny]
 
     def post(self, request):
-        serializer = UserLoginSerializer(data=request.data)
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
             user = serializer.validated_data['user']
             login(request, user)
@@ -36,6 +46,54 @@ class UserLoginView(views.APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class TokenObtainView(views.APIView):
+    """
+    Email and password in, an access and a refresh token out, for clients
+    that authenticate with ``Authorization: Bearer`` instead of a session.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        serializer = UserLoginSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            user = serializer.validated_data['user']
+            user_logged_in.send(sender=user.__class__, request=request, user=user)
+            return Response(issue_tokens(user), status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenRefreshView(views.APIView):
+    """A new token pair for a refresh token; refused once the password changed."""
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request):
+        refresh = request.data.get('refresh')
+        if not isinstance(refresh, str) or not refresh:
+            return Response(
+                {"refresh": "This field is required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            tokens = refresh_tokens(refresh)
+        except InvalidToken as exc:
+            return Response(
+                {"detail": str(exc)},
+                status=status.HTTP_401_UNAUTHORIZED,
+                headers={'WWW-Authenticate': SignedTokenAuthentication.keyword}
+            )
+        return Response(tokens, status=status.HTTP_200_OK)
+
+
+class UserCacheStatsView(views.APIView):
+    """Lookups answered by the user cache of the process serving the request; staff only."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({"pid": os.getpid(), **backends.stats()})
+
+
 class UserLogoutView(views.APIView):
     permission_classes = [IsAuthenticated]
 
@@ -47,10 +105,11 @@ class UserLogoutView(views.APIView):
         )
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(AsyncReadMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
+    async_actions = ('me',)
 
     def get_permissions(self):
         if self.action == 'retrieve':
@@ -60,11 +119,38 @@ class UserViewSet(viewsets.ModelViewSet):
             permission_classes = [IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    def destroy(self, request, *args, **kwargs):
+        """
+        With '?mode=background' the account is deactivated at once and its
+        gifts and wishlists are removed in batches by a worker; responds 202
+        with the deletion job. Only the user themselves or staff may do this.
+        """
+        if request.query_params.get('mode') != 'background':
+            return super().destroy(request, *args, **kwargs)
+        user = self.get_object()
+        if user.pk != request.user.pk and not request.user.is_staff:
+            return Response(
+                {"detail": "You can only delete your own account."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        job = schedule_user_deletion(user=user, requested_by=request.user)
+        if user.pk == request.user.pk:
+            logout(request)
+        return Response(
+            DeletionJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('deletion-job', args=[job.pk])}
+        )
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data)
 
+    async def ame(self, request):
+        # The user is loaded by the async authentication step already.
+        return self.me(request)
+
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def change_password(self, request):
         user = request.user
@@ -79,7 +165,10 @@ class UserViewSet(viewsets.ModelViewSet):
 
         user.set_password(new_password)
         user.save()
-        return Response(
-            {"message": "Password changed successfully."},
-            status=status.HTTP_200_OK
-        )
+        # Tokens issued before the change are no longer refreshed; a token
+        # client gets a new pair with the answer.
+        revoke_tokens(user)
+        data = {"message": "Password changed successfully."}
+        if isinstance(request.successful_authenticator, SignedTokenAuthentication):
+            data.update(issue_tokens(user))
+        return Response(data, status=status.HTTP_200_OK)
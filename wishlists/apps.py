@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
+
+
+class WishlistsConfig(AppConfig):
+    name = "wishlists"
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from gifts.signals import gifts_changed
+        from .models import Wishlist, WishlistGift
+        from .sync import ensure_change_triggers
+        from . import live, signals
+
+        post_migrate.connect(ensure_change_triggers, sender=self)
+        post_delete.connect(signals.forget_sync_state, sender=get_user_model())
+
+        post_save.connect(signals.send_on_wishlist_save, sender=Wishlist)
+        post_save.connect(signals.send_on_membership_save, sender=WishlistGift)
+        m2m_changed.connect(signals.send_on_gifts_set, sender=Wishlist.gifts.through)
+        signals.wishlists_changed.connect(signals.bump_versions)
+        gifts_changed.connect(signals.bump_versions_for_gifts)
+        gifts_changed.connect(signals.update_summaries_for_gifts)
+        signals.wishlists_changed.connect(live.publish_wishlist_changes)
+        gifts_changed.connect(live.publish_gift_changes)
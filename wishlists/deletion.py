@@ -0,0 +1,159 @@
+# wishlists/deletion.py
+"""
+Background deletion of users and large wishlists.
+
+``Model.delete()`` runs Django's collector, which loads every related gift
+and membership and removes them all in one long transaction. Here the
+object is hidden at once instead (the user is deactivated, the wishlist
+flagged ``pending_deletion``) and a DeletionJob records the work. A worker,
+``manage.py run_deletion_jobs``, then deletes the children in batches of
+``DELETION_BATCH_SIZE`` rows, pausing ``DELETION_BATCH_PAUSE`` seconds in
+between. Every batch is its own short transaction and commits together with
+the job's progress counters. If the worker dies, the job keeps its state;
+once the heartbeat is ``DELETION_JOB_STALE_AFTER`` seconds old, any worker
+resumes it from the rows that are left.
+"""
+import logging
+import time
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from gifts.models import Gift
+from wishlists.models import DeletionJob, SyncChange, Wishlist, WishlistGift
+
+logger = logging.getLogger(__name__)
+
+
+@transaction.atomic
+def schedule_wishlist_deletion(*, user, wishlist: Wishlist) -> DeletionJob:
+    """Hide the wishlist (and its share link) now; its rows go in the background."""
+    Wishlist.objects.filter(pk=wishlist.pk).update(pending_deletion=True, share_token=None)
+    return _schedule(DeletionJob.Kind.WISHLIST, wishlist.pk, requested_by=user)
+
+
+@transaction.atomic
+def schedule_user_deletion(*, user, requested_by=None) -> DeletionJob:
+    """Deactivate the user and hide their wishlists now; their rows go in the background."""
+    # Saved, not updated, so that caches of the user hear of it.
+    user.is_active = False
+    user.save(update_fields=["is_active"])
+    Wishlist.objects.filter(user_id=user.pk).update(pending_deletion=True, share_token=None)
+    return _schedule(DeletionJob.Kind.USER, user.pk, requested_by=requested_by or user)
+
+
+def _schedule(kind: str, target_id: int, *, requested_by) -> DeletionJob:
+    # Scheduling twice returns the job already under way.
+    active = DeletionJob.objects.filter(
+        kind=kind, target_id=target_id, state__in=[DeletionJob.State.PENDING, DeletionJob.State.RUNNING]
+    )
+    job = active.first()
+    if job is not None:
+        return job
+    totals = {label: queryset.count() for label, queryset in _steps(kind, target_id)}
+    try:
+        with transaction.atomic():
+            return DeletionJob.objects.create(
+                kind=kind, target_id=target_id, requested_by_id=getattr(requested_by, "pk", None), totals=totals
+            )
+    except IntegrityError:
+        return active.get()
+
+
+def _steps(kind: str, target_id: int) -> list[tuple[str, object]]:
+    """What to delete, children first, as ``(model label, queryset)`` pairs."""
+    if kind == DeletionJob.Kind.WISHLIST:
+        return [
+            (WishlistGift._meta.label, WishlistGift.objects.filter(wishlist_id=target_id)),
+            (Wishlist._meta.label, Wishlist.objects.filter(pk=target_id)),
+        ]
+    User = get_user_model()
+    return [
+        (WishlistGift._meta.label, WishlistGift.objects.filter(wishlist__user_id=target_id)),
+        (Gift._meta.label, Gift.objects.filter(user_id=target_id)),
+        (Wishlist._meta.label, Wishlist.objects.filter(user_id=target_id)),
+        # Written by the sync triggers for the deletes above, so last but the user.
+        (SyncChange._meta.label, SyncChange.objects.filter(user_id=target_id)),
+        (User._meta.label, User.objects.filter(pk=target_id)),
+    ]
+
+
+def claim_next_job() -> Optional[DeletionJob]:
+    """
+    Take a pending job, or a running one whose worker went silent, with a
+    conditional UPDATE: of several workers racing for a job exactly one wins.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.DELETION_JOB_STALE_AFTER)
+    candidates = (
+        DeletionJob.objects
+        .filter(Q(state=DeletionJob.State.PENDING) | Q(state=DeletionJob.State.RUNNING, heartbeat__lt=stale))
+        .order_by("pk")
+        .values_list("pk", "state", "heartbeat")
+    )
+    for pk, state, heartbeat in candidates[:10]:
+        claimed = DeletionJob.objects.filter(pk=pk, state=state, heartbeat=heartbeat).update(
+            state=DeletionJob.State.RUNNING, heartbeat=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return DeletionJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(
+    job: DeletionJob,
+    *,
+    batch_size: Optional[int] = None,
+    pause: Optional[float] = None,
+    report: Optional[Callable[[DeletionJob], None]] = None,
+) -> DeletionJob:
+    """Delete what is left of a claimed job, batch by batch; ``report`` is called after every batch."""
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    pause = settings.DELETION_BATCH_PAUSE if pause is None else pause
+    try:
+        for label, queryset in _steps(job.kind, job.target_id):
+            while True:
+                deleted = _delete_batch(job, label, queryset, batch_size)
+                if report is not None and deleted:
+                    report(job)
+                if deleted < batch_size:
+                    break
+                time.sleep(pause)
+    except Exception as exc:
+        logger.exception("Deletion job %s failed", job.pk)
+        job.state, job.error = DeletionJob.State.FAILED, f"{type(exc).__name__}: {exc}"
+        DeletionJob.objects.filter(pk=job.pk).update(state=job.state, error=job.error)
+        return job
+
+    job.state, job.finished_at = DeletionJob.State.DONE, timezone.now()
+    DeletionJob.objects.filter(pk=job.pk).update(state=job.state, finished_at=job.finished_at, error="")
+    return job
+
+
+@transaction.atomic
+def _delete_batch(job: DeletionJob, label: str, queryset, batch_size: int) -> int:
+    ids = list(queryset.order_by("pk").values_list("pk", flat=True)[:batch_size])
+    if not ids:
+        return 0
+    # Children of earlier steps are gone, so the collector finds nothing
+    # left to cascade to and the batch is a handful of indexed statements.
+    _, per_model = queryset.model.objects.filter(pk__in=ids).delete()
+    job.deleted[label] = job.deleted.get(label, 0) + per_model.get(label, 0)
+    job.heartbeat = timezone.now()
+    DeletionJob.objects.filter(pk=job.pk).update(deleted=job.deleted, heartbeat=job.heartbeat)
+    return len(ids)
+
+
+def progress(job: DeletionJob) -> float:
+    """Share of the rows counted at scheduling time that are deleted, 0.0 to 1.0."""
+    if job.state == DeletionJob.State.DONE:
+        return 1.0
+    total = sum(job.totals.values())
+    if not total:
+        return 0.0
+    return min(sum(job.deleted.values()) / total, 1.0)
@@ -0,0 +1,142 @@
+# wishlists/exports.py
+"""
+Streaming export of a user's gifts, wishlists and wishlist memberships.
+
+Rows are read through ``.iterator(chunk_size=...)`` (a server-side cursor on
+PostgreSQL) and rendered line by line, so memory use does not depend on the
+size of the account and the first bytes are sent before the queries finish.
+
+Under ASGI, Django 4.2 collects a synchronous iterator into a list before
+sending any of it, so the view streams ``aiter_chunks`` there instead.
+"""
+import csv
+import io
+import json
+import zlib
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Iterable, Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from gifts.models import Gift
+from wishlists.models import Wishlist, WishlistGift
+
+GIFT_FIELDS = ("id", "name", "link", "cost", "image", "status")
+WISHLIST_FIELDS = ("id", "name")
+WISHLIST_GIFT_FIELDS = ("wishlist", "gift")
+
+CSV_COLUMNS = ("type", "id", "name", "link", "cost", "image", "status", "wishlist", "gift")
+
+# Flush rendered lines to the client once this many bytes are buffered.
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    content_type: str
+    extension: str
+    render: Callable[[Iterable[dict]], Iterator[str]]
+
+
+def iter_account_records(user, chunk_size: int | None = None) -> Iterator[dict]:
+    """Yield gifts, then wishlists, then memberships of ``user`` as flat dicts."""
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+
+    gifts = (
+        Gift.objects.filter(user=user)
+        .order_by("id")
+        .values_list(*GIFT_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in gifts:
+        record = dict(zip(GIFT_FIELDS, row), type="gift")
+        if record["cost"] is not None:
+            record["cost"] = str(record["cost"])
+        yield record
+
+    wishlists = (
+        Wishlist.objects.filter(user=user, pending_deletion=False)
+        .order_by("id")
+        .values_list(*WISHLIST_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in wishlists:
+        yield dict(zip(WISHLIST_FIELDS, row), type="wishlist")
+
+    memberships = (
+        WishlistGift.objects.filter(wishlist__user=user, wishlist__pending_deletion=False)
+        # Wishlist order, so a re-import appends gifts in the same order.
+        .order_by("wishlist_id", "position", "id")
+        .values_list("wishlist_id", "gift_id")
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in memberships:
+        yield dict(zip(WISHLIST_GIFT_FIELDS, row), type="wishlist_gift")
+
+
+def render_ndjson(records: Iterable[dict]) -> Iterator[str]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def render_csv(records: Iterable[dict]) -> Iterator[str]:
+    line = io.StringIO()
+    writer = csv.DictWriter(line, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    for record in records:
+        writer.writerow(record)
+        yield line.getvalue()
+        line.seek(0)
+        line.truncate()
+    yield line.getvalue()
+
+
+EXPORT_FORMATS = {
+    "ndjson": ExportFormat("application/x-ndjson", "ndjson", render_ndjson),
+    "csv": ExportFormat("text/csv", "csv", render_csv),
+}
+
+
+def encode_buffered(lines: Iterable[str], buffer_size: int = STREAM_BUFFER_SIZE) -> Iterator[bytes]:
+    """Group small lines into chunks of roughly ``buffer_size`` bytes."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode("utf-8")
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            yield b"".join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+def gzip_stream(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_account(*, user, export_format: ExportFormat, compress: bool = False) -> Iterator[bytes]:
+    stream = encode_buffered(export_format.render(iter_account_records(user)))
+    return gzip_stream(stream) if compress else stream
+
+
+async def aiter_chunks(chunks: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    ``chunks`` as an async iterator: each chunk is produced in the sync
+    thread (where the database connection lives) and sent before the next
+    one is rendered.
+    """
+    done = object()
+    next_chunk = sync_to_async(next)
+    try:
+        while (chunk := await next_chunk(chunks, done)) is not done:
+            yield chunk
+    finally:
+        # Also when the client went away, as Django closes a sync iterator.
+        await sync_to_async(chunks.close)()
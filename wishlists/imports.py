@@ -0,0 +1,273 @@
+# wishlists/imports.py
+"""
+Bulk import of gifts (and their wishlist memberships) from CSV or NDJSON.
+
+Rows are validated in batches with ``GiftSerializer``; invalid rows are
+reported and skipped while the rest of the file keeps loading. Each batch is
+written in its own transaction: with PostgreSQL ``COPY`` (ids are reserved
+from the sequence up front so memberships can be linked without reading the
+rows back), and with ``bulk_create`` on other backends.
+
+Files must be UTF-8 (a leading byte order mark, as spreadsheet programs
+write it, is skipped). The encoding is checked before the first row is
+read, so a file that is not UTF-8 is rejected without importing anything.
+"""
+import codecs
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import IO, Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from gifts.enrichment import enqueue_gift
+from gifts.models import Gift
+from gifts.serializers import GiftSerializer
+from wishlists.models import Wishlist, WishlistGift
+from wishlists.positions import key_between, last_positions
+from wishlists.signals import wishlists_changed
+from wishlists.summary import add_memberships
+
+# Separator of wishlist names inside the CSV "wishlists" column.
+WISHLIST_SEPARATOR = "|"
+OPTIONAL_COLUMNS = ("link", "cost", "image", "status")
+ENCODING = "utf-8-sig"
+_CHECK_CHUNK_SIZE = 64 * 1024
+
+
+class ImportEncodingError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class ParsedRow:
+    line: int
+    data: Optional[dict] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    imported: int = 0
+    memberships: int = 0
+    errors: list = field(default_factory=list)
+    errors_truncated: bool = False
+
+    def add_error(self, line: int, detail) -> None:
+        if len(self.errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": detail})
+        else:
+            self.errors_truncated = True
+
+    @property
+    def failed(self) -> int:
+        return self.total - self.imported
+
+    def as_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "memberships": self.memberships,
+            "errors": self.errors,
+            "errors_truncated": self.errors_truncated,
+        }
+
+
+def open_text(binary: IO[bytes]) -> IO[str]:
+    """
+    ``binary`` (seekable, at its start) as text for the parsers, after
+    decoding it once to check it is UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder(ENCODING)()
+    offset = 0
+    try:
+        for chunk in iter(lambda: binary.read(_CHECK_CHUNK_SIZE), b""):
+            decoder.decode(chunk)
+            offset += len(chunk)
+        decoder.decode(b"", final=True)
+    except UnicodeDecodeError as exc:
+        raise ImportEncodingError(
+            f"The file is not UTF-8 text (invalid byte at offset {offset + exc.start}); save it as UTF-8."
+        )
+    binary.seek(0)
+    return io.TextIOWrapper(binary, encoding=ENCODING, newline="")
+
+
+def iter_csv_rows(stream: IO[str]) -> Iterator[ParsedRow]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        data = {key: value for key, value in row.items() if key is not None}
+        for column in OPTIONAL_COLUMNS:
+            if data.get(column) == "":
+                data.pop(column)
+        names = data.pop("wishlists", "") or ""
+        data["wishlists"] = [name for name in names.split(WISHLIST_SEPARATOR) if name]
+        yield ParsedRow(line=reader.line_num, data=data)
+
+
+def iter_ndjson_rows(stream: IO[str]) -> Iterator[ParsedRow]:
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield ParsedRow(line=line_no, error=f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(data, dict):
+            yield ParsedRow(line=line_no, error="Expected a JSON object.")
+            continue
+        names = data.get("wishlists") or []
+        if isinstance(names, str):
+            names = [name for name in names.split(WISHLIST_SEPARATOR) if name]
+        data["wishlists"] = names
+        yield ParsedRow(line=line_no, data=data)
+
+
+IMPORT_PARSERS = {
+    "csv": iter_csv_rows,
+    "ndjson": iter_ndjson_rows,
+}
+
+
+def import_gifts(*, user, rows: Iterable[ParsedRow], batch_size: Optional[int] = None) -> ImportReport:
+    """Validate and load ``rows`` for ``user`` batch by batch."""
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    report = ImportReport()
+    wishlist_ids: dict[str, int] = {}
+    serializer = GiftSerializer()
+
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        valid = []
+        for row in batch:
+            report.total += 1
+            if row.error:
+                report.add_error(row.line, {"non_field_errors": [row.error]})
+                continue
+            data = dict(row.data)
+            names = data.pop("wishlists", [])
+            if not isinstance(names, list) or not all(isinstance(n, str) and len(n) <= 255 for n in names):
+                report.add_error(row.line, {"wishlists": ["Expected a list of wishlist names."]})
+                continue
+            try:
+                validated = serializer.run_validation(data)
+            except ValidationError as exc:
+                report.add_error(row.line, exc.detail)
+                continue
+            valid.append((validated, list(dict.fromkeys(names))))
+
+        if valid:
+            imported, memberships = _load_batch(user, valid, wishlist_ids)
+            report.imported += imported
+            report.memberships += memberships
+    return report
+
+
+@transaction.atomic
+def _load_batch(user, valid: list[tuple[dict, list[str]]], wishlist_ids: dict[str, int]) -> tuple[int, int]:
+    _resolve_wishlists(user, {name for _, names in valid for name in names}, wishlist_ids)
+
+    gifts = [Gift(user=user, **data) for data, _ in valid]
+    if connection.vendor == "postgresql":
+        _copy_gifts(gifts)
+    elif connection.features.can_return_rows_from_bulk_insert:
+        Gift.objects.bulk_create(gifts)
+    else:
+        for gift in gifts:
+            gift.save(force_insert=True)
+    for gift in gifts:
+        enqueue_gift(gift)
+
+    memberships = [
+        WishlistGift(wishlist_id=wishlist_ids[name], gift_id=gift.id)
+        for gift, (_, names) in zip(gifts, valid)
+        for name in names
+    ]
+    # Imported gifts go to the end of each wishlist, in file order.
+    positions = last_positions({membership.wishlist_id for membership in memberships})
+    for membership in memberships:
+        membership.position = positions[membership.wishlist_id] = key_between(
+            positions.get(membership.wishlist_id), None
+        )
+    WishlistGift.objects.bulk_create(memberships, ignore_conflicts=True)
+    if memberships:
+        add_memberships(sorted(positions), [gift.id for gift in gifts])
+        wishlists_changed.send(sender=WishlistGift, wishlist_ids=sorted(positions))
+    return len(gifts), len(memberships)
+
+
+def _resolve_wishlists(user, names: set[str], wishlist_ids: dict[str, int]) -> None:
+    """Map wishlist names to ids in bulk, creating the ones that do not exist yet."""
+    missing = names - wishlist_ids.keys()
+    if not missing:
+        return
+    # Names are not unique per user; the oldest wishlist wins.
+    for wishlist_id, name in (
+        Wishlist.objects.filter(user=user, name__in=missing, pending_deletion=False)
+        .order_by("-id")
+        .values_list("id", "name")
+    ):
+        wishlist_ids[name] = wishlist_id
+    missing -= wishlist_ids.keys()
+    if missing:
+        created = Wishlist.objects.bulk_create([Wishlist(user=user, name=name) for name in sorted(missing)])
+        if created and created[0].pk is None:
+            created = Wishlist.objects.filter(user=user, name__in=missing, pending_deletion=False)
+        wishlist_ids.update((wishlist.name, wishlist.pk) for wishlist in created)
+
+
+def _copy_gifts(gifts: list[Gift]) -> None:
+    """Load ``gifts`` with ``COPY ... FROM STDIN``, assigning ids from the table sequence."""
+    meta = Gift._meta
+    qn = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [meta.db_table, meta.pk.column, len(gifts)],
+        )
+        for gift, (pk,) in zip(gifts, cursor.fetchall()):
+            gift.pk = pk
+
+        fields = meta.concrete_fields
+        buffer = io.StringIO()
+        for gift in gifts:
+            values = (f.get_db_prep_save(f.pre_save(gift, add=True), connection) for f in fields)
+            buffer.write("\t".join(_copy_text(value) for value in values))
+            buffer.write("\n")
+        buffer.seek(0)
+
+        sql = "COPY {} ({}) FROM STDIN".format(
+            qn(meta.db_table), ", ".join(qn(f.column) for f in fields)
+        )
+        raw = cursor.cursor
+        if hasattr(raw, "copy_expert"):  # psycopg2
+            raw.copy_expert(sql, buffer)
+        else:  # psycopg 3
+            with raw.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+    for gift in gifts:
+        gift._state.adding = False
+        gift._state.db = connection.alias
+
+
+def _copy_text(value) -> str:
+    """Render a value in the PostgreSQL COPY text format."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
@@ -0,0 +1,83 @@
+# wishlists/live.py
+"""
+Live updates of wishlists over Server-Sent Events (see bestwishes.live).
+
+A stream per wishlist, for its owner at ``/wishlists/<id>/events/`` and for
+anyone holding the share link at ``/wishlists/shared/<token>/events/``.
+Events are sent once the transaction making the change commits:
+
+- ``gift`` ``{"gift": id, "status": ...}`` when a gift of the wishlist is
+  reserved, bought or made available again;
+- ``wishlist`` ``{"wishlist": id}`` when the wishlist or its memberships
+  changed (gifts added, removed, moved, reordered), telling the client to
+  reload it; a conditional GET makes that cheap;
+- ``resync`` when the client fell behind and events were dropped.
+"""
+from importlib import import_module
+from typing import Optional
+
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+
+from bestwishes.live import publish
+from wishlists.models import Wishlist, WishlistGift
+
+
+def channel(wishlist_id: int) -> str:
+    return f"wishlist:{wishlist_id}"
+
+
+def authorize_owner(request, pk: str) -> Optional[str]:
+    engine = import_module(settings.SESSION_ENGINE)
+    request.session = engine.SessionStore(request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    user = get_user(request)
+    if not user.is_authenticated:
+        raise PermissionDenied
+    if not Wishlist.objects.filter(pk=pk, user=user, pending_deletion=False).exists():
+        return None
+    return channel(int(pk))
+
+
+def authorize_shared(request, token: str) -> Optional[str]:
+    wishlist_id = Wishlist.objects.filter(share_token=token).values_list("pk", flat=True).first()
+    return channel(wishlist_id) if wishlist_id is not None else None
+
+
+ROUTES = [
+    (r"^/wishlists/(?P<pk>\d+)/events/$", authorize_owner),
+    (r"^/wishlists/shared/(?P<token>[^/]+)/events/$", authorize_shared),
+]
+
+
+def publish_wishlist_changes(sender, wishlist_ids, **kwargs):
+    # A values_list queryset is only evaluated after the commit.
+    transaction.on_commit(lambda: _publish_wishlists(wishlist_ids))
+
+
+def publish_gift_changes(sender, gift_ids, changes=None, deleted=False, **kwargs):
+    if deleted:
+        # Sent before the delete: the memberships are still there to read.
+        wishlist_ids = set(WishlistGift.objects.filter(gift_id__in=gift_ids).values_list("wishlist_id", flat=True))
+        if wishlist_ids:
+            transaction.on_commit(lambda: _publish_wishlists(wishlist_ids))
+        return
+    statuses = {
+        gift_id: fields["status"][1]
+        for gift_id, fields in (changes or {}).items()
+        if "status" in fields and fields["status"][0] != fields["status"][1]
+    }
+    if statuses:
+        transaction.on_commit(lambda: _publish_statuses(statuses))
+
+
+def _publish_wishlists(wishlist_ids) -> None:
+    for wishlist_id in set(wishlist_ids):
+        publish(channel(wishlist_id), {"event": "wishlist", "data": {"wishlist": wishlist_id}})
+
+
+def _publish_statuses(statuses: dict) -> None:
+    memberships = WishlistGift.objects.filter(gift_id__in=list(statuses)).values_list("wishlist_id", "gift_id")
+    for wishlist_id, gift_id in memberships:
+        publish(channel(wishlist_id), {"event": "gift", "data": {"gift": gift_id, "status": statuses[gift_id]}})
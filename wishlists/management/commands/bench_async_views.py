@@ -0,0 +1,174 @@
+import asyncio
+import io
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from bestwishes.asyncviews import async_read_views
+from gifts.models import Gift
+from wishlists.models import Wishlist, WishlistGift
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the read endpoints: sync views behind a "
+        "threaded WSGI handler vs. async views behind the ASGI application, both in process. "
+        "--latency adds a sleep to every SQL statement to stand in for a slow database. "
+        "Creates a throwaway user and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per server.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Requests in flight at once.")
+        parser.add_argument("--threads", type=int, default=8, help="Worker threads of the WSGI server.")
+        parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every SQL statement.")
+        parser.add_argument("--gifts", type=int, default=100)
+
+    def handle(self, *args, requests, concurrency, threads, latency, gifts, **options):
+        user = get_user_model().objects.create_user(email=f"bench-{uuid.uuid4().hex}@example.com")
+        try:
+            paths = self._seed(user, gifts)
+            client = Client()
+            client.force_login(user)
+            cookie = f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+            targets = [paths[i % len(paths)] for i in range(requests)]
+
+            with _slow_queries(latency):
+                with async_read_views(False):
+                    wsgi = self._run_wsgi(targets, cookie, threads)
+                with async_read_views(True):
+                    asgi = asyncio.run(self._run_asgi(targets, cookie, concurrency))
+        finally:
+            user.delete()
+
+        for label, (_, bodies) in (("WSGI", wsgi), ("ASGI", asgi)):
+            failed = [path for path, (status, _) in bodies.items() if status != 200]
+            if failed:
+                raise CommandError(f"{label}: non-200 responses for {', '.join(failed)}")
+        if {path: body for path, (_, body) in wsgi[1].items()} != {path: body for path, (_, body) in asgi[1].items()}:
+            raise CommandError("ASGI and WSGI responses differ.")
+
+        self.stdout.write(f"{requests} requests over {len(paths)} endpoints, {latency * 1000:.0f} ms per query:")
+        self._report(f"WSGI, {threads} threads", wsgi[0], requests)
+        self._report(f"ASGI, {concurrency} in flight", asgi[0], requests)
+        self.stdout.write(self.style.SUCCESS(f"  ASGI/WSGI throughput: {_throughput(asgi[0]) / _throughput(wsgi[0]):.2f}x"))
+
+    def _seed(self, user, count):
+        Gift.objects.bulk_create(Gift(name=f"Bench gift {i}", cost=i, user=user) for i in range(count))
+        wishlist = Wishlist.objects.create(name="Bench list", user=user)
+        gift_ids = list(Gift.objects.filter(user=user).values_list("id", flat=True))
+        WishlistGift.objects.bulk_create(WishlistGift(wishlist=wishlist, gift_id=gift_id) for gift_id in gift_ids[:20])
+        return ["/gifts/", f"/gifts/{gift_ids[0]}/", "/wishlists/", f"/wishlists/{wishlist.pk}/", "/users/me/"]
+
+    def _run_wsgi(self, targets, cookie, threads):
+        handler = WSGIHandler()
+
+        def call(path):
+            environ = {
+                "REQUEST_METHOD": "GET", "PATH_INFO": path, "HTTP_HOST": "testserver", "SERVER_NAME": "testserver",
+                "HTTP_COOKIE": cookie, "wsgi.input": io.BytesIO(),
+            }
+            setup_testing_defaults(environ)
+            status = []
+            began = time.perf_counter()
+            response = handler(environ, lambda status_line, headers: status.append(int(status_line[:3])))
+            body = b"".join(response)
+            response.close()
+            return path, status[0], body, time.perf_counter() - began
+
+        began = time.perf_counter()
+        with ThreadPoolExecutor(threads) as pool:
+            results = list(pool.map(call, targets))
+        return _summary(results, time.perf_counter() - began)
+
+    async def _run_asgi(self, targets, cookie, concurrency):
+        from bestwishes.asgi import application
+
+        slots = asyncio.Semaphore(concurrency)
+
+        async def call(path):
+            scope = {
+                "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "",
+                "headers": [(b"host", b"testserver"), (b"cookie", cookie.encode())],
+                "client": ("127.0.0.1", 0), "server": ("testserver", 80),
+            }
+            requested = False
+
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                await asyncio.Event().wait()
+
+            status, body = [], []
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+                else:
+                    body.append(message.get("body", b""))
+
+            async with slots:
+                began = time.perf_counter()
+                await application(scope, receive, send)
+                return path, status[0], b"".join(body), time.perf_counter() - began
+
+        began = time.perf_counter()
+        results = await asyncio.gather(*(call(path) for path in targets))
+        return _summary(results, time.perf_counter() - began)
+
+    def _report(self, label, timings, count):
+        elapsed, latencies = timings
+        quantiles = statistics.quantiles(latencies, n=20) if len(latencies) > 1 else latencies * 19
+        self.stdout.write(f"  {label}:")
+        self.stdout.write(f"    throughput: {count / elapsed:8.1f} req/s ({elapsed:.2f} s)")
+        self.stdout.write(f"    latency:    p50 {quantiles[9] * 1000:7.1f} ms, p95 {quantiles[18] * 1000:7.1f} ms")
+
+
+def _summary(results, elapsed):
+    """((elapsed, latencies), {path: (status, body)})"""
+    return (elapsed, [latency for *_, latency in results]), {path: (status, body) for path, status, body, _ in results}
+
+
+def _throughput(timings):
+    elapsed, latencies = timings
+    return len(latencies) / max(elapsed, 1e-9)
+
+
+@contextmanager
+def _slow_queries(latency: float):
+    """Sleep ``latency`` seconds before every statement, on every connection of every thread."""
+    if not latency:
+        yield
+        return
+
+    def delay(execute, sql, params, many, context):
+        time.sleep(latency)
+        return execute(sql, params, many, context)
+
+    def install(sender, connection, **kwargs):
+        connection.execute_wrappers.append(delay)
+
+    connection_created.connect(install)
+    for connection in connections.all():
+        connection.execute_wrappers.append(delay)
+    try:
+        yield
+    finally:
+        connection_created.disconnect(install)
+        for connection in connections.all():
+            if delay in connection.execute_wrappers:
+                connection.execute_wrappers.remove(delay)
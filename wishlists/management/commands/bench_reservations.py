@@ -0,0 +1,108 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection
+
+from gifts.models import Gift
+from gifts.services import GiftStatusConflict
+from wishlists.models import Wishlist, WishlistGift
+from wishlists.services import reserve_shared_gift, share_wishlist
+
+
+def _naive_reserve(*, user, token, gift_id):
+    """The read-modify-write a generic PATCH performs, kept for comparison."""
+    gift = Gift.objects.get(id=gift_id, wishlists__share_token=token)
+    if gift.status != Gift.Status.AVAILABLE:
+        raise GiftStatusConflict()
+    time.sleep(0)  # yield to other threads between the read and the write
+    gift.status = Gift.Status.RESERVED
+    gift.reserved_by = user
+    gift.save(update_fields=["status", "reserved_by"])
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark concurrent gift reservations: guests of a shared wishlist, one per thread, "
+        "race to reserve the same gifts. Creates throwaway users and gifts and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--gifts", type=int, default=200)
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument(
+            "--naive",
+            action="store_true",
+            help="Use read-modify-write instead of the conditional UPDATE to show lost updates.",
+        )
+
+    def handle(self, *args, gifts, threads, naive, **options):
+        User = get_user_model()
+        owner = User.objects.create_user(email=f"bench-{uuid.uuid4().hex}@example.com")
+        guests = [User.objects.create_user(email=f"bench-{uuid.uuid4().hex}@example.com") for _ in range(threads)]
+        try:
+            self._run(owner, guests, gifts, naive)
+        finally:
+            User.objects.filter(pk__in=[owner.pk] + [guest.pk for guest in guests]).delete()
+
+    def _run(self, owner, guests, gift_count, naive):
+        thread_count = len(guests)
+        Gift.objects.bulk_create(Gift(name=f"Bench gift {i}", user=owner) for i in range(gift_count))
+        gift_ids = list(Gift.objects.filter(user=owner).values_list("id", flat=True))
+        wishlist = Wishlist.objects.create(name="Bench list", user=owner)
+        WishlistGift.objects.bulk_create(WishlistGift(wishlist=wishlist, gift_id=gift_id) for gift_id in gift_ids)
+        token = share_wishlist(user=owner, wishlist=wishlist)
+        reserve = _naive_reserve if naive else reserve_shared_gift
+
+        wins = Counter()
+        errors = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(thread_count + 1)
+
+        def worker(guest):
+            order = gift_ids[:]
+            random.shuffle(order)
+            won, failed = [], 0
+            start.wait()
+            try:
+                for gift_id in order:
+                    try:
+                        reserve(user=guest, token=token, gift_id=gift_id)
+                        won.append(gift_id)
+                    except GiftStatusConflict:
+                        pass
+                    except DatabaseError:
+                        failed += 1
+            finally:
+                connection.close()
+            with lock:
+                wins.update(won)
+                errors["database"] += failed
+
+        workers = [threading.Thread(target=worker, args=(guest,)) for guest in guests]
+        for thread in workers:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        attempts = gift_count * thread_count
+        reserved = Gift.objects.filter(user=owner, status=Gift.Status.RESERVED).count()
+        double_wins = sum(1 for count in wins.values() if count > 1)
+
+        self.stdout.write(f"mode:            {'read-modify-write' if naive else 'conditional UPDATE'}")
+        self.stdout.write(f"threads x gifts: {thread_count} x {gift_count} = {attempts} attempts")
+        self.stdout.write(f"elapsed:         {elapsed:.3f}s ({attempts / elapsed:,.0f} attempts/s)")
+        self.stdout.write(f"reserved gifts:  {reserved}/{gift_count}")
+        self.stdout.write(f"winning calls:   {sum(wins.values())}")
+        self.stdout.write(f"database errors: {errors['database']}")
+        if double_wins:
+            self.stdout.write(self.style.ERROR(f"{double_wins} gifts were reserved by more than one caller"))
+        elif reserved == gift_count and sum(wins.values()) == gift_count:
+            self.stdout.write(self.style.SUCCESS("every gift was reserved exactly once"))
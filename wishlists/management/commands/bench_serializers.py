@@ -0,0 +1,103 @@
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bestwishes.fastread import get_reader
+from gifts.models import Gift
+from gifts.serializers import GiftSerializer
+from wishlists.models import Wishlist, WishlistGift
+from wishlists.serializers import WishlistSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the list fast path (.values() + compiled converters) with the regular "
+        "ModelSerializer on the same rows. Creates a throwaway user and deletes it afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=2000)
+        parser.add_argument("--gifts-per-wishlist", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, rows, gifts_per_wishlist, repeat, **options):
+        user = get_user_model().objects.create_user(email=f"bench-{uuid.uuid4().hex}@example.com")
+        try:
+            self._seed(user, rows, gifts_per_wishlist)
+            self._compare("gifts", Gift.objects.filter(user=user).order_by("id"), GiftSerializer, repeat)
+            self._compare("wishlists", Wishlist.objects.filter(user=user).order_by("id"), WishlistSerializer, repeat)
+        finally:
+            user.delete()
+
+    def _seed(self, user, rows, gifts_per_wishlist):
+        Gift.objects.bulk_create(
+            Gift(
+                name=f"Bench gift {i}",
+                link=f"https://example.com/gifts/{i}",
+                image=f"https://example.com/gifts/{i}.jpg",
+                cost=f"{i % 1000}.{i % 100:02d}" if i % 7 else None,
+                user=user,
+            )
+            for i in range(rows)
+        )
+        Wishlist.objects.bulk_create(Wishlist(name=f"Bench list {i}", user=user) for i in range(rows))
+        gift_ids = list(Gift.objects.filter(user=user).values_list("id", flat=True))
+        wishlist_ids = list(Wishlist.objects.filter(user=user).values_list("id", flat=True))
+        WishlistGift.objects.bulk_create(
+            WishlistGift(wishlist_id=wishlist_id, gift_id=gift_ids[(i + j) % len(gift_ids)])
+            for i, wishlist_id in enumerate(wishlist_ids)
+            for j in range(min(gifts_per_wishlist, len(gift_ids)))
+        )
+
+    def _compare(self, label, queryset, serializer_class, repeat):
+        serializer = serializer_class()
+        reader = get_reader(serializer)
+        if reader is None:
+            raise CommandError(f"{serializer_class.__name__} cannot be compiled for the fast path.")
+
+        instances = list(queryset.all())
+        rows = list(queryset.values(*reader.columns))
+        if _normalized(serializer_class(instances, many=True).data) != _normalized(reader.represent(rows)):
+            raise CommandError(f"{label}: fast path output differs from {serializer_class.__name__}.")
+
+        count = len(rows)
+        self.stdout.write(f"{label} ({count} rows, best of {repeat}):")
+        # Representation only: model instances vs. rows that are already loaded.
+        self._report(
+            "representation",
+            self._best_of(lambda: serializer_class(instances, many=True).data, repeat),
+            self._best_of(lambda: reader.represent(rows), repeat),
+            count,
+        )
+        # End to end: query, row construction and representation.
+        self._report(
+            "end to end",
+            self._best_of(lambda: serializer_class(list(queryset.all()), many=True).data, repeat),
+            self._best_of(lambda: reader.represent(list(queryset.values(*reader.columns))), repeat),
+            count,
+        )
+
+    def _report(self, label, regular_time, fast_time, count):
+        self.stdout.write(f"  {label}:")
+        self.stdout.write(f"    serializer: {regular_time * 1000:8.1f} ms ({regular_time / count * 1e6:6.1f} us/row)")
+        self.stdout.write(f"    fast path:  {fast_time * 1000:8.1f} ms ({fast_time / count * 1e6:6.1f} us/row)")
+        self.stdout.write(self.style.SUCCESS(f"    speedup:    {regular_time / fast_time:.1f}x"))
+
+    @staticmethod
+    def _best_of(func, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            began = time.perf_counter()
+            func()
+            best = min(best, time.perf_counter() - began)
+        return best
+
+
+def _normalized(data):
+    """Plain dicts with many-to-many id lists sorted; their order is not defined."""
+    return [
+        {key: sorted(value) if isinstance(value, list) else value for key, value in item.items()}
+        for item in data
+    ]
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from wishlists.imports import IMPORT_PARSERS, ImportEncodingError, import_gifts, open_text
+
+
+class Command(BaseCommand):
+    help = "Bulk import gifts and wishlist memberships for a user from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to import.")
+        parser.add_argument("--email", required=True, help="Email of the user who will own the gifts.")
+        parser.add_argument(
+            "--format",
+            dest="file_format",
+            choices=sorted(IMPORT_PARSERS),
+            help="File format; guessed from the file extension when omitted.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None, help="Rows validated and written per transaction.")
+
+    def handle(self, *args, path, email, file_format, batch_size, **options):
+        User = get_user_model()
+        try:
+            user = User.objects.get(email=email)
+        except User.DoesNotExist:
+            raise CommandError(f"User {email!r} does not exist.")
+
+        file_format = file_format or Path(path).suffix.lstrip(".").lower()
+        if file_format not in IMPORT_PARSERS:
+            raise CommandError("Cannot guess the file format, pass --format.")
+
+        with open(path, "rb") as binary:
+            try:
+                stream = open_text(binary)
+            except ImportEncodingError as exc:
+                raise CommandError(str(exc))
+            report = import_gifts(user=user, rows=IMPORT_PARSERS[file_format](stream), batch_size=batch_size)
+
+        for error in report.errors:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if report.errors_truncated:
+            self.stderr.write("... more errors omitted")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report.imported} of {report.total} rows "
+            f"({report.failed} failed, {report.memberships} wishlist memberships)."
+        ))
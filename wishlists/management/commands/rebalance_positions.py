@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.db.models.functions import Length
+
+from wishlists.models import WishlistGift
+from wishlists.positions import rebalance_wishlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite the gift ordering keys of wishlists whose keys grew too long "
+        "(or are missing) as short consecutive keys. The order is kept."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-length",
+            type=int,
+            default=settings.WISHLIST_POSITION_MAX_LENGTH,
+            help="Rebalance wishlists having a key longer than this.",
+        )
+        parser.add_argument(
+            "--wishlist",
+            type=int,
+            action="append",
+            dest="wishlist_ids",
+            help="Rebalance this wishlist regardless of its key lengths; may be repeated.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only list the wishlists that need it.")
+
+    def handle(self, *args, max_length, wishlist_ids, dry_run, **options):
+        if not wishlist_ids:
+            wishlist_ids = list(
+                WishlistGift.objects
+                .annotate(length=Length("position"))
+                .filter(Q(length__gt=max_length) | Q(position=""))
+                .order_by("wishlist_id")
+                .values_list("wishlist_id", flat=True)
+                .distinct()
+            )
+
+        for wishlist_id in wishlist_ids:
+            if dry_run:
+                self.stdout.write(f"wishlist {wishlist_id}: needs rebalancing")
+                continue
+            count = rebalance_wishlist(wishlist_id)
+            self.stdout.write(f"wishlist {wishlist_id}: {count} positions rewritten")
+        self.stdout.write(self.style.SUCCESS(f"{len(wishlist_ids)} wishlists {'to rebalance' if dry_run else 'rebalanced'}"))
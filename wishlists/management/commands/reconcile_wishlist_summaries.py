@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wishlists.models import Wishlist
+from wishlists.summary import reconcile_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the gift count, total cost and reserved count of wishlists "
+        "from their gifts, in batches, and repair the ones that drifted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.WISHLIST_SUMMARY_BATCH_SIZE,
+            help="Wishlists checked per transaction.",
+        )
+        parser.add_argument(
+            "--wishlist",
+            type=int,
+            action="append",
+            dest="wishlist_ids",
+            help="Only check this wishlist; may be repeated.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only list the wishlists that drifted.")
+
+    def handle(self, *args, batch_size, wishlist_ids, dry_run, **options):
+        wishlists = Wishlist.objects.order_by("pk")
+        if wishlist_ids:
+            wishlists = wishlists.filter(pk__in=wishlist_ids)
+
+        checked = drifted = 0
+        last_pk = 0
+        # Keyset batches: each one is a short transaction of its own.
+        while batch := list(wishlists.filter(pk__gt=last_pk).values_list("pk", flat=True)[:batch_size]):
+            last_pk = batch[-1]
+            for wishlist_id in reconcile_summaries(batch, dry_run=dry_run):
+                self.stdout.write(f"wishlist {wishlist_id}: {'drifted' if dry_run else 'repaired'}")
+                drifted += 1
+            checked += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f"{checked} wishlists checked, {drifted} {'drifted' if dry_run else 'repaired'}"
+        ))
@@ -0,0 +1,53 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from wishlists.deletion import claim_next_job, progress, run_job
+from wishlists.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Work through background deletions of users and wishlists in small, "
+        "throttled batches. Jobs interrupted by a crash are resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Exit when no job is left instead of polling.")
+        parser.add_argument("--batch-size", type=int, default=settings.DELETION_BATCH_SIZE)
+        parser.add_argument(
+            "--pause", type=float, default=settings.DELETION_BATCH_PAUSE, help="Seconds to sleep between batches."
+        )
+        parser.add_argument("--retry-failed", action="store_true", help="Queue failed jobs again first.")
+
+    def handle(self, *args, once, batch_size, pause, retry_failed, verbosity, **options):
+        self.verbosity = verbosity
+        if retry_failed:
+            retried = DeletionJob.objects.filter(state=DeletionJob.State.FAILED).update(
+                state=DeletionJob.State.PENDING, heartbeat=None
+            )
+            self.stdout.write(f"{retried} failed jobs queued again")
+
+        finished = 0
+        while True:
+            job = claim_next_job()
+            if job is None:
+                if once:
+                    break
+                time.sleep(settings.DELETION_JOB_POLL_INTERVAL)
+                continue
+
+            self.stdout.write(f"job {job.pk}: deleting {job.kind} {job.target_id} (attempt {job.attempts})")
+            job = run_job(job, batch_size=batch_size, pause=pause, report=self._report)
+            if job.state == DeletionJob.State.DONE:
+                self.stdout.write(self.style.SUCCESS(f"job {job.pk}: done, {sum(job.deleted.values())} rows deleted"))
+            else:
+                self.stdout.write(self.style.ERROR(f"job {job.pk}: {job.state}: {job.error}"))
+            finished += 1
+        self.stdout.write(self.style.SUCCESS(f"{finished} jobs processed"))
+
+    def _report(self, job):
+        if self.verbosity > 1:
+            counts = ", ".join(f"{label} {count}" for label, count in job.deleted.items())
+            self.stdout.write(f"job {job.pk}: {progress(job):.0%} ({counts})")
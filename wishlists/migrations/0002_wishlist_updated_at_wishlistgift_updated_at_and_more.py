@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='wishlistgift',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['user', 'updated_at'], name='wishlist_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlistgift',
+            index=models.Index(fields=['wishlist', 'updated_at'], name='wishlistgift_updated_idx'),
+        ),
+    ]
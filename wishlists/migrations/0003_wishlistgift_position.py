@@ -0,0 +1,75 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:18
+
+from itertools import groupby
+
+from django.db import migrations, models
+
+# Position keys must compare byte-wise; PostgreSQL otherwise uses the
+# database's linguistic collation. Runs before the index is created.
+COLLATE_SQL = 'ALTER TABLE wishlists_wishlistgift ALTER COLUMN position TYPE varchar(255) COLLATE "C"'
+RESET_COLLATE_SQL = 'ALTER TABLE wishlists_wishlistgift ALTER COLUMN position TYPE varchar(255) COLLATE "default"'
+
+
+def _run(statement):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.execute(statement)
+    return run
+
+
+# Base-62 digits of wishlists.positions, inlined so the migration keeps
+# working whatever that module later imports or becomes.
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def first_keys(count):
+    """The first ``count`` keys handed out when appending: 'a0' .. 'az', 'b00', ..."""
+    head, digits = "a", [0]
+    for _ in range(count):
+        yield head + "".join(DIGITS[digit] for digit in digits)
+        index = len(digits) - 1
+        while index >= 0 and digits[index] == len(DIGITS) - 1:
+            digits[index] = 0
+            index -= 1
+        if index >= 0:
+            digits[index] += 1
+        else:
+            # Out of digits: the next length, whose first value is all zeros.
+            head = chr(ord(head) + 1)
+            digits.append(0)
+
+
+def assign_positions(apps, schema_editor):
+    """Keep the current (insertion) order of every wishlist."""
+    WishlistGift = apps.get_model("wishlists", "WishlistGift")
+    memberships = WishlistGift.objects.order_by("wishlist_id", "id").only("id", "wishlist_id").iterator()
+    for _, group in groupby(memberships, key=lambda membership: membership.wishlist_id):
+        group = list(group)
+        for membership, key in zip(group, first_keys(len(group))):
+            membership.position = key
+        WishlistGift.objects.bulk_update(group, ["position"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0002_wishlist_updated_at_wishlistgift_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='wishlistgift',
+            options={'ordering': ['position', 'id']},
+        ),
+        migrations.AddField(
+            model_name='wishlistgift',
+            name='position',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.RunPython(assign_positions, migrations.RunPython.noop),
+        migrations.RunPython(_run(COLLATE_SQL), _run(RESET_COLLATE_SQL)),
+        migrations.AddIndex(
+            model_name='wishlistgift',
+            index=models.Index(fields=['wishlist', 'position'], name='wishlistgift_position_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0003_wishlistgift_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='share_token',
+            field=models.CharField(blank=True, max_length=43, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_summaries(apps, schema_editor):
+    """One UPDATE with correlated aggregates over the memberships."""
+    Wishlist = apps.get_model("wishlists", "Wishlist")
+    WishlistGift = apps.get_model("wishlists", "WishlistGift")
+    memberships = WishlistGift.objects.filter(wishlist=OuterRef("pk")).order_by().values("wishlist")
+    zero = Value(Decimal("0.00"), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+    Wishlist.objects.update(
+        gift_count=Coalesce(Subquery(memberships.annotate(value=Count("pk")).values("value")), 0),
+        total_cost=Coalesce(Subquery(memberships.annotate(value=Sum("gift__cost")).values("value")), zero),
+        reserved_count=Coalesce(
+            Subquery(memberships.annotate(value=Count("pk", filter=Q(gift__status="reserved"))).values("value")), 0
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0004_wishlist_version_share_token'),
+        ('gifts', '0004_gift_updated_at_gift_gift_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='gift_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='reserved_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='wishlist',
+            name='total_cost',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
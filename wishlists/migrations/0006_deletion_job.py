@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0005_wishlist_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wishlist',
+            name='pending_deletion',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('user', 'User'), ('wishlist', 'Wishlist')], max_length=20)),
+                ('target_id', models.BigIntegerField()),
+                ('requested_by_id', models.BigIntegerField(blank=True, null=True)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('totals', models.JSONField(default=dict)),
+                ('deleted', models.JSONField(default=dict)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('heartbeat', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'heartbeat'], name='deletionjob_state_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='deletionjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('state__in', ['pending', 'running'])), fields=('kind', 'target_id'), name='deletionjob_one_active'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.30 on 2026-10-18 02:48
+
+from django.db import migrations, models
+
+# Existing rows get one change each, numbered per user, so a first sync from
+# cursor 0 returns everything. The triggers recording later changes are
+# created after migrate by wishlists.sync.ensure_change_triggers.
+BACKFILL_CHANGES_SQL = (
+    "INSERT INTO wishlists_syncchange (user_id, kind, object_id, seq, deleted) "
+    "SELECT user_id, kind, object_id, row_number() OVER (PARTITION BY user_id ORDER BY kind, object_id), FALSE "
+    "FROM ("
+    "SELECT user_id, 'gift' AS kind, id AS object_id FROM gifts_gift "
+    "UNION ALL SELECT user_id, 'wishlist', id FROM wishlists_wishlist "
+    "UNION ALL SELECT w.user_id, 'wishlist_gift', m.id FROM wishlists_wishlistgift m "
+    "JOIN wishlists_wishlist w ON w.id = m.wishlist_id"
+    ") AS objects"
+)
+BACKFILL_COUNTERS_SQL = (
+    "INSERT INTO wishlists_synccounter (user_id, seq) "
+    "SELECT user_id, MAX(seq) FROM wishlists_syncchange GROUP BY user_id"
+)
+
+
+def backfill(apps, schema_editor):
+    schema_editor.execute(BACKFILL_CHANGES_SQL)
+    schema_editor.execute(BACKFILL_COUNTERS_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0006_deletion_job'),
+        ('gifts', '0004_gift_updated_at_gift_gift_user_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCounter',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('seq', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_id', models.BigIntegerField()),
+                ('kind', models.CharField(choices=[('gift', 'Gift'), ('wishlist', 'Wishlist'), ('wishlist_gift', 'Wishlist gift')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('seq', models.BigIntegerField()),
+                ('deleted', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user_id', 'seq'], name='syncchange_user_seq_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='syncchange',
+            constraint=models.UniqueConstraint(fields=('user_id', 'kind', 'object_id'), name='syncchange_object_unique'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
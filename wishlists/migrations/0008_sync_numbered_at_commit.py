@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 04:14
+
+from django.db import migrations, models
+
+# The change triggers are dropped first and recreated after migrate by
+# wishlists.sync.ensure_change_triggers: on PostgreSQL the per-row ones give
+# way to statement-level ones that leave the numbering to commit time, and
+# SQLite cannot rebuild wishlists_syncchange while triggers refer to it.
+TRACKED_TABLES = ["gifts_gift", "wishlists_wishlist", "wishlists_wishlistgift"]
+
+
+def drop_change_triggers(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    for table in TRACKED_TABLES:
+        if vendor == "postgresql":
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_sync_write ON {table}")
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_sync_update ON {table}")
+        elif vendor == "sqlite":
+            for event in ("insert", "update", "delete"):
+                schema_editor.execute(f"DROP TRIGGER IF EXISTS {table}_sync_{event}")
+    if vendor == "postgresql":
+        schema_editor.execute("DROP FUNCTION IF EXISTS wishlists_record_change()")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wishlists', '0007_sync_changes'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_change_triggers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='syncchange',
+            name='seq',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='syncchange',
+            index=models.Index(condition=models.Q(('seq__isnull', True)), fields=['id'], name='syncchange_pending_idx'),
+        ),
+    ]
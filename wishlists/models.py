@@ -14,6 +14,25 @@ class Wishlist(models.Model):
         through="WishlistGift",
         related_name="wishlists",
     )
+    updated_at = models.DateTimeField(auto_now=True)
+    # Bumped on every change of the wishlist, its memberships or its gifts
+    # (see wishlists.signals); versions the cached public representation.
+    version = models.PositiveBigIntegerField(default=0)
+    # Unguessable token of the public read-only link, if shared.
+    share_token = models.CharField(max_length=43, unique=True, null=True, blank=True)
+    # Denormalized summary of the wishlist's gifts, shifted by deltas on
+    # every change (see wishlists.summary). Plain integers rather than
+    # positive ones: drift must not make writes fail before it is reconciled.
+    gift_count = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    reserved_count = models.IntegerField(default=0)
+    # Hidden from its owner while a DeletionJob removes it in the background.
+    pending_deletion = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "updated_at"], name="wishlist_user_updated_idx"),
+        ]
 
     def __str__(self) -> str:
         return self.name
@@ -22,6 +41,101 @@ class Wishlist(models.Model):
 class WishlistGift(models.Model):
     wishlist = models.ForeignKey("wishlists.Wishlist", on_delete=models.CASCADE)
     gift = models.ForeignKey("gifts.Gift", on_delete=models.CASCADE)
+    # Fractional ordering key, see wishlists.positions. Keys must compare
+    # byte-wise: on PostgreSQL the column is switched to the "C" collation
+    # in migration 0003, which an AlterField here would undo.
+    position = models.CharField(max_length=255, default="", blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ("wishlist", "gift")
+        ordering = ["position", "id"]
+        indexes = [
+            models.Index(fields=["wishlist", "updated_at"], name="wishlistgift_updated_idx"),
+            models.Index(fields=["wishlist", "position"], name="wishlistgift_position_idx"),
+        ]
+
+
+class DeletionJob(models.Model):
+    """A user or wishlist being deleted in the background, see wishlists.deletion."""
+
+    class Kind(models.TextChoices):
+        USER = "user", "User"
+        WISHLIST = "wishlist", "Wishlist"
+
+    class State(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    # Plain ids rather than foreign keys: the job outlives the rows it deletes.
+    target_id = models.BigIntegerField()
+    requested_by_id = models.BigIntegerField(null=True, blank=True)
+    state = models.CharField(max_length=20, choices=State.choices, default=State.PENDING)
+    # Rows per model label: to delete (counted when scheduled) and deleted so far.
+    totals = models.JSONField(default=dict)
+    deleted = models.JSONField(default=dict)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Moved by every batch; a running job whose heartbeat goes stale is resumed.
+    heartbeat = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["kind", "target_id"],
+                condition=models.Q(state__in=["pending", "running"]),
+                name="deletionjob_one_active",
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["state", "heartbeat"], name="deletionjob_state_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.target_id} ({self.state})"
+
+
+
+class SyncCounter(models.Model):
+    """Last change sequence number handed out for a user, see wishlists.sync."""
+
+    user_id = models.BigIntegerField(primary_key=True)
+    seq = models.BigIntegerField(default=0)
+
+
+class SyncChange(models.Model):
+    """
+    Latest change of one gift, wishlist or membership of a user: written by
+    the database triggers of wishlists.sync, one row per object, deletions
+    kept as tombstones.
+    """
+
+    class Kind(models.TextChoices):
+        GIFT = "gift", "Gift"
+        WISHLIST = "wishlist", "Wishlist"
+        WISHLIST_GIFT = "wishlist_gift", "Wishlist gift"
+
+    # Plain ids rather than foreign keys: tombstones outlive their objects.
+    user_id = models.BigIntegerField()
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    # NULL while the writing transaction is open on PostgreSQL; numbered at commit.
+    seq = models.BigIntegerField(null=True)
+    deleted = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "kind", "object_id"], name="syncchange_object_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["user_id", "seq"], name="syncchange_user_seq_idx"),
+            models.Index(fields=["id"], condition=models.Q(seq__isnull=True), name="syncchange_pending_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.kind} {self.object_id} @ {self.seq}"
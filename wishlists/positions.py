@@ -0,0 +1,204 @@
+# wishlists/positions.py
+"""
+Fractional ordering keys for gifts inside a wishlist.
+
+Every ``WishlistGift`` carries a ``position`` string; a wishlist's gifts are
+ordered by ``(position, id)``. Keys are base-62 strings compared byte-wise
+(C collation), so a key strictly between any two others always exists and
+moving one gift rewrites only that gift's row.
+
+A key is an "integer part" followed by an optional fraction. The first
+character of the integer part encodes its length ('a' = one digit,
+'b' = two, ...; 'Z', 'Y', ... for the negative side), which keeps keys
+appended at the end or prepended at the start short: appending is an
+increment, not a midpoint. Keys only get long when gifts are repeatedly
+squeezed into the same gap; ``rebalance_wishlist`` then rewrites the keys
+of that wishlist as consecutive integers.
+"""
+from itertools import islice
+from typing import Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from wishlists.models import WishlistGift
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+ZERO = DIGITS[0]
+SMALLEST_INTEGER = "A" + ZERO * 26
+FIRST_KEY = "a" + ZERO
+
+
+class InvalidPosition(ValueError):
+    pass
+
+
+def key_between(a: Optional[str], b: Optional[str]) -> str:
+    """Return a key sorting strictly between ``a`` and ``b`` (``None`` = open end)."""
+    if a is not None:
+        _validate(a)
+    if b is not None:
+        _validate(b)
+    if a is not None and b is not None and a >= b:
+        raise InvalidPosition(f"{a!r} is not before {b!r}")
+
+    if a is None:
+        if b is None:
+            return FIRST_KEY
+        integer_b = _integer_part(b)
+        fraction_b = b[len(integer_b):]
+        if integer_b == SMALLEST_INTEGER:
+            return integer_b + _midpoint("", fraction_b)
+        if integer_b < b:
+            return integer_b
+        decremented = _decrement_integer(integer_b)
+        if decremented is None:
+            raise InvalidPosition("cannot create a key before the smallest key")
+        return decremented
+
+    integer_a = _integer_part(a)
+    fraction_a = a[len(integer_a):]
+    if b is None:
+        incremented = _increment_integer(integer_a)
+        return integer_a + _midpoint(fraction_a, None) if incremented is None else incremented
+
+    integer_b = _integer_part(b)
+    fraction_b = b[len(integer_b):]
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    incremented = _increment_integer(integer_a)
+    if incremented is None:
+        raise InvalidPosition("cannot create a key after the largest key")
+    if incremented < b:
+        return incremented
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_after(a: Optional[str], count: int) -> Iterator[str]:
+    """Yield ``count`` increasing keys after ``a``."""
+    for _ in range(count):
+        a = key_between(a, None)
+        yield a
+
+
+def last_position(wishlist_id: int) -> Optional[str]:
+    return WishlistGift.objects.filter(wishlist_id=wishlist_id).aggregate(last=Max("position"))["last"] or None
+
+
+def last_positions(wishlist_ids) -> dict[int, str]:
+    """The greatest key of each wishlist in one grouped query."""
+    rows = (
+        WishlistGift.objects
+        .filter(wishlist_id__in=wishlist_ids)
+        .order_by()
+        .values("wishlist_id")
+        .annotate(last=Max("position"))
+        .values_list("wishlist_id", "last")
+    )
+    return {wishlist_id: last for wishlist_id, last in rows if last}
+
+
+@transaction.atomic
+def rebalance_wishlist(wishlist_id: int, batch_size: Optional[int] = None) -> int:
+    """Rewrite the keys of a wishlist as short consecutive keys, keeping the order."""
+    batch_size = batch_size or settings.WISHLIST_POSITION_BATCH_SIZE
+    memberships = (
+        WishlistGift.objects
+        .select_for_update()
+        .filter(wishlist_id=wishlist_id)
+        .order_by("position", "id")
+        .only("id", "position")
+    )
+    keys = keys_after(None, memberships.count())
+    rows = iter(memberships)
+    total = 0
+    while batch := list(islice(rows, batch_size)):
+        for membership in batch:
+            membership.position = next(keys)
+        WishlistGift.objects.bulk_update(batch, ["position"])
+        total += len(batch)
+    return total
+
+
+def _validate(key: str) -> None:
+    if not key:
+        raise InvalidPosition("empty key")
+    if key == SMALLEST_INTEGER:
+        raise InvalidPosition(f"invalid key {key!r}")
+    integer = _integer_part(key)
+    if len(key) > len(integer) and key.endswith(ZERO):
+        raise InvalidPosition(f"invalid key {key!r}")
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise InvalidPosition(f"invalid key head {head!r}")
+
+
+def _integer_part(key: str) -> str:
+    length = _integer_length(key[0])
+    if length > len(key):
+        raise InvalidPosition(f"invalid key {key!r}")
+    return key[:length]
+
+
+def _increment_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        value = DIGITS.index(digits[index]) + 1
+        if value < len(DIGITS):
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = ZERO
+    if head == "Z":
+        return "a" + ZERO
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(ZERO)
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement_integer(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for index in reversed(range(len(digits))):
+        value = DIGITS.index(digits[index]) - 1
+        if value >= 0:
+            digits[index] = DIGITS[value]
+            return head + "".join(digits)
+        digits[index] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """A fraction strictly between fractions ``a`` and ``b`` (``None`` = 1)."""
+    if b is not None:
+        prefix = 0
+        while prefix < len(b) and (a[prefix] if prefix < len(a) else ZERO) == b[prefix]:
+            prefix += 1
+        if prefix:
+            return b[:prefix] + _midpoint(a[prefix:], b[prefix:])
+
+    digit_a = DIGITS.index(a[0]) if a else 0
+    digit_b = DIGITS.index(b[0]) if b is not None else len(DIGITS)
+    if digit_b - digit_a > 1:
+        return DIGITS[(digit_a + digit_b + 1) // 2]
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[digit_a] + _midpoint(a[1:], None)
@@ -1,21 +1,24 @@
 from rest_framework import serializers
-from .models import Wishlist, WishlistGift
-from gifts.serializers import GiftSerializer
+from rest_framework.relations import PKOnlyObject
+from bestwishes.fieldsets import SparseFieldsetSerializerMixin
+from .deletion import progress
+from .models import DeletionJob, Wishlist, WishlistGift
+from gifts.serializers import NAME_REQUIRED, GiftSerializer
 from gifts.models import Gift
 
 
-class WishlistGiftSerializer(serializers.ModelSerializer):
+class WishlistGiftSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     gift = GiftSerializer(read_only=True)
 
     class Meta:
         model = WishlistGift
-        fields = ["id", "wishlist", "gift"]
-        read_only_fields = ["id", "wishlist"]
+        fields = ["id", "wishlist", "gift", "position"]
+        read_only_fields = ["id", "wishlist", "position"]
 
 
 class CreateGiftForWishlistSerializer(serializers.Serializer):
     """Serializer for creating a new gift to add to a wishlist."""
-    name = serializers.CharField(max_length=255, required=True)
+    name = serializers.CharField(max_length=255, required=False, allow_blank=True)
     link = serializers.URLField(required=False, allow_blank=True, allow_null=True)
     cost = serializers.DecimalField(
         max_digits=10,
@@ -38,8 +41,29 @@ class CreateGiftForWishlistSerializer(serializers.Serializer):
         """Allow empty string for optional URL field."""
         return value if value else ""
 
+    def validate(self, attrs):
+        """Without a name the gift needs a link to be named from."""
+        if not attrs.get("name") and not attrs.get("link"):
+            raise serializers.ValidationError({"name": [NAME_REQUIRED]})
+        return attrs
+
+
+class PositionOrderedGiftIdsField(serializers.ManyRelatedField):
+    """
+    Gift ids of a wishlist in position order, read from its memberships: the
+    ``gifts`` manager would order them by the gift table instead.
+    """
+
+    # What to prefetch instead of the source, see AsyncReadMixin.aget_object.
+    prefetch_lookup = "wishlistgift_set"
+
+    def get_attribute(self, instance):
+        return [PKOnlyObject(pk=membership.gift_id) for membership in instance.wishlistgift_set.all()]
+
+
+class WishlistSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    gifts = PositionOrderedGiftIdsField(child_relation=serializers.PrimaryKeyRelatedField(read_only=True), read_only=True)
 
-class WishlistSerializer(serializers.ModelSerializer):
     class Meta:
         model = Wishlist
         fields = [
@@ -47,5 +71,55 @@ class WishlistSerializer(serializers.ModelSerializer):
             "name",
             "user",
             "gifts",
+            "gift_count",
+            "total_cost",
+            "reserved_count",
         ]
-        read_only_fields = ["id", "user"]
+        read_only_fields = ["id", "user", "gift_count", "total_cost", "reserved_count"]
+
+
+class SharedGiftSerializer(GiftSerializer):
+    class Meta(GiftSerializer.Meta):
+        fields = ["id", "name", "link", "cost", "image", "status"]
+
+
+class SharedWishlistSerializer(serializers.ModelSerializer):
+    """Public read-only representation behind a share link; no owner data."""
+    gifts = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Wishlist
+        fields = ["id", "name", "gifts"]
+        read_only_fields = fields
+
+    def get_gifts(self, wishlist):
+        memberships = wishlist.wishlistgift_set.select_related("gift").order_by("position", "id")
+        return SharedGiftSerializer([membership.gift for membership in memberships], many=True).data
+
+
+class WishlistExpandedSerializer(WishlistSerializer):
+    """Read-only wishlist with full gift objects instead of gift ids."""
+    gifts = serializers.SerializerMethodField()
+
+    def get_gifts(self, wishlist):
+        # Filled by the Prefetch in WishlistViewSet; fall back to a query otherwise.
+        memberships = getattr(wishlist, "expanded_memberships", None)
+        if memberships is None:
+            memberships = wishlist.wishlistgift_set.select_related("gift")
+        return GiftSerializer([membership.gift for membership in memberships], many=True).data
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    progress = serializers.SerializerMethodField()
+
+    class Meta:
+        model = DeletionJob
+        fields = [
+            "id", "kind", "target_id", "state", "totals", "deleted", "progress",
+            "error", "created_at", "finished_at",
+        ]
+        read_only_fields = fields
+
+    def get_progress(self, job):
+        return round(progress(job), 4)
+
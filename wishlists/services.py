@@ -1,11 +1,32 @@
 # wishlists/services.py
-from dataclasses import dataclass
+"""
+Wishlist membership engine.
+
+Every operation is a single write statement: inserts use
+``INSERT ... ON CONFLICT DO NOTHING RETURNING`` so a duplicate (even one
+racing in from a concurrent request) is reported instead of surfacing as an
+IntegrityError, and remove/move are one DELETE/UPDATE each. Follow-up reads
+only happen on the failure path, to tell the caller what went wrong.
+Appending a gift also reads the wishlist's last ordering key (one indexed
+MAX), and reordering rewrites the moved row only, see wishlists.positions.
+Inserts, removals and moves shift the wishlists' summary counters with one
+more UPDATE each, in the same transaction, see wishlists.summary.
+"""
+import secrets
+from dataclasses import dataclass, field
 from typing import Optional
 
 from wishlists.models import Wishlist, WishlistGift
+from wishlists.positions import InvalidPosition, key_between, keys_after, last_position, rebalance_wishlist
+from wishlists.signals import wishlists_changed
+from wishlists.summary import add_memberships, move_membership, remove_membership
+from gifts.enrichment import enqueue_gift
 from gifts.models import Gift
+from gifts.services import reserve_gift, unreserve_gift
 
-from django.db import transaction
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
 from rest_framework.exceptions import ValidationError, NotFound
 
 @dataclass(frozen=True)
@@ -15,27 +36,102 @@ class WishListGiftResult:
     created_gift: bool
 
 
+@dataclass(frozen=True)
+class BatchAddResult:
+    added: list = field(default_factory=list)
+    already_present: list = field(default_factory=list)
+    not_found: list = field(default_factory=list)
+
+
 def _ensure_wishlist_ownership(wishlist: Wishlist, user) -> None:
-    if wishlist.user != user:
+    # Compare ids: ``wishlist.user`` would fetch the owner row.
+    if wishlist.user_id != user.pk:
         raise ValidationError("You do not have permission to modify this wishlist.")
-    
+
+
+def _insert_memberships(wishlist: Wishlist, gift_ids: list[int]) -> dict[int, WishlistGift]:
+    """
+    Append (wishlist, gift) rows to the end of the wishlist, skipping the
+    ones that already exist. Returns the inserted memberships by gift id.
+    """
+    if not gift_ids:
+        return {}
+    now = timezone.now()
+    positions = dict(zip(gift_ids, keys_after(last_position(wishlist.pk), len(gift_ids))))
+    if connection.features.can_return_columns_from_insert:
+        inserted = _insert_memberships_returning(wishlist, positions, now)
+    else:
+        inserted = _insert_memberships_one_by_one(wishlist, positions, now)
+    if inserted:
+        add_memberships([wishlist.pk], list(inserted))
+        wishlists_changed.send(sender=WishlistGift, wishlist_ids=[wishlist.pk])
+    return inserted
+
+
+def _insert_memberships_returning(wishlist: Wishlist, positions: dict[int, str], now) -> dict[int, WishlistGift]:
+    meta = WishlistGift._meta
+    qn = connection.ops.quote_name
+    updated_at = meta.get_field("updated_at").get_db_prep_save(now, connection)
+    sql = (
+        "INSERT INTO {table} ({wishlist}, {gift}, {position}, {updated_at}) VALUES {values} "
+        "ON CONFLICT ({wishlist}, {gift}) DO NOTHING RETURNING {pk}, {gift}"
+    ).format(
+        table=qn(meta.db_table),
+        wishlist=qn(meta.get_field("wishlist").column),
+        gift=qn(meta.get_field("gift").column),
+        position=qn(meta.get_field("position").column),
+        updated_at=qn(meta.get_field("updated_at").column),
+        pk=qn(meta.pk.column),
+        values=", ".join(["(%s, %s, %s, %s)"] * len(positions)),
+    )
+    params = [
+        value
+        for gift_id, position in positions.items()
+        for value in (wishlist.pk, gift_id, position, updated_at)
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    inserted = {}
+    for pk, gift_id in rows:
+        membership = WishlistGift(
+            id=pk, wishlist=wishlist, gift_id=gift_id, position=positions[gift_id], updated_at=now
+        )
+        membership._state.adding = False
+        membership._state.db = connection.alias
+        inserted[gift_id] = membership
+    return inserted
+
+
+def _insert_memberships_one_by_one(wishlist: Wishlist, positions: dict[int, str], now) -> dict[int, WishlistGift]:
+    """Fallback for backends without INSERT ... RETURNING."""
+    inserted = {}
+    for gift_id, position in positions.items():
+        try:
+            with transaction.atomic():
+                inserted[gift_id] = WishlistGift.objects.create(
+                    wishlist=wishlist, gift_id=gift_id, position=position, updated_at=now
+                )
+        except IntegrityError:
+            continue
+    return inserted
+
+
 @transaction.atomic
 def add_gift_to_wishlist(*, user, wishlist: Wishlist, gift_id: int, gift_data: Optional[dict] = None) -> WishListGiftResult:
 
     _ensure_wishlist_ownership(wishlist, user)
 
-    try: 
-        gift = Gift.objects.get(id=gift_id) 
+    try:
+        gift = Gift.objects.get(id=gift_id, user_id=user.pk)
     except Gift.DoesNotExist:
         raise NotFound("Gift not found.")
-    
-    if WishlistGift.objects.filter(wishlist=wishlist, gift=gift).exists():
+
+    wishlist_gift = _insert_memberships(wishlist, [gift.pk]).get(gift.pk)
+    if wishlist_gift is None:
         raise ValidationError("Gift already in this wishlist.")
-    
-    wishlist_gift = WishlistGift.objects.create(
-        wishlist=wishlist,
-        gift=gift
-    )
+    wishlist_gift.gift = gift
     return WishListGiftResult(
         wishlist_gift=wishlist_gift,
         gift=gift,
@@ -46,18 +142,289 @@ def add_gift_to_wishlist(*, user, wishlist: Wishlist, gift_id: int, gift_data: O
 def create_and_add_gift_to_wishlist(*, user, wishlist: Wishlist, gift_data: dict) -> WishListGiftResult:
     _ensure_wishlist_ownership(wishlist, user)
 
+    # A brand-new gift cannot be in the wishlist yet.
     gift = Gift.objects.create(user=user, **gift_data)
-
-    if WishlistGift.objects.filter(wishlist=wishlist, gift=gift).exists():
-        raise ValidationError("Gift already in this wishlist.")
-
+    enqueue_gift(gift)
     wishlist_gift = WishlistGift.objects.create(
         wishlist=wishlist,
-        gift=gift
+        gift=gift,
+        position=key_between(last_position(wishlist.pk), None)
     )
+    add_memberships([wishlist.pk], [gift.pk])
     return WishListGiftResult(
         wishlist_gift=wishlist_gift,
         gift=gift,
         created_gift=True
     )
 
+
+@transaction.atomic
+def add_gifts_to_wishlist(*, user, wishlist: Wishlist, gift_ids: list[int]) -> BatchAddResult:
+    """
+    Add many of the user's gifts to a wishlist at once.
+    Gifts of other users are reported as not found.
+    """
+    _ensure_wishlist_ownership(wishlist, user)
+    gift_ids = list(dict.fromkeys(gift_ids))
+
+    # One SELECT both checks ownership and tells which gifts are already in the wishlist.
+    present = dict(
+        Gift.objects
+        .filter(id__in=gift_ids, user=user)
+        .annotate(in_wishlist=Exists(WishlistGift.objects.filter(wishlist=wishlist, gift=OuterRef("pk"))))
+        .values_list("id", "in_wishlist")
+    )
+    inserted = _insert_memberships(
+        wishlist, [gift_id for gift_id in gift_ids if gift_id in present and not present[gift_id]]
+    )
+
+    result = BatchAddResult()
+    for gift_id in gift_ids:
+        if gift_id not in present:
+            result.not_found.append(gift_id)
+        elif gift_id in inserted:
+            result.added.append(gift_id)
+        else:
+            # Already there, or added by a concurrent request in the meantime.
+            result.already_present.append(gift_id)
+    return result
+
+
+@transaction.atomic
+def remove_gift_from_wishlist(*, user, wishlist: Wishlist, gift_id: int) -> None:
+    _ensure_wishlist_ownership(wishlist, user)
+
+    deleted, _ = WishlistGift.objects.filter(wishlist=wishlist, gift_id=gift_id).delete()
+    if not deleted:
+        raise NotFound("Gift is not in this wishlist.")
+    remove_membership(wishlist.pk, gift_id)
+    wishlists_changed.send(sender=WishlistGift, wishlist_ids=[wishlist.pk])
+
+
+@transaction.atomic
+def move_gift_between_wishlists(*, user, wishlist: Wishlist, gift_id: int, target_wishlist_id: int) -> None:
+    """
+    Move a gift from ``wishlist`` to the end of another wishlist of the
+    same user with one UPDATE.
+    """
+    _ensure_wishlist_ownership(wishlist, user)
+    if target_wishlist_id == wishlist.pk:
+        raise ValidationError("Gift is already in this wishlist.")
+
+    moved = (
+        WishlistGift.objects
+        .filter(wishlist=wishlist, gift_id=gift_id)
+        .filter(Exists(Wishlist.objects.filter(pk=target_wishlist_id, user_id=user.pk, pending_deletion=False)))
+        .exclude(Exists(WishlistGift.objects.filter(wishlist_id=target_wishlist_id, gift_id=gift_id)))
+    )
+    try:
+        with transaction.atomic():
+            updated = moved.update(
+                wishlist_id=target_wishlist_id,
+                position=key_between(last_position(target_wishlist_id), None),
+                updated_at=timezone.now(),
+            )
+    except IntegrityError:
+        # The gift was added to the target concurrently.
+        updated = 0
+    if updated:
+        move_membership(wishlist.pk, target_wishlist_id, gift_id)
+        wishlists_changed.send(sender=WishlistGift, wishlist_ids=[wishlist.pk, target_wishlist_id])
+        return
+
+    if not Wishlist.objects.filter(pk=target_wishlist_id, user_id=user.pk, pending_deletion=False).exists():
+        raise NotFound("Target wishlist not found.")
+    if not WishlistGift.objects.filter(wishlist=wishlist, gift_id=gift_id).exists():
+        raise NotFound("Gift is not in this wishlist.")
+    raise ValidationError("Gift already in the target wishlist.")
+
+
+@transaction.atomic
+def reorder_gift_in_wishlist(
+    *, user, wishlist: Wishlist, gift_id: int, after_gift_id: Optional[int] = None, before_gift_id: Optional[int] = None
+) -> str:
+    """
+    Place a gift between two neighbours of the same wishlist (either may be
+    ``None`` for the start or the end). Only the moved row is written; it and
+    its neighbours stay locked until the transaction ends, so concurrent
+    reorders cannot take the same gap. Returns the gift's new position key.
+    """
+    _ensure_wishlist_ownership(wishlist, user)
+    if gift_id in (after_gift_id, before_gift_id):
+        raise ValidationError("A gift cannot be placed next to itself.")
+
+    try:
+        position = _position_between(wishlist, gift_id, after_gift_id, before_gift_id)
+    except InvalidPosition:
+        # Equal (or legacy empty) keys leave no gap: renumber the wishlist
+        # once and retry; a renumbered wishlist always has one.
+        rebalance_wishlist(wishlist.pk)
+        position = _position_between(wishlist, gift_id, after_gift_id, before_gift_id)
+
+    WishlistGift.objects.filter(wishlist=wishlist, gift_id=gift_id).update(
+        position=position, updated_at=timezone.now()
+    )
+    wishlists_changed.send(sender=WishlistGift, wishlist_ids=[wishlist.pk])
+    return position
+
+
+def _position_between(
+    wishlist: Wishlist, gift_id: int, after_gift_id: Optional[int], before_gift_id: Optional[int]
+) -> str:
+    """Lock the moved row and its neighbours and return a key between the neighbours."""
+    neighbour_ids = [neighbour for neighbour in (after_gift_id, before_gift_id) if neighbour is not None]
+    rows = dict(
+        WishlistGift.objects
+        .select_for_update()
+        .filter(wishlist=wishlist, gift_id__in=[gift_id, *neighbour_ids])
+        .order_by("pk")
+        .values_list("gift_id", "position")
+    )
+    if gift_id not in rows:
+        raise NotFound("Gift is not in this wishlist.")
+    missing = [neighbour for neighbour in neighbour_ids if neighbour not in rows]
+    if missing:
+        raise NotFound({"not_in_wishlist": missing})
+
+    after = rows.get(after_gift_id) if after_gift_id is not None else None
+    before = rows.get(before_gift_id) if before_gift_id is not None else None
+    if after_gift_id is None and before_gift_id is None:
+        # No neighbours given: move to the end.
+        after = last_position(wishlist.pk)
+    if after and before and after > before:
+        raise ValidationError("'after' must come before 'before' in the wishlist.")
+    return key_between(after or None, before or None)
+
+
+def share_wishlist(*, user, wishlist: Wishlist) -> str:
+    """Give the wishlist a new public share token; an older link stops working."""
+    _ensure_wishlist_ownership(wishlist, user)
+    token = secrets.token_urlsafe(32)
+    Wishlist.objects.filter(pk=wishlist.pk).update(share_token=token)
+    wishlist.share_token = token
+    return token
+
+
+def unshare_wishlist(*, user, wishlist: Wishlist) -> None:
+    _ensure_wishlist_ownership(wishlist, user)
+    Wishlist.objects.filter(pk=wishlist.pk).update(share_token=None)
+    wishlist.share_token = None
+
+
+def reserve_shared_gift(*, user, token: str, gift_id: int) -> None:
+    """Reserve a gift of the wishlist shared under ``token``, as a guest holding the link."""
+    reserve_gift(user=user, gift_id=gift_id, scope=_shared_gifts(token))
+
+
+def unreserve_shared_gift(*, user, token: str, gift_id: int) -> None:
+    """Release a reservation the user holds on a gift of the wishlist shared under ``token``."""
+    unreserve_gift(user=user, gift_id=gift_id, scope=_shared_gifts(token))
+
+
+def _shared_gifts(token: str) -> Q:
+    # A subquery, so the token is checked by the reservation's UPDATE itself:
+    # a revoked or rotated link stops matching at once.
+    return Q(pk__in=WishlistGift.objects.filter(
+        wishlist__share_token=token, wishlist__pending_deletion=False
+    ).values("gift_id"))
+
+
+@transaction.atomic
+def clone_wishlist(*, user, wishlist: Wishlist, name: Optional[str] = None, copy_gifts: bool = False) -> Wishlist:
+    """
+    Copy a wishlist with its gift order in a fixed number of statements.
+
+    By default the copy holds the same gifts. With ``copy_gifts`` every gift
+    is duplicated as well (back to available: a copy is nobody's reservation
+    yet) and the copy holds the duplicates. Rows are copied with
+    ``INSERT ... SELECT`` and never pass through Python, except for the
+    duplicated gifts outside PostgreSQL.
+    """
+    _ensure_wishlist_ownership(wishlist, user)
+    clone = Wishlist.objects.create(user=user, name=name or f"{wishlist.name} (copy)"[:255])
+    now = timezone.now()
+    if copy_gifts:
+        _copy_gifts_into(clone, wishlist, now)
+    else:
+        _copy_memberships_into(clone, wishlist, now)
+    add_memberships([clone.pk], None)
+    clone.refresh_from_db(fields=["gift_count", "total_cost", "reserved_count"])
+    return clone
+
+
+def _clone_sql_names() -> dict:
+    qn = connection.ops.quote_name
+    membership, gift = WishlistGift._meta, Gift._meta
+    names = {
+        "membership_table": qn(membership.db_table),
+        "gift_table": qn(gift.db_table),
+        "gift_pk": qn(gift.pk.column),
+        "membership_pk": qn(membership.pk.column),
+    }
+    for prefix, meta, fields in (
+        ("m_", membership, ("wishlist", "gift", "position", "updated_at")),
+        ("g_", gift, ("name", "link", "cost", "image", "status", "updated_at", "user")),
+    ):
+        names.update({prefix + field: qn(meta.get_field(field).column) for field in fields})
+    return names
+
+
+def _copy_memberships_into(clone: Wishlist, source: Wishlist, now) -> None:
+    updated_at = WishlistGift._meta.get_field("updated_at").get_db_prep_save(now, connection)
+    sql = (
+        "INSERT INTO {membership_table} ({m_wishlist}, {m_gift}, {m_position}, {m_updated_at}) "
+        "SELECT %s, {m_gift}, {m_position}, %s FROM {membership_table} WHERE {m_wishlist} = %s"
+    ).format(**_clone_sql_names())
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [clone.pk, updated_at, source.pk])
+
+
+def _copy_gifts_into(clone: Wishlist, source: Wishlist, now) -> None:
+    """
+    Duplicate the source's gifts and add the duplicates to ``clone``.
+
+    On PostgreSQL each duplicate's id is drawn from the gift sequence before
+    it is inserted, so one statement writes the gifts and the membership rows
+    pointing at them. Other databases insert the duplicates with
+    ``bulk_create`` and then their memberships.
+    """
+    if connection.vendor != "postgresql":
+        # The duplicates get their ids back from the INSERT itself, so
+        # concurrent clones can never hand out the same ones.
+        memberships = list(
+            WishlistGift.objects.filter(wishlist=source).select_related("gift").order_by("pk")
+        )
+        copies = Gift.objects.bulk_create(
+            Gift(
+                user_id=clone.user_id, name=m.gift.name, link=m.gift.link, cost=m.gift.cost,
+                image=m.gift.image, status=Gift.Status.AVAILABLE, updated_at=now,
+            )
+            for m in memberships
+        )
+        WishlistGift.objects.bulk_create(
+            WishlistGift(wishlist=clone, gift=copy, position=m.position, updated_at=now)
+            for m, copy in zip(memberships, copies)
+        )
+        return
+
+    updated_at = Gift._meta.get_field("updated_at").get_db_prep_save(now, connection)
+    sql = (
+        "WITH source AS ("
+        " SELECT nextval(pg_get_serial_sequence(%s, %s)) AS new_id, g.{g_name}, g.{g_link}, g.{g_cost},"
+        " g.{g_image}, m.{m_position}"
+        " FROM {membership_table} m JOIN {gift_table} g ON g.{gift_pk} = m.{m_gift}"
+        " WHERE m.{m_wishlist} = %s"
+        "), gifts AS ("
+        "INSERT INTO {gift_table} ({gift_pk}, {g_name}, {g_link}, {g_cost}, {g_image}, {g_status}, {g_updated_at}, {g_user}) "
+        "SELECT new_id, {g_name}, {g_link}, {g_cost}, {g_image}, %s, %s, %s FROM source"
+        ") "
+        "INSERT INTO {membership_table} ({m_wishlist}, {m_gift}, {m_position}, {m_updated_at}) "
+        "SELECT %s, new_id, {m_position}, %s FROM source"
+    ).format(**_clone_sql_names())
+    params = [
+        Gift._meta.db_table, Gift._meta.pk.column, source.pk,
+        Gift.Status.AVAILABLE, updated_at, clone.user_id,
+        clone.pk, updated_at,
+    ]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
@@ -0,0 +1,65 @@
+from django.db.models import F
+from django.dispatch import Signal
+from django.utils import timezone
+
+# Sent with ``wishlist_ids`` (a list or a values_list queryset) whenever a
+# wishlist or its gift memberships change. Saves of Wishlist and WishlistGift
+# instances and ``gifts.set()`` send it through the receivers below; the
+# membership services send it explicitly for their single-statement writes.
+wishlists_changed = Signal()
+
+
+def bump_versions(sender, wishlist_ids, **kwargs):
+    from wishlists.models import Wishlist
+
+    # updated_at moves too: it feeds the ETag of the wishlist list.
+    Wishlist.objects.filter(pk__in=wishlist_ids).update(version=F("version") + 1, updated_at=timezone.now())
+
+
+def bump_versions_for_gifts(sender, gift_ids, **kwargs):
+    """A gift change is a change of every wishlist containing the gift."""
+    from wishlists.models import Wishlist, WishlistGift
+
+    Wishlist.objects.filter(
+        pk__in=WishlistGift.objects.filter(gift_id__in=gift_ids).values("wishlist_id")
+    ).update(version=F("version") + 1, updated_at=timezone.now())
+
+
+def update_summaries_for_gifts(sender, gift_ids, changes=None, deleted=False, **kwargs):
+    from wishlists import summary
+
+    if deleted:
+        summary.remove_gifts(gift_ids)
+    elif changes:
+        summary.apply_gift_changes(changes)
+
+
+def send_on_wishlist_save(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        wishlists_changed.send(sender=sender, wishlist_ids=[instance.pk])
+
+
+def send_on_membership_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        wishlists_changed.send(sender=sender, wishlist_ids=[instance.wishlist_id])
+
+
+def send_on_gifts_set(sender, instance, action, reverse, pk_set, **kwargs):
+    from wishlists.summary import reconcile_summaries
+
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    # ``gift.wishlists.add(...)`` changes the wishlists in ``pk_set``.
+    wishlist_ids = pk_set if reverse else [instance.pk]
+    if wishlist_ids:
+        # Not a path the services take; recomputing the summaries is simplest.
+        reconcile_summaries(wishlist_ids)
+        wishlists_changed.send(sender=sender, wishlist_ids=wishlist_ids)
+
+
+def forget_sync_state(sender, instance, **kwargs):
+    """A deleted user's change log and tombstones have no one left to sync them."""
+    from wishlists.models import SyncChange, SyncCounter
+
+    SyncChange.objects.filter(user_id=instance.pk).delete()
+    SyncCounter.objects.filter(user_id=instance.pk).delete()
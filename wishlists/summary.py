@@ -0,0 +1,154 @@
+# wishlists/summary.py
+"""
+Denormalized wishlist summary: ``gift_count``, ``total_cost`` and
+``reserved_count`` on every Wishlist, so list pages need no aggregate over
+WishlistGift joined with Gift.
+
+The counters are only moved by deltas (``F(...) + delta``) inside single
+UPDATE statements, so concurrent changes add up instead of overwriting each
+other. The membership services shift them for the rows they insert, delete
+or move; gift cost and status changes and gift deletions arrive through
+``gifts.signals.gifts_changed``. Writes that bypass both (the admin, raw
+SQL) let the counters drift; ``manage.py reconcile_wishlist_summaries``
+recomputes them.
+"""
+import operator
+from decimal import Decimal
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, Exists, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from gifts.models import Gift
+from wishlists.models import Wishlist, WishlistGift
+from wishlists.signals import wishlists_changed
+
+SUMMARY_FIELDS = ("gift_count", "total_cost", "reserved_count")
+ZERO_COST = Value(Decimal("0.00"), output_field=DecimalField(max_digits=12, decimal_places=2))
+
+
+def add_memberships(wishlist_ids, gift_ids) -> int:
+    """Count freshly inserted memberships of ``gift_ids`` (all, if ``None``) in ``wishlist_ids``."""
+    return _shift(Wishlist.objects.filter(pk__in=wishlist_ids), _membership_totals(gift_ids), operator.add)
+
+
+def remove_membership(wishlist_id: int, gift_id: int) -> int:
+    """Uncount a gift whose membership in the wishlist was just deleted."""
+    return _shift(Wishlist.objects.filter(pk=wishlist_id), _gift_totals(gift_id), operator.sub)
+
+
+def move_membership(source_id: int, target_id: int, gift_id: int) -> int:
+    """Move a gift's share of the summary from one wishlist to another in one UPDATE."""
+    totals = _gift_totals(gift_id)
+    sign = Case(When(pk=target_id, then=Value(1)), default=Value(-1))
+    return Wishlist.objects.filter(pk__in=[source_id, target_id]).update(
+        **{name: F(name) + sign * totals[name] for name in SUMMARY_FIELDS}
+    )
+
+
+def remove_gifts(gift_ids) -> int:
+    """Uncount gifts from every wishlist holding them; call before deleting the gifts."""
+    return _shift(_wishlists_holding(gift_ids), _membership_totals(gift_ids), operator.sub)
+
+
+def apply_gift_changes(changes: dict[int, dict[str, tuple]]) -> int:
+    """
+    Shift the summaries of the wishlists holding changed gifts; ``changes``
+    maps gift ids to ``{field: (before, after)}``. One UPDATE for the whole
+    batch: each wishlist adds up the deltas of the changed gifts it holds.
+    """
+    cost_deltas, reserved_deltas = {}, {}
+    for gift_id, fields in changes.items():
+        cost_before, cost_after = fields.get("cost", (None, None))
+        status_before, status_after = fields.get("status", (None, None))
+        cost_deltas[gift_id] = _cost(cost_after) - _cost(cost_before)
+        reserved_deltas[gift_id] = (status_after == Gift.Status.RESERVED) - (status_before == Gift.Status.RESERVED)
+    gift_ids = [gift_id for gift_id in changes if cost_deltas[gift_id] or reserved_deltas[gift_id]]
+    if not gift_ids:
+        return 0
+
+    memberships = (
+        WishlistGift.objects.filter(wishlist=OuterRef("pk"), gift_id__in=gift_ids).order_by().values("wishlist")
+    )
+    cost_delta = _per_gift(cost_deltas, gift_ids, ZERO_COST)
+    reserved_delta = _per_gift(reserved_deltas, gift_ids, Value(0))
+    return _wishlists_holding(gift_ids).update(
+        total_cost=F("total_cost") + Coalesce(
+            Subquery(memberships.annotate(value=Sum(cost_delta)).values("value")), ZERO_COST
+        ),
+        reserved_count=F("reserved_count") + Coalesce(
+            Subquery(memberships.annotate(value=Sum(reserved_delta)).values("value")), 0
+        ),
+    )
+
+
+@transaction.atomic
+def reconcile_summaries(wishlist_ids, *, dry_run: bool = False) -> list[int]:
+    """
+    Recompute the summaries of ``wishlist_ids`` from their memberships.
+    Returns the ids whose stored counters had drifted; only those are written.
+    """
+    actual = _membership_totals()
+    drifted = list(
+        Wishlist.objects
+        .filter(pk__in=wishlist_ids)
+        .annotate(**{f"actual_{name}": expression for name, expression in actual.items()})
+        .exclude(**{name: F(f"actual_{name}") for name in SUMMARY_FIELDS})
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    if drifted and not dry_run:
+        Wishlist.objects.filter(pk__in=drifted).update(**actual)
+        wishlists_changed.send(sender=Wishlist, wishlist_ids=drifted)
+    return drifted
+
+
+def _membership_totals(gift_ids=None) -> dict:
+    """Count, cost and reserved count of the outer wishlist's memberships (of ``gift_ids`` only, if given)."""
+    memberships = WishlistGift.objects.filter(wishlist=OuterRef("pk"))
+    if gift_ids is not None:
+        memberships = memberships.filter(gift_id__in=gift_ids)
+    memberships = memberships.order_by().values("wishlist")
+    return {
+        "gift_count": Coalesce(Subquery(memberships.annotate(value=Count("pk")).values("value")), 0),
+        "total_cost": Coalesce(Subquery(memberships.annotate(value=Sum("gift__cost")).values("value")), ZERO_COST),
+        "reserved_count": Coalesce(
+            Subquery(
+                memberships.annotate(value=Count("pk", filter=Q(gift__status=Gift.Status.RESERVED))).values("value")
+            ),
+            0,
+        ),
+    }
+
+
+def _gift_totals(gift_id: int) -> dict:
+    """What a single gift contributes to a summary, read from the gift row."""
+    gift = Gift.objects.filter(pk=gift_id)
+    return {
+        "gift_count": Value(1),
+        "total_cost": Coalesce(Subquery(gift.values("cost")), ZERO_COST),
+        "reserved_count": Case(When(Exists(gift.filter(status=Gift.Status.RESERVED)), then=Value(1)), default=Value(0)),
+    }
+
+
+def _wishlists_holding(gift_ids):
+    return Wishlist.objects.filter(pk__in=WishlistGift.objects.filter(gift_id__in=gift_ids).values("wishlist_id"))
+
+
+def _per_gift(deltas: dict[int, object], gift_ids: list[int], zero: Value) -> Case:
+    """``CASE gift_id WHEN ... THEN delta END`` over the memberships."""
+    whens = [
+        When(gift_id=gift_id, then=Value(deltas[gift_id], output_field=zero.output_field))
+        for gift_id in gift_ids
+        if deltas[gift_id]
+    ]
+    return Case(*whens, default=zero, output_field=zero.output_field)
+
+
+def _shift(wishlists, totals: dict, op) -> int:
+    return wishlists.update(**{name: op(F(name), totals[name]) for name in SUMMARY_FIELDS})
+
+
+def _cost(value: Optional[Decimal]) -> Decimal:
+    return Decimal(str(value)) if value is not None else Decimal(0)
@@ -0,0 +1,241 @@
+# wishlists/sync.py
+"""
+Delta sync: the gifts, wishlists and memberships of a user that were
+created, updated or deleted since a cursor.
+
+Changes are recorded by database triggers, so every write path (the ORM,
+bulk statements, raw SQL, COPY) is covered. Each write upserts the object's
+single SyncChange row; a delete turns that row into a tombstone. On
+PostgreSQL the rows are numbered at commit. Statement-level triggers mark
+every changed object pending (``seq`` NULL) with one set-based upsert per
+statement. A deferred constraint trigger then takes the owners' next numbers
+from SyncCounter just before the transaction commits. It locks the counter
+rows in user order, and after that it only touches rows it already holds.
+So a counter lock is never held while waiting for a gift or wishlist row,
+and writers touching those rows in different orders cannot deadlock on it.
+The counter rows stay locked until the commit, so a user's numbers become
+visible in commit order: once a client has seen change N, no change numbered
+below N can still appear. SQLite runs one writer at a time and numbers each
+row as it is written.
+
+A sync is a range scan of the ``(user_id, seq)`` index past the cursor plus
+one query per kind for the rows that changed, so its cost follows the amount
+of change, not the size of the account.
+
+The migration backfills one change per existing row; the triggers are
+(re)created after every ``migrate`` by ``ensure_change_triggers``, as
+SQLite drops them whenever Django rebuilds a table to alter it.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from gifts.models import Gift
+from gifts.serializers import GiftSerializer
+from bestwishes.fastread import get_reader
+from wishlists.models import SyncChange, SyncCounter, Wishlist, WishlistGift
+from wishlists.serializers import WishlistSerializer
+
+COUNTER_TABLE = SyncCounter._meta.db_table
+CHANGE_TABLE = SyncChange._meta.db_table
+
+# (table, kind, owner of the row as an SQL expression over ``{row}``)
+TRACKED_TABLES = [
+    (Gift._meta.db_table, SyncChange.Kind.GIFT, "{row}.user_id"),
+    (Wishlist._meta.db_table, SyncChange.Kind.WISHLIST, "{row}.user_id"),
+    (
+        WishlistGift._meta.db_table,
+        SyncChange.Kind.WISHLIST_GIFT,
+        f"(SELECT user_id FROM {Wishlist._meta.db_table} WHERE id = {{row}}.wishlist_id)",
+    ),
+]
+
+# One row per transaction with pending changes; its insert queues the
+# deferred trigger that numbers them.
+PENDING_TABLE = "wishlists_syncpending"
+
+_PG_PENDING_TABLE = f"CREATE TABLE IF NOT EXISTS {PENDING_TABLE} (txid bigint PRIMARY KEY)"
+# Updates that change nothing (e.g. ``save()`` of an unchanged row) are skipped.
+_PG_RECORD_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION {{table}}_sync_record() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO {CHANGE_TABLE} (user_id, kind, object_id, seq, deleted)
+        SELECT owner, '{{kind}}', id, NULL, FALSE
+        FROM (SELECT {{owner}} AS owner, r.id FROM new_rows r) AS changed WHERE owner IS NOT NULL
+        ON CONFLICT (user_id, kind, object_id) DO UPDATE SET seq = NULL, deleted = FALSE;
+    ELSIF TG_OP = 'UPDATE' THEN
+        INSERT INTO {CHANGE_TABLE} (user_id, kind, object_id, seq, deleted)
+        SELECT owner, '{{kind}}', id, NULL, FALSE
+        FROM (
+            SELECT {{owner}} AS owner, r.id FROM new_rows r JOIN old_rows o ON o.id = r.id
+            WHERE ROW(o.*) IS DISTINCT FROM ROW(r.*)
+        ) AS changed WHERE owner IS NOT NULL
+        ON CONFLICT (user_id, kind, object_id) DO UPDATE SET seq = NULL, deleted = FALSE;
+    ELSE
+        INSERT INTO {CHANGE_TABLE} (user_id, kind, object_id, seq, deleted)
+        SELECT owner, '{{kind}}', id, NULL, TRUE
+        FROM (SELECT {{owner}} AS owner, r.id FROM old_rows r) AS changed WHERE owner IS NOT NULL
+        ON CONFLICT (user_id, kind, object_id) DO UPDATE SET seq = NULL, deleted = TRUE;
+    END IF;
+    IF FOUND THEN
+        INSERT INTO {PENDING_TABLE} (txid) VALUES (txid_current()) ON CONFLICT DO NOTHING;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+_PG_RECORD_TRIGGERS = [
+    "CREATE OR REPLACE TRIGGER {table}_sync_insert AFTER INSERT ON {table} "
+    "REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_sync_record()",
+    "CREATE OR REPLACE TRIGGER {table}_sync_update AFTER UPDATE ON {table} "
+    "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_sync_record()",
+    "CREATE OR REPLACE TRIGGER {table}_sync_delete AFTER DELETE ON {table} "
+    "REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION {table}_sync_record()",
+]
+# Counters are created or bumped in user order, so two committing
+# transactions with several owners each take them in the same order.
+_PG_NUMBER_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION wishlists_number_changes() RETURNS trigger AS $$
+BEGIN
+    DELETE FROM {PENDING_TABLE} WHERE txid = NEW.txid;
+    WITH bumped AS (
+        INSERT INTO {COUNTER_TABLE} AS counter (user_id, seq)
+        SELECT user_id, count(*) FROM {CHANGE_TABLE} WHERE seq IS NULL GROUP BY user_id ORDER BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET seq = counter.seq + EXCLUDED.seq
+        RETURNING counter.user_id, counter.seq AS top
+    ), numbered AS (
+        SELECT id, user_id,
+               row_number() OVER (PARTITION BY user_id ORDER BY id) - count(*) OVER (PARTITION BY user_id) AS offset_
+        FROM {CHANGE_TABLE} WHERE seq IS NULL
+    )
+    UPDATE {CHANGE_TABLE} AS change SET seq = bumped.top + numbered.offset_
+    FROM numbered JOIN bumped USING (user_id)
+    WHERE change.id = numbered.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+_PG_NUMBER_TRIGGER = [
+    f"DROP TRIGGER IF EXISTS {PENDING_TABLE}_number ON {PENDING_TABLE}",
+    f"CREATE CONSTRAINT TRIGGER {PENDING_TABLE}_number AFTER INSERT ON {PENDING_TABLE} "
+    "DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION wishlists_number_changes()",
+]
+_SQLITE_TRIGGER = f"""
+CREATE TRIGGER IF NOT EXISTS {{table}}_sync_{{event}} AFTER {{event}} ON {{table}}
+FOR EACH ROW WHEN {{owner}} IS NOT NULL BEGIN
+    INSERT INTO {COUNTER_TABLE} (user_id, seq) VALUES ({{owner}}, 1)
+    ON CONFLICT (user_id) DO UPDATE SET seq = seq + 1;
+    INSERT INTO {CHANGE_TABLE} (user_id, kind, object_id, seq, deleted)
+    VALUES ({{owner}}, '{{kind}}', {{row}}.id, (SELECT seq FROM {COUNTER_TABLE} WHERE user_id = {{owner}}), {{deleted}})
+    ON CONFLICT (user_id, kind, object_id) DO UPDATE SET seq = excluded.seq, deleted = excluded.deleted;
+END
+"""
+_SQLITE_EVENTS = [("insert", "NEW", "FALSE"), ("update", "NEW", "FALSE"), ("delete", "OLD", "TRUE")]
+
+
+@dataclass
+class ChangeSet:
+    cursor: int
+    has_more: bool = False
+    gifts: list = field(default_factory=list)
+    wishlists: list = field(default_factory=list)
+    wishlist_gifts: list = field(default_factory=list)
+    deleted: dict = field(default_factory=lambda: {kind: [] for kind in _RESPONSE_KEYS.values()})
+
+    def as_dict(self) -> dict:
+        return {
+            "cursor": self.cursor,
+            "has_more": self.has_more,
+            "gifts": self.gifts,
+            "wishlists": self.wishlists,
+            "wishlist_gifts": self.wishlist_gifts,
+            "deleted": self.deleted,
+        }
+
+
+_RESPONSE_KEYS = {
+    SyncChange.Kind.GIFT: "gifts",
+    SyncChange.Kind.WISHLIST: "wishlists",
+    SyncChange.Kind.WISHLIST_GIFT: "wishlist_gifts",
+}
+
+
+def changes_since(*, user, since: int, limit: int) -> ChangeSet:
+    """
+    The first ``limit`` changes of ``user`` numbered above ``since``: current
+    rows of what was created or updated, ids of what was deleted, and the
+    cursor to pass next time. A hidden (``pending_deletion``) wishlist and its
+    memberships count as deleted, as does a row deleted after its change
+    was read; its tombstone follows in a later sync.
+    """
+    changes = list(
+        SyncChange.objects
+        .filter(user_id=user.pk, seq__gt=since)
+        .order_by("seq")
+        .values_list("seq", "kind", "object_id", "deleted")[:limit + 1]
+    )
+    result = ChangeSet(cursor=since, has_more=len(changes) > limit)
+    changes = changes[:limit]
+    if not changes:
+        return result
+    result.cursor = changes[-1][0]
+
+    live = defaultdict(list)
+    for _, kind, object_id, deleted in changes:
+        if deleted:
+            result.deleted[_RESPONSE_KEYS[kind]].append(object_id)
+        else:
+            live[kind].append(object_id)
+
+    result.gifts = _represent(GiftSerializer, Gift.objects.filter(user_id=user.pk, pk__in=live[SyncChange.Kind.GIFT]))
+    result.wishlists = _represent(
+        WishlistSerializer,
+        Wishlist.objects.filter(user_id=user.pk, pending_deletion=False, pk__in=live[SyncChange.Kind.WISHLIST]),
+    )
+    result.wishlist_gifts = list(
+        WishlistGift.objects
+        .filter(wishlist__user_id=user.pk, wishlist__pending_deletion=False, pk__in=live[SyncChange.Kind.WISHLIST_GIFT])
+        .order_by("pk")
+        .values("id", "wishlist", "gift", "position")
+    )
+    for kind, key in _RESPONSE_KEYS.items():
+        found = {item["id"] for item in getattr(result, key)}
+        result.deleted[key].extend(object_id for object_id in live[kind] if object_id not in found)
+        result.deleted[key].sort()
+    return result
+
+
+def _represent(serializer_class, queryset) -> list[dict]:
+    queryset = queryset.order_by("pk")
+    reader = get_reader(serializer_class())
+    if reader is None:
+        return serializer_class(queryset, many=True).data
+    return reader.represent(list(queryset.values(*reader.columns)))
+
+
+def ensure_change_triggers(using="default", **kwargs) -> None:
+    """Create the triggers recording changes if they are missing; runs after every ``migrate``."""
+    from django.db import connections
+
+    conn = connections[using]
+    with conn.cursor() as cursor:
+        if conn.vendor == "postgresql":
+            cursor.execute(_PG_PENDING_TABLE)
+            cursor.execute(_PG_NUMBER_FUNCTION)
+            for statement in _PG_NUMBER_TRIGGER:
+                cursor.execute(statement)
+            for table, kind, owner in TRACKED_TABLES:
+                cursor.execute(_PG_RECORD_FUNCTION.format(table=table, kind=kind, owner=owner.format(row="r")))
+                for statement in _PG_RECORD_TRIGGERS:
+                    cursor.execute(statement.format(table=table))
+        elif conn.vendor == "sqlite":
+            for table, kind, owner in TRACKED_TABLES:
+                for event, row, deleted in _SQLITE_EVENTS:
+                    cursor.execute(_SQLITE_TRIGGER.format(
+                        table=table,
+                        event=event,
+                        kind=kind,
+                        row=row,
+                        owner=owner.format(row=row),
+                        deleted=deleted,
+                    ))
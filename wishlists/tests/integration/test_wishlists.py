@@ -0,0 +1,1045 @@
+""" Integration tests for wishlists. """
+import csv
+import gzip
+import io
+import json
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient, APIRequestFactory, APITestCase, force_authenticate
+from users.models import User
+from gifts.models import Gift
+from wishlists.exports import STREAM_BUFFER_SIZE
+from wishlists.models import SyncChange, Wishlist, WishlistGift
+from wishlists.views import WishlistViewSet
+from bestwishes.asyncviews import async_read_views
+from bestwishes.asgi import application
+from bestwishes.live import get_hub
+
+
+class WishlistExportIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.other_user = User.objects.create_user(
+            email='example2@test.ru',
+            password='strongpassword123'
+        )
+        self.export_url = reverse("wishlist-export")
+
+        self.book = Gift.objects.create(name='Book', cost='15.00', user=self.user)
+        self.bike = Gift.objects.create(name='Bike', link='http://example.com/bike', user=self.user)
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=self.book)
+
+        foreign_gift = Gift.objects.create(name='Car', user=self.other_user)
+        foreign_wishlist = Wishlist.objects.create(name='Other', user=self.other_user)
+        WishlistGift.objects.create(wishlist=foreign_wishlist, gift=foreign_gift)
+
+        self.client.force_authenticate(user=self.user)
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.export_url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(records, [
+            {'type': 'gift', 'id': self.book.id, 'name': 'Book', 'link': None, 'cost': '15.00', 'image': None, 'status': 'available'},
+            {'type': 'gift', 'id': self.bike.id, 'name': 'Bike', 'link': 'http://example.com/bike', 'cost': None, 'image': None, 'status': 'available'},
+            {'type': 'wishlist', 'id': self.wishlist.id, 'name': 'Birthday'},
+            {'type': 'wishlist_gift', 'wishlist': self.wishlist.id, 'gift': self.book.id},
+        ])
+
+    def test_export_csv_gzip(self):
+        response = self.client.get(self.export_url, {'type': 'csv', 'gzip': '1'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('bestwishes-export.csv.gz', response['Content-Disposition'])
+        content = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual([row['type'] for row in rows], ['gift', 'gift', 'wishlist', 'wishlist_gift'])
+        self.assertEqual(rows[0]['cost'], '15.00')
+        self.assertEqual(rows[3]['gift'], str(self.book.id))
+
+    def test_export_unknown_type(self):
+        response = self.client.get(self.export_url, {'type': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        response = self.client.get(self.export_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class WishlistExportAsgiTests(TransactionTestCase):
+    def test_export_streams_under_asgi(self):
+        user = User.objects.create_user(email='example@test.ru', password='strongpassword123')
+        self.client.force_login(user)
+        session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        released, finished = threading.Event(), threading.Event()
+
+        def records(user):
+            # Первая запись больше буфера и уходит сразу; дальше ждём, пока клиент её не получит.
+            yield {'type': 'gift', 'id': 1, 'name': 'x' * STREAM_BUFFER_SIZE}
+            released.wait(timeout=5)
+            yield {'type': 'gift', 'id': 2, 'name': 'Book'}
+            finished.set()
+
+        async def scenario():
+            communicator = ApplicationCommunicator(application, {
+                'type': 'http', 'method': 'GET', 'path': reverse("wishlist-export"), 'query_string': b'',
+                'headers': [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={session}'.encode())],
+            })
+            await communicator.send_input({'type': 'http.request', 'body': b''})
+            self.assertEqual((await communicator.receive_output(2))['status'], 200)
+            first = await communicator.receive_output(2)
+            # Под ASGI Django 4.2 собрал бы синхронный итератор целиком до первой отправки.
+            self.assertFalse(finished.is_set())
+            released.set()
+            body = first['body']
+            while (message := await communicator.receive_output(2)).get('more_body'):
+                body += message['body']
+            await communicator.wait(2)
+            return body + message.get('body', b'')
+
+        with patch('wishlists.exports.iter_account_records', records):
+            body = async_to_sync(scenario)()
+        self.assertEqual([json.loads(line)['id'] for line in body.splitlines()], [1, 2])
+
+
+class WishlistImportIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.import_url = reverse("wishlist-import-file")
+        self.client.force_authenticate(user=self.user)
+
+    def test_import_csv_reports_bad_rows(self):
+        birthday = Wishlist.objects.create(name='Birthday', user=self.user)
+        content = (
+            'name,link,cost,image,status,wishlists\n'
+            'Book,,15.00,,,Birthday|New Year\n'
+            ',,10.00,,,\n'
+            'Bike,http://example.com/bike,-5,,,\n'
+            'Card,,,,reserved,New Year\n'
+        )
+        upload = SimpleUploadedFile('gifts.csv', content.encode('utf-8'), content_type='text/csv')
+
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['total'], 4)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['memberships'], 3)
+        self.assertEqual([e['line'] for e in response.data['errors']], [3, 4])
+        self.assertIn('name', response.data['errors'][0]['errors'])
+        self.assertIn('cost', response.data['errors'][1]['errors'])
+
+        new_year = Wishlist.objects.get(user=self.user, name='New Year')
+        self.assertEqual(set(birthday.gifts.values_list('name', flat=True)), {'Book'})
+        self.assertEqual(set(new_year.gifts.values_list('name', flat=True)), {'Book', 'Card'})
+        self.assertEqual(Gift.objects.get(name='Card').status, Gift.Status.RESERVED)
+
+    def test_import_ndjson(self):
+        content = (
+            '{"name": "Book", "cost": "15.00", "wishlists": ["Birthday"]}\n'
+            'not json\n'
+            '{"name": "Bike"}\n'
+        )
+        upload = SimpleUploadedFile('gifts.ndjson', content.encode('utf-8'))
+
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(response.data['imported'], 2)
+        self.assertEqual(response.data['errors'][0]['line'], 2)
+        self.assertEqual(Wishlist.objects.get(user=self.user).gifts.get().name, 'Book')
+
+    def test_import_csv_with_byte_order_mark(self):
+        # «CSV UTF-8» из Excel начинается с BOM; заголовок должен читаться как обычно.
+        content = 'name,cost\nBook,15.00\nМяч,3.50\n'
+        upload = SimpleUploadedFile('gifts.csv', content.encode('utf-8-sig'), content_type='text/csv')
+
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual((response.data['imported'], response.data['errors']), (2, []))
+        self.assertEqual(set(Gift.objects.filter(user=self.user).values_list('name', flat=True)), {'Book', 'Мяч'})
+
+    def test_import_rejects_non_utf8_file(self):
+        content = 'name,cost\nBook,15.00\nCafé,3.50\n'
+        upload = SimpleUploadedFile('gifts.csv', content.encode('latin-1'), content_type='text/csv')
+
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('UTF-8', response.data['error'])
+        # Ничего не импортировано, даже строки до неверного байта.
+        self.assertFalse(Gift.objects.filter(user=self.user).exists())
+
+    def test_import_requires_file(self):
+        response = self.client.post(self.import_url, {}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_import_unknown_type(self):
+        upload = SimpleUploadedFile('gifts.xml', b'<gifts/>')
+        response = self.client.post(self.import_url, {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WishlistConditionalGetIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gift = Gift.objects.create(name='Book', user=self.user)
+        self.list_url = reverse("wishlist-list")
+        self.detail_url = reverse("wishlist-detail", args=[self.wishlist.id])
+        self.client.force_authenticate(user=self.user)
+
+    def test_unchanged_detail_poll_is_not_modified(self):
+        etag = self.client.get(self.detail_url)['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_membership_changes_invalidate_list_and_detail(self):
+        list_etag = self.client.get(self.list_url)['ETag']
+        detail_etag = self.client.get(self.detail_url)['ETag']
+
+        membership = WishlistGift.objects.create(wishlist=self.wishlist, gift=self.gift)
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['gifts'], [self.gift.id])
+        list_etag = response['ETag']
+
+        membership.delete()
+        self.assertEqual(self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag).status_code, status.HTTP_200_OK)
+        # The gifts list is the same again, but the wishlist's summary counters moved in between.
+        self.assertEqual(self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=detail_etag).status_code, status.HTTP_200_OK)
+
+    def test_gift_cost_change_invalidates_list(self):
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=self.gift)
+        list_etag = self.client.get(self.list_url)['ETag']
+
+        self.client.patch(reverse("gift-detail", args=[self.gift.id]), {'cost': '12.50'}, format='json')
+        response = self.client.get(self.list_url, HTTP_IF_NONE_MATCH=list_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['total_cost'], '12.50')
+
+
+class WishlistSparseFieldsetIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        for index in range(3):
+            wishlist = Wishlist.objects.create(name=f'List {index}', user=self.user)
+            gift = Gift.objects.create(name=f'Gift {index}', user=self.user)
+            WishlistGift.objects.create(wishlist=wishlist, gift=gift)
+        self.list_url = reverse("wishlist-list")
+        self.client.force_authenticate(user=self.user)
+
+    def test_omitting_gifts_skips_membership_queries(self):
+        # Агрегат для ETag и одна страница, без запроса M2M на каждый список.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.list_url, {'omit': 'gifts'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            set(response.data['results'][0]), {'id', 'name', 'user', 'gift_count', 'total_cost', 'reserved_count'}
+        )
+
+    def test_fields_on_membership_response(self):
+        wishlist = Wishlist.objects.create(name='New', user=self.user)
+        gift = Gift.objects.create(name='Lamp', user=self.user)
+        response = self.client.post(
+            f"{reverse('wishlist-add-gift', args=[wishlist.id])}?fields=id,gift",
+            {'gift_id': gift.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(set(response.data), {'id', 'gift'})
+        # Вложенный подарок остаётся полным.
+        self.assertIn('link', response.data['gift'])
+
+
+class WishlistExpandIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        for index in range(5):
+            wishlist = Wishlist.objects.create(name=f'List {index}', user=self.user)
+            for position in range(3):
+                gift = Gift.objects.create(name=f'Gift {index}.{position}', cost='10.50', user=self.user)
+                WishlistGift.objects.create(wishlist=wishlist, gift=gift)
+        self.list_url = reverse("wishlist-list")
+        self.client.force_authenticate(user=self.user)
+
+    def test_expand_gifts_uses_fixed_number_of_queries(self):
+        # ETag-агрегат, страница списков и один prefetch подарков.
+        with self.assertNumQueries(3):
+            response = self.client.get(self.list_url, {'expand': 'gifts'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['results'][0]
+        self.assertEqual([gift['name'] for gift in first['gifts']], ['Gift 0.0', 'Gift 0.1', 'Gift 0.2'])
+        self.assertEqual(first['gifts'][0]['cost'], '10.50')
+
+    def test_expand_gifts_on_detail(self):
+        wishlist = Wishlist.objects.filter(user=self.user).first()
+        response = self.client.get(reverse("wishlist-detail", args=[wishlist.id]), {'expand': 'gifts'})
+        self.assertEqual(len(response.data['gifts']), 3)
+        self.assertIn('link', response.data['gifts'][0])
+
+    def test_gift_change_invalidates_expanded_etag(self):
+        etag = self.client.get(self.list_url, {'expand': 'gifts'})['ETag']
+        gift = Gift.objects.filter(user=self.user).first()
+        gift.name = 'Renamed'
+        gift.save()
+
+        response = self.client.get(self.list_url, {'expand': 'gifts'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_unknown_expansion_is_rejected(self):
+        response = self.client.get(self.list_url, {'expand': 'owner'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expand', response.data)
+
+
+class WishlistBatchAddIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user) for i in range(200)]
+        self.url = reverse("wishlist-add-gift", args=[self.wishlist.id])
+        self.client.force_authenticate(user=self.user)
+
+    def test_adds_many_gifts_in_constant_queries(self):
+        gift_ids = [gift.id for gift in self.gifts]
+        # Число запросов не зависит от количества подарков.
+        with self.assertNumQueries(8):
+            response = self.client.post(self.url, {'gift_ids': gift_ids}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['added'], gift_ids)
+        self.assertEqual(WishlistGift.objects.filter(wishlist=self.wishlist).count(), 200)
+
+    def test_reports_present_and_not_found_ids(self):
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=self.gifts[0])
+        foreign = Gift.objects.create(
+            name='Foreign',
+            user=User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        )
+
+        response = self.client.post(
+            self.url,
+            {'gift_ids': [self.gifts[0].id, self.gifts[1].id, foreign.id, 999999, self.gifts[1].id]},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'added': [self.gifts[1].id],
+            'already_present': [self.gifts[0].id],
+            'not_found': [foreign.id, 999999],
+        })
+        self.assertFalse(WishlistGift.objects.filter(gift=foreign).exists())
+
+    def test_rejects_malformed_ids(self):
+        for payload in ({'gift_ids': []}, {'gift_ids': ['1']}, {'gift_ids': 5}):
+            response = self.client.post(self.url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class WishlistMembershipIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.target = Wishlist.objects.create(name='New Year', user=self.user)
+        self.gift = Gift.objects.create(name='Book', user=self.user)
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=self.gift)
+        self.client.force_authenticate(user=self.user)
+
+    def test_duplicate_add_is_a_validation_error(self):
+        response = self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]), {'gift_id': self.gift.id}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_integer_gift_id_is_rejected(self):
+        response = self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]), {'gift_id': 'abc'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_remove_gift(self):
+        url = reverse("wishlist-remove-gift", args=[self.wishlist.id, self.gift.id])
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Gift.objects.filter(pk=self.gift.pk).exists())
+
+    def test_move_gift(self):
+        response = self.client.post(
+            reverse("wishlist-move-gift", args=[self.wishlist.id, self.gift.id]),
+            {'wishlist_id': self.target.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'gift_id': self.gift.id, 'wishlist_id': self.target.id})
+        self.assertEqual(list(self.target.gifts.all()), [self.gift])
+        self.assertFalse(self.wishlist.gifts.exists())
+
+    def test_move_gift_to_foreign_wishlist_is_not_found(self):
+        foreign = Wishlist.objects.create(
+            name='Foreign', user=User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        )
+        response = self.client.post(
+            reverse("wishlist-move-gift", args=[self.wishlist.id, self.gift.id]),
+            {'wishlist_id': foreign.id},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(self.wishlist.gifts.exists())
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs a database with row-level concurrency')
+class WishlistConcurrentAddTests(TransactionTestCase):
+    def test_parallel_adds_never_fail(self):
+        user = User.objects.create_user(email='example@test.ru', password='strongpassword123')
+        wishlist = Wishlist.objects.create(name='Birthday', user=user)
+        gift = Gift.objects.create(name='Book', user=user)
+        url = reverse("wishlist-add-gift", args=[wishlist.id])
+        threads = 16
+        barrier = threading.Barrier(threads)
+        statuses = []
+
+        def add():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                statuses.append(client.post(url, {'gift_id': gift.id}, format='json').status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=add) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(statuses.count(status.HTTP_400_BAD_REQUEST), threads - 1)
+        self.assertEqual(WishlistGift.objects.filter(wishlist=wishlist).count(), 1)
+
+
+class WishlistOrderingIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user) for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [gift.id for gift in self.gifts]},
+            format='json'
+        )
+
+    def test_reorder_changes_listed_order(self):
+        first, second, third = (gift.id for gift in self.gifts)
+        response = self.client.post(
+            reverse("wishlist-reorder-gift", args=[self.wishlist.id, third]),
+            {'after': None, 'before': first},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        detail = self.client.get(reverse("wishlist-detail", args=[self.wishlist.id]))
+        self.assertEqual(detail.data['gifts'], [third, first, second])
+        expanded = self.client.get(reverse("wishlist-detail", args=[self.wishlist.id]), {'expand': 'gifts'})
+        self.assertEqual([gift['id'] for gift in expanded.data['gifts']], [third, first, second])
+        listed = self.client.get(reverse("wishlist-list"))
+        self.assertEqual(listed.data['results'][0]['gifts'], [third, first, second])
+
+    def test_reorder_rejects_bad_neighbours(self):
+        url = reverse("wishlist-reorder-gift", args=[self.wishlist.id, self.gifts[0].id])
+        self.assertEqual(
+            self.client.post(url, {'after': 'x'}, format='json').status_code, status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.post(url, {'after': self.gifts[0].id}, format='json').status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class WishlistShareIntegrationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.book = Gift.objects.create(name='Book', cost='15.00', user=self.user)
+        self.bike = Gift.objects.create(name='Bike', user=self.user)
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [self.book.id, self.bike.id]},
+            format='json'
+        )
+        response = self.client.post(reverse("wishlist-share", args=[self.wishlist.id]))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.token = response.data['token']
+        self.assertTrue(response.data['url'].endswith(reverse("shared-wishlist", args=[self.token])))
+        self.public = APIClient()
+
+    def fetch(self):
+        return self.public.get(reverse("shared-wishlist", args=[self.token]))
+
+    def test_anonymous_read(self):
+        response = self.fetch()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = json.loads(response.content)
+        self.assertEqual(data['name'], 'Birthday')
+        self.assertEqual([gift['id'] for gift in data['gifts']], [self.book.id, self.bike.id])
+        self.assertEqual(data['gifts'][0]['cost'], '15.00')
+        self.assertNotIn('user', data['gifts'][0])
+
+    def test_cache_hit_is_one_query(self):
+        first = self.fetch()
+        # Только поиск по токену: тело берётся из кэша.
+        with self.assertNumQueries(1):
+            second = self.fetch()
+        self.assertEqual(first.content, second.content)
+
+    def test_etag_revalidation(self):
+        etag = self.fetch()['ETag']
+        response = self.public.get(reverse("shared-wishlist", args=[self.token]), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_revoke_and_rotate(self):
+        response = self.client.post(reverse("wishlist-share", args=[self.wishlist.id]))
+        self.assertEqual(self.fetch().status_code, status.HTTP_404_NOT_FOUND)
+        self.token = response.data['token']
+        self.assertEqual(self.fetch().status_code, status.HTTP_200_OK)
+
+        response = self.client.delete(reverse("wishlist-share", args=[self.wishlist.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.fetch().status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_guests_reserve_with_the_token(self):
+        guest = User.objects.create_user(email='guest@test.ru', password='strongpassword123')
+        other_guest = User.objects.create_user(email='guest2@test.ru', password='strongpassword123')
+        url = reverse("shared-gift-reserve", args=[self.token, self.bike.id])
+
+        self.client.force_authenticate(user=guest)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        self.bike.refresh_from_db()
+        self.assertEqual((self.bike.status, self.bike.reserved_by), (Gift.Status.RESERVED, guest))
+
+        # Второй гость проигрывает гонку и не может снять чужую бронь.
+        self.client.force_authenticate(user=other_guest)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=guest)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_200_OK)
+        self.client.force_authenticate(user=other_guest)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+
+        # Владелец может снять любую бронь своего подарка.
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(self.client.post(reverse("gift-unreserve", args=[self.bike.id])).status_code, status.HTTP_200_OK)
+        self.bike.refresh_from_db()
+        self.assertIsNone(self.bike.reserved_by)
+
+    def test_reservation_needs_the_current_token(self):
+        stranger = User.objects.create_user(email='stranger@test.ru', password='strongpassword123')
+        other = Gift.objects.create(name='Lamp', user=self.user)
+        self.client.force_authenticate(user=stranger)
+
+        for token, gift_id in (('guessed', self.bike.id), (self.token, other.id)):
+            response = self.client.post(reverse("shared-gift-reserve", args=[token, gift_id]))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, (token, gift_id))
+
+        # Отозванная ссылка больше не даёт доступа к подаркам.
+        self.client.force_authenticate(user=self.user)
+        self.client.delete(reverse("wishlist-share", args=[self.wishlist.id]))
+        self.client.force_authenticate(user=stranger)
+        response = self.client.post(reverse("shared-gift-reserve", args=[self.token, self.bike.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.bike.refresh_from_db()
+        self.assertEqual(self.bike.status, Gift.Status.AVAILABLE)
+
+    def test_reservation_needs_authentication(self):
+        response = self.public.post(reverse("shared-gift-reserve", args=[self.token, self.bike.id]))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_other_users_cannot_share(self):
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        self.client.force_authenticate(user=other)
+        response = self.client.post(reverse("wishlist-share", args=[self.wishlist.id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def assert_invalidated(self, change):
+        before = json.loads(self.fetch().content)
+        change()
+        after = json.loads(self.fetch().content)
+        self.assertNotEqual(before, after)
+        return after
+
+    def test_gift_edit_invalidates(self):
+        after = self.assert_invalidated(lambda: self.client.patch(
+            reverse("gift-detail", args=[self.book.id]), {'name': 'Novel'}, format='json'
+        ))
+        self.assertEqual(after['gifts'][0]['name'], 'Novel')
+
+    def test_reserve_invalidates(self):
+        after = self.assert_invalidated(lambda: self.client.post(reverse("gift-reserve", args=[self.bike.id])))
+        self.assertEqual(after['gifts'][1]['status'], Gift.Status.RESERVED)
+
+    def test_membership_changes_invalidate(self):
+        lamp = Gift.objects.create(name='Lamp', user=self.user)
+        after = self.assert_invalidated(lambda: self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]), {'gift_id': lamp.id}, format='json'
+        ))
+        self.assertEqual(len(after['gifts']), 3)
+        after = self.assert_invalidated(lambda: self.client.delete(
+            reverse("wishlist-remove-gift", args=[self.wishlist.id, self.book.id])
+        ))
+        self.assertEqual([gift['id'] for gift in after['gifts']], [self.bike.id, lamp.id])
+
+    def test_rename_invalidates(self):
+        after = self.assert_invalidated(lambda: self.client.patch(
+            reverse("wishlist-detail", args=[self.wishlist.id]), {'name': 'Wedding'}, format='json'
+        ))
+        self.assertEqual(after['name'], 'Wedding')
+
+
+class WishlistCloneIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user) for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [gift.id for gift in self.gifts]},
+            format='json'
+        )
+        self.url = reverse("wishlist-clone", args=[self.wishlist.id])
+
+    def test_clone(self):
+        response = self.client.post(self.url, {'name': 'Next year', 'copy_gifts': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], 'Next year')
+        self.assertEqual(response.data['gift_count'], 3)
+        self.assertEqual(len(response.data['gifts']), 3)
+        self.assertTrue(set(response.data['gifts']).isdisjoint(gift.id for gift in self.gifts))
+
+        response = self.client.post(self.url, format='json')
+        self.assertEqual(response.data['name'], 'Birthday (copy)')
+        self.assertEqual(sorted(response.data['gifts']), [gift.id for gift in self.gifts])
+
+    def test_clone_rejects_bad_input(self):
+        self.assertEqual(self.client.post(self.url, {'name': ''}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.post(self.url, {'copy_gifts': 'yes'}, format='json').status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_cannot_clone_other_users_wishlist(self):
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.post(self.url, format='json').status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WishlistBackgroundDeletionIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Huge', user=self.user)
+        self.gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user) for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [gift.id for gift in self.gifts]},
+            format='json'
+        )
+        self.url = reverse("wishlist-detail", args=[self.wishlist.id])
+
+    def test_background_deletion(self):
+        response = self.client.delete(f"{self.url}?mode=background")
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_url = response['Location']
+        self.assertEqual(job_url, reverse("deletion-job", args=[response.data['id']]))
+
+        # Вишлист скрыт сразу, ещё до работы воркера.
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(reverse("wishlist-list")).data['results'], [])
+        self.assertEqual(self.client.get(job_url).data['progress'], 0.0)
+
+        call_command('run_deletion_jobs', once=True, stdout=io.StringIO())
+        job = self.client.get(job_url).data
+        self.assertEqual((job['state'], job['progress']), ('done', 1.0))
+        self.assertEqual(job['deleted'], {'wishlists.WishlistGift': 3, 'wishlists.Wishlist': 1})
+        self.assertEqual(Gift.objects.filter(user=self.user).count(), 3)
+
+    def test_jobs_of_other_users_are_hidden(self):
+        job_id = self.client.delete(f"{self.url}?mode=background").data['id']
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(reverse("deletion-job", args=[job_id])).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class WishlistSyncIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gifts = [Gift.objects.create(name=f'Gift {i}', user=self.user, cost=10) for i in range(3)]
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [gift.id for gift in self.gifts[:2]]},
+            format='json'
+        )
+        self.url = reverse("sync")
+
+    def sync(self, since, **params):
+        self.number_changes()
+        response = self.client.get(self.url, {'since': since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def number_changes(self):
+        # На PostgreSQL изменения нумеруются при коммите, а тест не коммитит:
+        # проверка ограничений запускает отложенные триггеры сразу.
+        connection.check_constraints()
+
+    def test_full_sync_then_nothing(self):
+        data = self.sync(0)
+        self.assertFalse(data['has_more'])
+        self.assertEqual([gift['id'] for gift in data['gifts']], [gift.id for gift in self.gifts])
+        self.assertEqual(data['wishlists'][0]['gifts'], [self.gifts[0].id, self.gifts[1].id])
+        self.assertEqual(data['wishlists'][0]['gift_count'], 2)
+        self.assertEqual(
+            [(item['wishlist'], item['gift']) for item in data['wishlist_gifts']],
+            [(self.wishlist.id, self.gifts[0].id), (self.wishlist.id, self.gifts[1].id)],
+        )
+        self.assertEqual(data['deleted'], {'gifts': [], 'wishlists': [], 'wishlist_gifts': []})
+
+        again = self.sync(data['cursor'])
+        self.assertEqual(again['cursor'], data['cursor'])
+        self.assertEqual((again['gifts'], again['wishlists'], again['wishlist_gifts']), ([], [], []))
+
+    def test_only_changes_since_cursor(self):
+        cursor = self.sync(0)['cursor']
+        membership = WishlistGift.objects.get(wishlist=self.wishlist, gift=self.gifts[1])
+        self.client.patch(reverse("gift-detail", args=[self.gifts[2].id]), {'name': 'Renamed'}, format='json')
+        self.client.delete(reverse("wishlist-remove-gift", args=[self.wishlist.id, self.gifts[1].id]))
+
+        data = self.sync(cursor)
+        self.assertGreater(data['cursor'], cursor)
+        self.assertEqual([gift['name'] for gift in data['gifts']], ['Renamed'])
+        # Удаление из вишлиста меняет и сам вишлист (счётчики).
+        self.assertEqual([(w['id'], w['gift_count']) for w in data['wishlists']], [(self.wishlist.id, 1)])
+        self.assertEqual(data['wishlist_gifts'], [])
+        self.assertEqual(data['deleted']['wishlist_gifts'], [membership.id])
+
+    def test_writes_outside_the_orm_are_recorded(self):
+        cursor = self.sync(0)['cursor']
+        with connection.cursor() as db:
+            db.execute("UPDATE gifts_gift SET status = 'reserved' WHERE id = %s", [self.gifts[0].id])
+        Gift.objects.filter(pk=self.gifts[2].id).delete()
+
+        data = self.sync(cursor)
+        self.assertEqual([(gift['id'], gift['status']) for gift in data['gifts']], [(self.gifts[0].id, 'reserved')])
+        self.assertEqual(data['deleted']['gifts'], [self.gifts[2].id])
+
+    def test_paging_with_limit(self):
+        seen, cursor, has_more = [], 0, True
+        while has_more:
+            data = self.sync(cursor, limit=2)
+            seen += [('gift', g['id']) for g in data['gifts']] + [('wishlist', w['id']) for w in data['wishlists']]
+            seen += [('wishlist_gift', m['id']) for m in data['wishlist_gifts']]
+            cursor, has_more = data['cursor'], data['has_more']
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), 6)
+
+    def test_pending_deletion_and_other_users(self):
+        cursor = self.sync(0)['cursor']
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        Gift.objects.create(name='Not mine', user=other)
+        self.client.delete(f"{reverse('wishlist-detail', args=[self.wishlist.id])}?mode=background")
+
+        data = self.sync(cursor)
+        self.assertEqual(data['gifts'], [])
+        self.assertEqual(data['deleted']['wishlists'], [self.wishlist.id])
+
+    def test_query_count_follows_changes(self):
+        cursor = self.sync(0)['cursor']
+        for gift in self.gifts:
+            Gift.objects.filter(pk=gift.pk).update(name=gift.name + '!')
+        Wishlist.objects.filter(pk=self.wishlist.pk).update(name='Renamed')
+        self.number_changes()
+        # Изменения, подарки, вишлисты и их подарки; связи не менялись — без запроса.
+        with self.assertNumQueries(4):
+            data = self.client.get(self.url, {'since': cursor}).data
+        self.assertEqual(len(data['gifts']), 3)
+
+    def test_invalid_params(self):
+        for params in ({'since': 'abc'}, {'since': -1}, {'since': 0, 'limit': 0}, {'since': 0, 'limit': 10 ** 6}):
+            response = self.client.get(self.url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'needs a database with row-level concurrency')
+class WishlistSyncConcurrencyTests(TransactionTestCase):
+    def test_opposite_lock_orders_do_not_deadlock(self):
+        user = User.objects.create_user(email='example@test.ru', password='strongpassword123')
+        wishlist = Wishlist.objects.create(name='Birthday', user=user)
+        first, second = (Gift.objects.create(name=f'Gift {i}', user=user) for i in range(2))
+        WishlistGift.objects.create(wishlist=wishlist, gift=first)
+        reserved, renamed = threading.Event(), threading.Event()
+        errors = []
+
+        def reserve_then_bump_wishlist():
+            # Как резерв гостем: сначала подарок, потом версия его вишлиста.
+            try:
+                with transaction.atomic():
+                    Gift.objects.filter(pk=first.pk).update(status=Gift.Status.RESERVED)
+                    reserved.set()
+                    renamed.wait(timeout=3)
+                    Wishlist.objects.filter(pk=wishlist.pk).update(version=F('version') + 1)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        def rename_then_touch_gift():
+            # Сначала строка вишлиста, потом подарок того же пользователя.
+            try:
+                reserved.wait(timeout=3)
+                with transaction.atomic():
+                    Wishlist.objects.filter(pk=wishlist.pk).update(name='Renamed')
+                    renamed.set()
+                    Gift.objects.filter(pk=second.pk).update(name='Renamed')
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=reserve_then_bump_wishlist), threading.Thread(target=rename_then_touch_gift)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(renamed.is_set())
+        numbers = list(SyncChange.objects.filter(user_id=user.pk).values_list('seq', flat=True))
+        self.assertNotIn(None, numbers)
+        self.assertEqual(len(numbers), len(set(numbers)))
+
+
+class WishlistAsyncReadIntegrationTests(APITestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.enterClassContext(async_read_views())
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        Wishlist.objects.create(name='Empty', user=self.user)
+        for name in ('Book', 'Lamp'):
+            WishlistGift.objects.create(wishlist=self.wishlist, gift=Gift.objects.create(name=name, cost='5.00', user=self.user))
+        self.detail_url = reverse("wishlist-detail", args=[self.wishlist.id])
+        self.client.force_login(self.user)
+
+    def sync_response(self, actions, path, **kwargs):
+        with self.settings(ASYNC_READ_VIEWS=False):
+            view = WishlistViewSet.as_view(actions)
+        request = APIRequestFactory().get(path)
+        force_authenticate(request, user=self.user)
+        return view(request, **kwargs)
+
+    def test_list_matches_sync_view(self):
+        for query in ('', '?page_size=1', '?fields=id,gifts'):
+            url = reverse("wishlist-list") + query
+            response = self.client.get(url)
+            expected = self.sync_response({'get': 'list'}, url)
+            self.assertEqual(response.data, expected.data, query)
+            self.assertEqual(response['ETag'], expected['ETag'], query)
+
+    def test_detail_matches_sync_view(self):
+        # Сессия, пользователь, состояние для ETag, список и его подарки.
+        with self.assertNumQueries(5):
+            response = self.client.get(self.detail_url)
+        self.assertEqual(response.data, self.sync_response({'get': 'retrieve'}, self.detail_url, pk=self.wishlist.id).data)
+        self.assertEqual(len(response.data['gifts']), 2)
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_pending_deletion_is_hidden(self):
+        Wishlist.objects.filter(pk=self.wishlist.pk).update(pending_deletion=True)
+        self.assertEqual(self.client.get(self.detail_url).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(len(self.client.get(reverse("wishlist-list")).data['results']), 1)
+
+
+@patch('bestwishes.live.close_old_connections')
+class WishlistLiveUpdatesIntegrationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='example@test.ru',
+            password='strongpassword123'
+        )
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.gift = Gift.objects.create(name='Book', user=self.user)
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("wishlist-add-gift", args=[self.wishlist.id]),
+            {'gift_ids': [self.gift.id]},
+            format='json'
+        )
+        self.token = self.client.post(reverse("wishlist-share", args=[self.wishlist.id])).data['token']
+        self.session = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def open(self, path, cookie=True):
+        headers = [(b'cookie', f'{settings.SESSION_COOKIE_NAME}={self.session}'.encode())] if cookie else []
+        communicator = ApplicationCommunicator(application, {
+            'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'headers': headers,
+        })
+        return communicator
+
+    async def start(self, communicator):
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        return await communicator.receive_output(2)
+
+    async def body(self, communicator):
+        return (await communicator.receive_output(2))['body']
+
+    def change(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def test_owner_stream(self, _):
+        async def scenario():
+            stream = self.open(f'/wishlists/{self.wishlist.id}/events/')
+            start = await self.start(stream)
+            self.assertEqual(start['status'], 200)
+            self.assertIn((b'content-type', b'text/event-stream'), start['headers'])
+            self.assertEqual(await self.body(stream), b'retry: 5000\n\n')
+
+            await sync_to_async(self.change)('post', reverse("gift-reserve", args=[self.gift.id]))
+            self.assertEqual(
+                await self.body(stream),
+                f'event: gift\ndata: {{"gift": {self.gift.id}, "status": "reserved"}}\n\n'.encode(),
+            )
+            await sync_to_async(self.change)('delete', reverse("wishlist-remove-gift", args=[self.wishlist.id, self.gift.id]))
+            self.assertEqual(
+                await self.body(stream),
+                f'event: wishlist\ndata: {{"wishlist": {self.wishlist.id}}}\n\n'.encode(),
+            )
+
+            # Отключение клиента освобождает подписку.
+            await stream.send_input({'type': 'http.disconnect'})
+            await stream.wait(2)
+            self.assertEqual(get_hub().connections, 0)
+
+        async_to_sync(scenario)()
+
+    def test_shared_stream_and_keep_alive(self, _):
+        async def scenario():
+            stream = self.open(f'/wishlists/shared/{self.token}/events/', cookie=False)
+            self.assertEqual((await self.start(stream))['status'], 200)
+            await self.body(stream)
+            self.assertEqual(await self.body(stream), b': keep-alive\n\n')
+            await stream.send_input({'type': 'http.disconnect'})
+            await stream.wait(2)
+
+        with self.settings(LIVE_HEARTBEAT_INTERVAL=0.05):
+            async_to_sync(scenario)()
+
+    def test_stream_ends_once_access_is_revoked(self, _):
+        def change_password():
+            self.user.set_password('newpassword123')
+            self.user.save()
+
+        async def scenario():
+            stream = self.open(f'/wishlists/{self.wishlist.id}/events/')
+            self.assertEqual((await self.start(stream))['status'], 200)
+            await self.body(stream)
+
+            # Смена пароля завершает сессию: поток закрывается при следующей проверке.
+            await sync_to_async(change_password)()
+            message = await stream.receive_output(2)
+            while message.get('more_body'):
+                self.assertEqual(message['body'], b': keep-alive\n\n')
+                message = await stream.receive_output(2)
+            self.assertEqual(message['body'], b'')
+            await stream.wait(2)
+            self.assertEqual(get_hub().connections, 0)
+
+        with self.settings(LIVE_REAUTHORIZE_INTERVAL=0.05):
+            async_to_sync(scenario)()
+
+    def test_access(self, _):
+        other = User.objects.create_user(email='other@test.ru', password='strongpassword123')
+        others = Wishlist.objects.create(name='Not mine', user=other)
+
+        async def status_of(path, cookie=True):
+            return (await self.start(self.open(path, cookie)))['status']
+
+        async def scenario():
+            self.assertEqual(await status_of(f'/wishlists/{self.wishlist.id}/events/', cookie=False), 403)
+            self.assertEqual(await status_of(f'/wishlists/{others.id}/events/'), 404)
+            self.assertEqual(await status_of('/wishlists/shared/unknown/events/', cookie=False), 404)
+
+        async_to_sync(scenario)()
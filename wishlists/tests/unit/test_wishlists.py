@@ -1,13 +1,36 @@
+import asyncio
+import io
+import os
+import tempfile
+import threading
+import time
 import unittest
+from datetime import timedelta
+from decimal import Decimal
 from gifts.models import Gift
-from wishlists.models import Wishlist, WishlistGift
+from wishlists.models import DeletionJob, SyncChange, Wishlist, WishlistGift
+from wishlists.deletion import claim_next_job, progress, run_job, schedule_user_deletion, schedule_wishlist_deletion
 from wishlists.serializers import WishlistSerializer, WishlistGiftSerializer, CreateGiftForWishlistSerializer
-from django.test import TestCase
-from rest_framework.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound, ValidationError
 from unittest.mock import Mock, patch
 from django.contrib.auth import get_user_model
 from wishlists.services import add_gift_to_wishlist, create_and_add_gift_to_wishlist
+from wishlists.services import move_gift_between_wishlists, remove_gift_from_wishlist
+from wishlists.services import add_gifts_to_wishlist, reorder_gift_in_wishlist, clone_wishlist
+from wishlists.positions import InvalidPosition, key_between, keys_after
+from wishlists.summary import SUMMARY_FIELDS, reconcile_summaries
+from gifts.services import bulk_delete_gifts, bulk_update_gifts, reserve_gift, unreserve_gift
+from gifts.signals import gifts_changed
 from wishlists.services import _ensure_wishlist_ownership
+from wishlists.imports import ParsedRow, import_gifts
+from django.core.management import CommandError, call_command
+from django.core.cache import cache
+from bestwishes.cache import get_or_build
+from bestwishes.live import RESYNC, Hub, LocalBroker
 
 User = get_user_model()
 
@@ -53,6 +76,14 @@ class WishlistSerializersTestCase(TestCase):
         self.assertTrue(serializer.is_valid())
         self.assertEqual(serializer.validated_data['image'], '')
 
+    def test_create_gift_serializer_needs_name_or_link(self):
+        # Без названия подарок называется по заголовку страницы из ссылки.
+        self.assertTrue(CreateGiftForWishlistSerializer(data={'link': 'http://example.com/p'}).is_valid())
+
+        serializer = CreateGiftForWishlistSerializer(data={'name': '', 'link': ''})
+        self.assertFalse(serializer.is_valid())
+        self.assertIn('name', serializer.errors)
+
     def test_wishlist_serializer_gifts_empty_list_when_no_relations(self):
         serializer = WishlistSerializer(self.wishlist)
         data = serializer.data
@@ -80,9 +111,10 @@ class TestWishlistServices(TestCase):
         # Create a wishlist for testing
         self.wishlist = Wishlist.objects.create(name='Test Wishlist', user=self.user)
 
+    @patch("wishlists.services.add_memberships")
     @patch("wishlists.services.WishlistGift")
     @patch('wishlists.services.Gift')
-    def test_create_and_add_gift_to_wishlist_creates_gift(self, MockGift, MockWishlistGift):
+    def test_create_and_add_gift_to_wishlist_creates_gift(self, MockGift, MockWishlistGift, mock_add_memberships):
         gift_data = {
             'name': 'New Gift',
             'link': 'http://example.com',
@@ -94,7 +126,6 @@ class TestWishlistServices(TestCase):
         mock_gift_instance = Mock()
         MockGift.objects.create.return_value = mock_gift_instance
 
-        MockWishlistGift.objects.filter.return_value.exists.return_value = False
         MockWishlistGift.objects.create.return_value = Mock()
 
         result = create_and_add_gift_to_wishlist(
@@ -106,71 +137,103 @@ class TestWishlistServices(TestCase):
         MockGift.objects.create.assert_called_once_with(user=self.user, **gift_data)
         self.assertEqual(result.gift, mock_gift_instance)
         self.assertEqual(result.wishlist_gift, MockWishlistGift.objects.create.return_value)
+        mock_add_memberships.assert_called_once_with([self.wishlist.pk], [mock_gift_instance.pk])
 
-    @patch('wishlists.services.WishlistGift')
-    def test_create_gift_to_wishlist_raises_if_gift_already_in_wishlist(self, MockWishlistGift):
-        gift_data = {
-            'name': 'Existing Gift',
-            'link': 'http://example.com',
-            'cost': 20.0,
-            'image': 'http://example.com/image.jpg',
-            'status': Gift.Status.AVAILABLE
-        }
-
-        mock_gift_instance = Mock()
-        mock_gift_instance.id = 1
+    @override_settings(GIFT_ENRICHMENT_ENABLED=True)
+    @patch('gifts.enrichment.get_pipeline')
+    def test_create_and_add_gift_enqueues_enrichment_on_commit(self, get_pipeline):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = create_and_add_gift_to_wishlist(
+                user=self.user,
+                wishlist=self.wishlist,
+                gift_data={'link': 'http://example.com/p'}
+            )
+            get_pipeline.assert_not_called()
 
-        with patch('wishlists.services.Gift.objects.create', return_value=mock_gift_instance):
-            MockWishlistGift.objects.filter.return_value.exists.return_value = True
+        get_pipeline.return_value.submit.assert_called_once_with(result.gift.id, 'http://example.com/p', block=False)
 
-            with self.assertRaises(ValidationError) as context:
-                create_and_add_gift_to_wishlist(
-                    user=self.user,
-                    wishlist=self.wishlist,
-                    gift_data=gift_data
-                )
+    def test_add_gift_to_wishlist(self):
+        gift = Gift.objects.create(user=self.user, name='Test Gift')
 
-            self.assertEqual(str(context.exception.detail[0]), "Gift already in this wishlist.")
-        MockWishlistGift.objects.filter.assert_called_once_with(wishlist=self.wishlist, gift=mock_gift_instance)
+        # SELECT подарка с проверкой владельца, MAX позиции, один INSERT,
+        # счётчики и версия вишлиста, всё в одной точке сохранения.
+        with self.assertNumQueries(7):
+            result = add_gift_to_wishlist(
+                user=self.user,
+                wishlist=self.wishlist,
+                gift_id=gift.id
+            )
 
-    @patch('wishlists.services.WishlistGift')
-    def test_add_gift_to_wishlist(self, MockWishlistGift):
-        mock_gift_instance = Mock()
-        mock_gift_instance.id = 1
+        self.assertEqual(result.gift, gift)
+        self.assertEqual(result.wishlist_gift, WishlistGift.objects.get(wishlist=self.wishlist, gift=gift))
+        self.assertFalse(result.created_gift)
 
-        with patch('wishlists.services.Gift.objects.get', return_value=mock_gift_instance):
-            MockWishlistGift.objects.filter.return_value.exists.return_value = False
-            mock_wishlist_gift_instance = Mock()
-            MockWishlistGift.objects.create.return_value = mock_wishlist_gift_instance
+    def test_add_gift_to_wishlist_raises_if_gift_already_in_wishlist(self):
+        gift = Gift.objects.create(user=self.user, name='Test Gift')
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=gift)
 
-            result = add_gift_to_wishlist(
+        with self.assertRaises(ValidationError) as context:
+            add_gift_to_wishlist(
                 user=self.user,
                 wishlist=self.wishlist,
-                gift_id=mock_gift_instance.id
+                gift_id=gift.id
             )
 
-        self.assertEqual(result.gift, mock_gift_instance)
-        self.assertEqual(result.wishlist_gift, mock_wishlist_gift_instance)
-        MockWishlistGift.objects.filter.assert_called_once_with(wishlist=self.wishlist, gift=mock_gift_instance)
-        MockWishlistGift.objects.create.assert_called_once_with(wishlist=self.wishlist, gift=mock_gift_instance)
+        self.assertEqual(str(context.exception.detail[0]), "Gift already in this wishlist.")
+        self.assertEqual(WishlistGift.objects.filter(wishlist=self.wishlist).count(), 1)
 
-    @patch('wishlists.services.WishlistGift')
-    def test_add_gift_to_wishlist_raises_if_gift_already_in_wishlist(self, MockWishlistGift):
-        mock_gift_instance = Mock()
-        mock_gift_instance.id = 1
+    def test_add_gift_of_other_user_raises_not_found(self):
+        other_user = User.objects.create_user(email='otheruser', password='otherpass')
+        gift = Gift.objects.create(user=other_user, name='Foreign Gift')
 
-        with patch('wishlists.services.Gift.objects.get', return_value=mock_gift_instance):
-            MockWishlistGift.objects.filter.return_value.exists.return_value = True
+        with self.assertRaises(NotFound):
+            add_gift_to_wishlist(user=self.user, wishlist=self.wishlist, gift_id=gift.id)
 
-            with self.assertRaises(ValidationError) as context:
-                add_gift_to_wishlist(
-                    user=self.user,
-                    wishlist=self.wishlist,
-                    gift_id=mock_gift_instance.id
-                )
+    def test_remove_gift_from_wishlist(self):
+        gift = Gift.objects.create(user=self.user, name='Test Gift')
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=gift)
+
+        with self.assertNumQueries(5):  # DELETE, счётчики и версия вишлиста в точке сохранения
+            remove_gift_from_wishlist(user=self.user, wishlist=self.wishlist, gift_id=gift.id)
 
-            self.assertEqual(str(context.exception.detail[0]), "Gift already in this wishlist.")
-        MockWishlistGift.objects.filter.assert_called_once_with(wishlist=self.wishlist, gift=mock_gift_instance)
+        self.assertTrue(Gift.objects.filter(pk=gift.pk).exists())
+        with self.assertRaises(NotFound):
+            remove_gift_from_wishlist(user=self.user, wishlist=self.wishlist, gift_id=gift.id)
+
+    def test_move_gift_between_wishlists(self):
+        gift = Gift.objects.create(user=self.user, name='Test Gift')
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=gift)
+        target = Wishlist.objects.create(name='Target', user=self.user)
+
+        with self.assertNumQueries(8):  # MAX позиции и UPDATE во вложенной точке сохранения, счётчики, версии
+            move_gift_between_wishlists(
+                user=self.user, wishlist=self.wishlist, gift_id=gift.id, target_wishlist_id=target.id
+            )
+
+        self.assertEqual(list(WishlistGift.objects.values_list('wishlist_id', flat=True)), [target.id])
+
+    def test_move_gift_reports_failures(self):
+        gift = Gift.objects.create(user=self.user, name='Test Gift')
+        target = Wishlist.objects.create(name='Target', user=self.user)
+        WishlistGift.objects.create(wishlist=self.wishlist, gift=gift)
+        WishlistGift.objects.create(wishlist=target, gift=gift)
+        foreign = Wishlist.objects.create(
+            name='Foreign', user=User.objects.create_user(email='otheruser', password='otherpass')
+        )
+
+        with self.assertRaises(ValidationError):
+            move_gift_between_wishlists(
+                user=self.user, wishlist=self.wishlist, gift_id=gift.id, target_wishlist_id=target.id
+            )
+        with self.assertRaises(NotFound):
+            move_gift_between_wishlists(
+                user=self.user, wishlist=self.wishlist, gift_id=gift.id, target_wishlist_id=foreign.id
+            )
+        with self.assertRaises(NotFound):
+            move_gift_between_wishlists(
+                user=self.user, wishlist=self.wishlist, gift_id=gift.id + 1, target_wishlist_id=target.id
+            )
+        self.assertEqual(WishlistGift.objects.count(), 2)
 
     def test_ensure_wishlist_ownership_raises_for_different_user(self):
         other_user = User.objects.create_user(email='otheruser', password='otherpass')
@@ -189,3 +252,522 @@ class TestWishlistServices(TestCase):
             self.assertEqual(str(context.exception), "Gift not found.")
 
 
+class TestImportGifts(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser', password='testpass')
+
+    def test_import_spans_batches_and_reuses_wishlists(self):
+        rows = [
+            ParsedRow(line=i, data={'name': f'Gift {i}', 'wishlists': ['Birthday']})
+            for i in range(1, 6)
+        ]
+        report = import_gifts(user=self.user, rows=rows, batch_size=2)
+
+        self.assertEqual((report.total, report.imported, report.memberships), (5, 5, 5))
+        self.assertEqual(Wishlist.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Wishlist.objects.get(user=self.user).gifts.count(), 5)
+
+    def test_import_rejects_malformed_wishlists(self):
+        rows = [ParsedRow(line=1, data={'name': 'Gift', 'wishlists': 'Birthday'})]
+        report = import_gifts(user=self.user, rows=rows)
+
+        self.assertEqual(report.imported, 0)
+        self.assertIn('wishlists', report.errors[0]['errors'])
+
+    @override_settings(GIFT_ENRICHMENT_ENABLED=True)
+    @patch('gifts.enrichment.get_pipeline')
+    def test_import_enqueues_linked_gifts(self, get_pipeline):
+        rows = [
+            ParsedRow(line=1, data={'link': 'http://example.com/a'}),
+            ParsedRow(line=2, data={'name': 'Pen'}),
+            ParsedRow(line=3, data={'name': 'Book', 'link': 'http://example.com/b'}),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            report = import_gifts(user=self.user, rows=rows, batch_size=2)
+
+        self.assertEqual(report.imported, 3)
+        submitted = [call.args[1] for call in get_pipeline.return_value.submit.call_args_list]
+        self.assertEqual(submitted, ['http://example.com/a', 'http://example.com/b'])
+
+    def test_import_gifts_command(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('name,cost,wishlists\nBook,15.00,Birthday\nPen,-1,\n')
+        self.addCleanup(os.remove, f.name)
+        out, err = io.StringIO(), io.StringIO()
+
+        call_command('import_gifts', f.name, email='testuser', stdout=out, stderr=err)
+
+        self.assertIn('Imported 1 of 2 rows', out.getvalue())
+        self.assertIn('line 3', err.getvalue())
+        self.assertTrue(Gift.objects.filter(user=self.user, name='Book').exists())
+
+    def test_import_gifts_command_rejects_non_utf8_file(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as f:
+            f.write('name\nCafé\n'.encode('latin-1'))
+        self.addCleanup(os.remove, f.name)
+
+        with self.assertRaisesMessage(CommandError, 'not UTF-8'):
+            call_command('import_gifts', f.name, email='testuser', stdout=io.StringIO())
+        self.assertFalse(Gift.objects.filter(user=self.user).exists())
+
+
+class TestBenchSerializers(TestCase):
+    def test_fast_path_matches_serializers(self):
+        out = io.StringIO()
+        call_command('bench_serializers', rows=20, gifts_per_wishlist=3, repeat=1, stdout=out)
+        self.assertEqual(out.getvalue().count('speedup'), 4)
+        self.assertFalse(User.objects.filter(email__startswith='bench-').exists())
+
+
+class TestBenchAsyncViews(TransactionTestCase):
+    # Потоки WSGI-сервера читают через свои соединения, поэтому данные должны быть закоммичены.
+    def test_servers_agree(self):
+        out = io.StringIO()
+        call_command('bench_async_views', requests=10, concurrency=5, threads=2, latency=0.001, gifts=5, stdout=out)
+        self.assertIn('ASGI/WSGI throughput', out.getvalue())
+        self.assertFalse(User.objects.filter(email__startswith='bench-').exists())
+
+
+class TestBenchReservations(TransactionTestCase):
+    def test_guests_reserve_each_gift_once(self):
+        out = io.StringIO()
+        call_command('bench_reservations', gifts=10, threads=3, stdout=out)
+        output = out.getvalue()
+        self.assertNotIn('more than one caller', output)
+        # Каждая удачная резервация — ровно одна запись, даже если часть вызовов упала.
+        reserved = output.split('reserved gifts:')[1].split('/')[0].strip()
+        won = output.split('winning calls:')[1].split()[0]
+        self.assertEqual(reserved, won)
+        # SQLite в тестах — общая база в памяти: параллельные записи сразу падают
+        # с «database is locked», поэтому полного результата ждём только от PostgreSQL.
+        if connection.vendor == 'postgresql':
+            self.assertIn('every gift was reserved exactly once', output)
+        self.assertFalse(User.objects.filter(email__startswith='bench-').exists())
+
+
+class TestPositions(unittest.TestCase):
+    def test_key_between_orders_keys(self):
+        first = key_between(None, None)
+        last = key_between(first, None)
+        middle = key_between(first, last)
+        before = key_between(None, first)
+
+        self.assertEqual(sorted([last, middle, before, first]), [before, first, middle, last])
+
+    def test_repeated_inserts_stay_ordered(self):
+        keys = [key_between(None, None)]
+        for index in range(500):
+            slot = (index * 7) % (len(keys) + 1)
+            after = keys[slot - 1] if slot else None
+            before = keys[slot] if slot < len(keys) else None
+            keys.insert(slot, key_between(after, before))
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(len(set(keys)), len(keys))
+
+    def test_appends_stay_short(self):
+        keys = list(keys_after(None, 10000))
+        self.assertEqual(keys, sorted(keys))
+        self.assertLessEqual(max(len(key) for key in keys), 4)
+
+    def test_invalid_bounds_raise(self):
+        with self.assertRaises(InvalidPosition):
+            key_between('a5', 'a1')
+        with self.assertRaises(InvalidPosition):
+            key_between('a1', 'a1')
+
+
+class TestReorderGifts(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser', password='testpass')
+        self.wishlist = Wishlist.objects.create(name='Test Wishlist', user=self.user)
+        self.gifts = [Gift.objects.create(user=self.user, name=f'Gift {i}') for i in range(4)]
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[gift.id for gift in self.gifts])
+
+    def ordered_ids(self):
+        return list(WishlistGift.objects.filter(wishlist=self.wishlist).values_list('gift_id', flat=True))
+
+    def test_reorder_writes_one_row(self):
+        a, b, c, d = (gift.id for gift in self.gifts)
+        before = dict(WishlistGift.objects.values_list('gift_id', 'position'))
+
+        # Один SELECT ... FOR UPDATE позиций соседей, один UPDATE и версия
+        # вишлиста, внутри savepoint.
+        with self.assertNumQueries(5):
+            reorder_gift_in_wishlist(user=self.user, wishlist=self.wishlist, gift_id=d, after_gift_id=a, before_gift_id=b)
+
+        after = dict(WishlistGift.objects.values_list('gift_id', 'position'))
+        self.assertEqual([gift_id for gift_id in before if before[gift_id] != after[gift_id]], [d])
+        self.assertEqual(self.ordered_ids(), [a, d, b, c])
+
+    def test_reorder_to_start_and_end(self):
+        a, b, c, d = (gift.id for gift in self.gifts)
+        reorder_gift_in_wishlist(user=self.user, wishlist=self.wishlist, gift_id=c, before_gift_id=a)
+        reorder_gift_in_wishlist(user=self.user, wishlist=self.wishlist, gift_id=a)
+        self.assertEqual(self.ordered_ids(), [c, b, d, a])
+
+    def test_equal_keys_are_rebalanced(self):
+        a, b, c, d = (gift.id for gift in self.gifts)
+        WishlistGift.objects.filter(gift_id__in=[a, b]).update(position='a0')
+
+        reorder_gift_in_wishlist(user=self.user, wishlist=self.wishlist, gift_id=d, after_gift_id=a, before_gift_id=b)
+
+        self.assertEqual(self.ordered_ids(), [a, d, b, c])
+
+    def test_failed_rebalance_is_retried_once(self):
+        a, b, c, d = (gift.id for gift in self.gifts)
+        WishlistGift.objects.filter(gift_id__in=[a, b]).update(position='a0')
+
+        with patch('wishlists.services.rebalance_wishlist') as rebalance:
+            with self.assertRaises(InvalidPosition):
+                reorder_gift_in_wishlist(
+                    user=self.user, wishlist=self.wishlist, gift_id=d, after_gift_id=a, before_gift_id=b
+                )
+
+        rebalance.assert_called_once_with(self.wishlist.pk)
+
+    def test_neighbour_outside_wishlist_is_not_found(self):
+        other = Gift.objects.create(user=self.user, name='Elsewhere')
+        with self.assertRaises(NotFound):
+            reorder_gift_in_wishlist(
+                user=self.user, wishlist=self.wishlist, gift_id=self.gifts[0].id, after_gift_id=other.id
+            )
+
+    def test_rebalance_command_shortens_long_keys(self):
+        a, b, c, d = (gift.id for gift in self.gifts)
+        WishlistGift.objects.filter(gift_id=b).update(position='a0' + 'V' * 40)
+        out = io.StringIO()
+
+        call_command('rebalance_positions', stdout=out)
+
+        self.assertIn('1 wishlists rebalanced', out.getvalue())
+        self.assertEqual(self.ordered_ids(), [a, b, c, d])
+        self.assertEqual(
+            list(WishlistGift.objects.values_list('position', flat=True)), ['a0', 'a1', 'a2', 'a3']
+        )
+
+
+class TestSingleFlightCache(unittest.TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_misses_build_once(self):
+        calls = []
+        started = threading.Barrier(8)
+
+        def build():
+            calls.append(1)
+            time.sleep(0.1)
+            return b'{"name": "Birthday"}'
+
+        def fetch(results):
+            started.wait()
+            results.append(get_or_build('share:test:1', build, timeout=60, lock_timeout=5, wait=2))
+
+        results = []
+        threads = [threading.Thread(target=fetch, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, [b'{"name": "Birthday"}'] * 8)
+
+    def test_waiter_builds_when_lock_holder_never_delivers(self):
+        cache.add('share:test:2:lock', 1, 5)
+        value = get_or_build('share:test:2', lambda: None, timeout=60, lock_timeout=5, wait=0.1)
+        self.assertIsNone(value)
+        # None is cached too.
+        self.assertEqual(get_or_build('share:test:2', lambda: 'rebuilt', timeout=60, lock_timeout=5, wait=0.1), None)
+
+
+class TestLiveHub(unittest.TestCase):
+    def test_fan_out_and_slow_client_resync(self):
+        async def scenario():
+            hub = Hub(LocalBroker(), queue_size=2)
+            fast, slow = hub.subscribe('wishlist:1'), hub.subscribe('wishlist:1')
+            other = hub.subscribe('wishlist:2')
+            for i in range(3):
+                hub.dispatch('wishlist:1', {'event': 'gift', 'data': {'n': i}})
+                if i < 2:
+                    self.assertEqual((await fast.get())['data'], {'n': i})
+            self.assertEqual(await fast.get(), {'event': 'gift', 'data': {'n': 2}})
+            # Медленный клиент не читал: очередь заменена одним resync.
+            self.assertEqual(await slow.get(), RESYNC)
+            self.assertTrue(slow.queue.empty())
+            self.assertEqual(slow.dropped, 3)
+            self.assertTrue(other.queue.empty())
+
+            for subscription in (fast, slow, other):
+                subscription.close()
+            self.assertEqual((hub.connections, hub.channels), (0, {}))
+
+        asyncio.run(scenario())
+
+    def test_dispatch_from_another_thread(self):
+        async def scenario():
+            hub = Hub(LocalBroker(), queue_size=10)
+            subscription = hub.subscribe('wishlist:1')
+            thread = threading.Thread(target=hub.dispatch_threadsafe, args=('wishlist:1', {'event': 'x', 'data': {}}))
+            thread.start()
+            thread.join()
+            self.assertEqual(await asyncio.wait_for(subscription.get(), 1), {'event': 'x', 'data': {}})
+
+        asyncio.run(scenario())
+
+    def test_new_loop_cancels_previous_listener(self):
+        class Broker(LocalBroker):
+            async def listen(self, hub):
+                await asyncio.Event().wait()
+
+        hub = Hub(Broker(), queue_size=10)
+
+        async def subscribe():
+            return hub.subscribe('wishlist:1')
+
+        old = asyncio.new_event_loop()
+        thread = threading.Thread(target=old.run_forever)
+        thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(subscribe(), old).result(1)
+            listener = hub._listener
+            # Подписка из другого цикла заводит новый listener, старый отменяется.
+            asyncio.run(subscribe())
+            asyncio.run_coroutine_threadsafe(asyncio.wait([listener], timeout=1), old).result(2)
+            self.assertTrue(listener.cancelled())
+        finally:
+            old.call_soon_threadsafe(old.stop)
+            thread.join()
+            old.close()
+
+
+class TestWishlistSummary(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser', password='testpass')
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+        self.other = Wishlist.objects.create(name='Wedding', user=self.user)
+        self.book = Gift.objects.create(user=self.user, name='Book', cost=Decimal('15.00'))
+        self.bike = Gift.objects.create(user=self.user, name='Bike', cost=Decimal('300.00'), status=Gift.Status.RESERVED)
+        self.card = Gift.objects.create(user=self.user, name='Card')
+
+    def summary(self, wishlist):
+        return tuple(Wishlist.objects.filter(pk=wishlist.pk).values_list(*SUMMARY_FIELDS).get())
+
+    def assertConsistent(self):
+        # Пересчёт с нуля не должен найти расхождений.
+        self.assertEqual(reconcile_summaries(Wishlist.objects.values_list('pk', flat=True), dry_run=True), [])
+
+    def test_membership_services(self):
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[self.book.id, self.bike.id, self.card.id])
+        self.assertEqual(self.summary(self.wishlist), (3, Decimal('315.00'), 1))
+
+        remove_gift_from_wishlist(user=self.user, wishlist=self.wishlist, gift_id=self.book.id)
+        self.assertEqual(self.summary(self.wishlist), (2, Decimal('300.00'), 1))
+
+        move_gift_between_wishlists(user=self.user, wishlist=self.wishlist, gift_id=self.bike.id, target_wishlist_id=self.other.id)
+        self.assertEqual(self.summary(self.wishlist), (1, Decimal('0.00'), 0))
+        self.assertEqual(self.summary(self.other), (1, Decimal('300.00'), 1))
+
+        create_and_add_gift_to_wishlist(user=self.user, wishlist=self.other, gift_data={'name': 'Lamp', 'cost': Decimal('7.50')})
+        self.assertEqual(self.summary(self.other), (2, Decimal('307.50'), 1))
+        self.assertConsistent()
+
+    def test_gift_changes(self):
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[self.book.id, self.bike.id])
+        add_gifts_to_wishlist(user=self.user, wishlist=self.other, gift_ids=[self.book.id])
+
+        unreserve_gift(user=self.user, gift_id=self.bike.id)
+        reserve_gift(user=self.user, gift_id=self.book.id)
+        self.assertEqual(self.summary(self.wishlist), (2, Decimal('315.00'), 1))
+        self.assertEqual(self.summary(self.other), (1, Decimal('15.00'), 1))
+
+        book = Gift.objects.get(pk=self.book.pk)
+        book.cost = Decimal('20.00')
+        book.save()
+        bulk_update_gifts(user=self.user, changes=[(self.bike.id, {'cost': None}), (self.book.id, {'name': 'Novel'})])
+        self.assertEqual(self.summary(self.wishlist), (2, Decimal('20.00'), 1))
+        self.assertEqual(self.summary(self.other), (1, Decimal('20.00'), 1))
+        self.assertConsistent()
+
+        bulk_delete_gifts(user=self.user, gift_ids=[self.book.id])
+        self.assertEqual(self.summary(self.wishlist), (1, Decimal('0.00'), 0))
+        self.assertEqual(self.summary(self.other), (0, Decimal('0.00'), 0))
+        self.assertConsistent()
+
+    def test_failed_listener_undoes_reservation(self):
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[self.book.id])
+
+        def fail(**kwargs):
+            raise RuntimeError('listener failed')
+
+        # Резервация и пересчёт сводки — одна транзакция: упал слушатель — откатилось всё.
+        gifts_changed.connect(fail)
+        try:
+            with self.assertRaises(RuntimeError):
+                reserve_gift(user=self.user, gift_id=self.book.id)
+        finally:
+            gifts_changed.disconnect(fail)
+        self.assertEqual(Gift.objects.get(pk=self.book.pk).status, Gift.Status.AVAILABLE)
+        self.assertEqual(self.summary(self.wishlist), (1, Decimal('15.00'), 0))
+        self.assertConsistent()
+
+    def test_import_counts_memberships(self):
+        import_gifts(user=self.user, rows=[
+            ParsedRow(line=1, data={'name': 'Lamp', 'cost': '10.00', 'wishlists': ['Birthday', 'Travel']}),
+            ParsedRow(line=2, data={'name': 'Tent', 'cost': '90.00', 'wishlists': ['Birthday']}),
+        ])
+        self.assertEqual(self.summary(self.wishlist), (2, Decimal('100.00'), 0))
+        self.assertEqual(self.summary(Wishlist.objects.get(name='Travel')), (1, Decimal('10.00'), 0))
+        self.assertConsistent()
+
+    def test_reconcile_command_repairs_drift(self):
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[self.book.id, self.bike.id])
+        Wishlist.objects.filter(pk=self.wishlist.pk).update(gift_count=7, reserved_count=-1)
+        version = Wishlist.objects.get(pk=self.wishlist.pk).version
+
+        out = io.StringIO()
+        call_command('reconcile_wishlist_summaries', dry_run=True, stdout=out)
+        self.assertIn(f"wishlist {self.wishlist.pk}: drifted", out.getvalue())
+        self.assertEqual(self.summary(self.wishlist), (7, Decimal('315.00'), -1))
+
+        out = io.StringIO()
+        call_command('reconcile_wishlist_summaries', batch_size=1, stdout=out)
+        self.assertIn("2 wishlists checked, 1 repaired", out.getvalue())
+        self.assertEqual(self.summary(self.wishlist), (2, Decimal('315.00'), 1))
+        self.assertGreater(Wishlist.objects.get(pk=self.wishlist.pk).version, version)
+        self.assertConsistent()
+
+
+class TestCloneWishlist(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser', password='testpass')
+        self.wishlist = Wishlist.objects.create(name='Birthday', user=self.user)
+
+    def fill(self, count):
+        gifts = Gift.objects.bulk_create(
+            Gift(user=self.user, name=f'Gift {i}', cost=Decimal('10.00'), status=Gift.Status.RESERVED)
+            for i in range(count)
+        )
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[gift.id for gift in reversed(gifts)])
+        return gifts
+
+    def listed(self, wishlist):
+        return list(WishlistGift.objects.filter(wishlist=wishlist).values_list('gift__name', 'position'))
+
+    def test_clone_shares_gifts(self):
+        gifts = self.fill(3)
+        clone = clone_wishlist(user=self.user, wishlist=self.wishlist)
+
+        self.assertEqual(clone.name, 'Birthday (copy)')
+        self.assertEqual(self.listed(clone), self.listed(self.wishlist))
+        self.assertEqual(
+            set(WishlistGift.objects.filter(wishlist=clone).values_list('gift_id', flat=True)),
+            {gift.id for gift in gifts},
+        )
+        self.assertEqual((clone.gift_count, clone.total_cost, clone.reserved_count), (3, Decimal('30.00'), 3))
+
+    def test_clone_copies_gifts(self):
+        gifts = self.fill(3)
+        clone = clone_wishlist(user=self.user, wishlist=self.wishlist, name='Next year', copy_gifts=True)
+
+        self.assertEqual(clone.name, 'Next year')
+        self.assertEqual(self.listed(clone), self.listed(self.wishlist))
+        copies = Gift.objects.filter(wishlists=clone)
+        self.assertFalse(copies.filter(id__in=[gift.id for gift in gifts]).exists())
+        self.assertEqual(set(copies.values_list('status', flat=True)), {Gift.Status.AVAILABLE})
+        self.assertEqual(Gift.objects.filter(user=self.user).count(), 6)
+        self.assertEqual((clone.gift_count, clone.total_cost, clone.reserved_count), (3, Decimal('30.00'), 0))
+        # Новые подарки продолжают получать свободные id.
+        self.assertGreater(Gift.objects.create(user=self.user, name='Later').id, max(copies.values_list('id', flat=True)))
+
+    def test_copies_never_reuse_ids(self):
+        self.fill(2)
+        deleted = Gift.objects.create(user=self.user, name='Deleted')
+        deleted_id = deleted.id
+        deleted.delete()
+
+        clone = clone_wishlist(user=self.user, wishlist=self.wishlist, copy_gifts=True)
+
+        # id удалённого подарка не выдаётся повторно.
+        self.assertGreater(min(Gift.objects.filter(wishlists=clone).values_list('id', flat=True)), deleted_id)
+
+    def test_statement_count_does_not_depend_on_size(self):
+        self.fill(2)
+        with CaptureQueriesContext(connection) as small:
+            clone_wishlist(user=self.user, wishlist=self.wishlist, copy_gifts=True)
+        self.fill(50)
+        with CaptureQueriesContext(connection) as large:
+            clone_wishlist(user=self.user, wishlist=self.wishlist, copy_gifts=True)
+        self.assertEqual(len(small), len(large))
+
+    def test_only_owner_can_clone(self):
+        other = User.objects.create_user(email='other', password='testpass')
+        with self.assertRaises(ValidationError):
+            clone_wishlist(user=other, wishlist=self.wishlist)
+
+
+class TestDeletionJobs(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='testuser', password='testpass')
+        self.wishlist = Wishlist.objects.create(name='Huge', user=self.user)
+        self.kept = Wishlist.objects.create(name='Kept', user=self.user)
+        self.gifts = Gift.objects.bulk_create(Gift(user=self.user, name=f'Gift {i}') for i in range(5))
+        add_gifts_to_wishlist(user=self.user, wishlist=self.wishlist, gift_ids=[gift.id for gift in self.gifts])
+        add_gifts_to_wishlist(user=self.user, wishlist=self.kept, gift_ids=[self.gifts[0].id])
+
+    def test_wishlist_deletion_in_batches(self):
+        job = schedule_wishlist_deletion(user=self.user, wishlist=self.wishlist)
+        self.assertTrue(Wishlist.objects.get(pk=self.wishlist.pk).pending_deletion)
+        self.assertEqual(job.totals, {'wishlists.WishlistGift': 5, 'wishlists.Wishlist': 1})
+        # Повторный запрос возвращает ту же задачу.
+        self.assertEqual(schedule_wishlist_deletion(user=self.user, wishlist=self.wishlist).pk, job.pk)
+
+        reports = []
+        job = run_job(claim_next_job(), batch_size=2, pause=0, report=lambda job: reports.append(progress(job)))
+        self.assertEqual(job.state, DeletionJob.State.DONE)
+        self.assertEqual(reports, [2 / 6, 4 / 6, 5 / 6, 1.0])
+        self.assertFalse(Wishlist.objects.filter(pk=self.wishlist.pk).exists())
+        # Подарки и другие вишлисты не затронуты.
+        self.assertEqual(Gift.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(WishlistGift.objects.filter(wishlist=self.kept).count(), 1)
+
+    def test_interrupted_job_is_resumed_when_stale(self):
+        schedule_wishlist_deletion(user=self.user, wishlist=self.wishlist)
+        job = claim_next_job()
+        with patch('wishlists.deletion._delete_batch', side_effect=[2, KeyboardInterrupt]):
+            with self.assertRaises(KeyboardInterrupt):
+                run_job(job, batch_size=2, pause=0)
+        # Упавший воркер оставил задачу в running; пока heartbeat свежий, её никто не берёт.
+        self.assertIsNone(claim_next_job())
+
+        DeletionJob.objects.filter(pk=job.pk).update(heartbeat=timezone.now() - timedelta(hours=1))
+        resumed = claim_next_job()
+        self.assertEqual((resumed.pk, resumed.attempts), (job.pk, 2))
+        self.assertEqual(run_job(resumed, batch_size=2, pause=0).state, DeletionJob.State.DONE)
+        self.assertFalse(WishlistGift.objects.filter(wishlist_id=self.wishlist.pk).exists())
+
+    def test_failed_job_records_error(self):
+        schedule_wishlist_deletion(user=self.user, wishlist=self.wishlist)
+        with patch('wishlists.deletion._delete_batch', side_effect=RuntimeError('boom')):
+            job = run_job(claim_next_job(), pause=0)
+        self.assertEqual(job.state, DeletionJob.State.FAILED)
+        self.assertEqual(DeletionJob.objects.get(pk=job.pk).error, 'RuntimeError: boom')
+
+    def test_user_deletion(self):
+        other = User.objects.create_user(email='other', password='testpass')
+        Gift.objects.create(user=other, name='Not mine')
+        job = schedule_user_deletion(user=self.user)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(Wishlist.objects.filter(user=self.user, pending_deletion=False).count(), 0)
+
+        out = io.StringIO()
+        call_command('run_deletion_jobs', once=True, batch_size=2, pause=0, stdout=out)
+        # 14 rows plus the 13 change records of the user's gifts, wishlists and memberships
+        self.assertIn(f"job {job.pk}: done, 27 rows deleted", out.getvalue())
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(SyncChange.objects.filter(user_id=self.user.pk).exists())
+        self.assertTrue(SyncChange.objects.filter(user_id=other.pk).exists())
+        self.assertFalse(Gift.objects.filter(user_id=self.user.pk).exists())
+        self.assertEqual(Gift.objects.filter(user=other).count(), 1)
+        self.assertEqual(DeletionJob.objects.get(pk=job.pk).state, DeletionJob.State.DONE)
@@ -1,10 +1,17 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import WishlistViewSet
+from .views import DeletionJobView, SharedGiftReservationView, SharedWishlistView, WishlistViewSet
 
 router = DefaultRouter()
 router.register("", WishlistViewSet, basename="wishlist")
 
 urlpatterns = [
+    path("shared/<str:token>/", SharedWishlistView.as_view(), name="shared-wishlist"),
+    path(
+        "shared/<str:token>/gifts/<int:gift_id>/reserve/",
+        SharedGiftReservationView.as_view(),
+        name="shared-gift-reserve",
+    ),
+    path("deletions/<int:pk>/", DeletionJobView.as_view(), name="deletion-job"),
     path("", include(router.urls)),
 ]
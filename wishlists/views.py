@@ -1,34 +1,130 @@
-from rest_framework import viewsets, status
+from pathlib import Path
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Prefetch
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import generics, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
-from .models import Wishlist, WishlistGift
+from rest_framework.permissions import AllowAny, IsAuthenticated, SAFE_METHODS
+from rest_framework.views import APIView
+from bestwishes.asyncviews import AsyncReadMixin
+from bestwishes.cache import get_or_build
+from bestwishes.conditional import ConditionalGetMixin
+from bestwishes.fastread import FastListMixin
+from bestwishes.fieldsets import SparseFieldsetViewMixin
+from .deletion import schedule_wishlist_deletion
+from .sync import changes_since
+from .models import DeletionJob, Wishlist, WishlistGift
 from .serializers import (
     WishlistSerializer,
+    WishlistExpandedSerializer,
     WishlistGiftSerializer,
     CreateGiftForWishlistSerializer,
+    SharedWishlistSerializer,
+    DeletionJobSerializer,
 )
 from gifts.models import Gift
-from wishlists.services import add_gift_to_wishlist, create_and_add_gift_to_wishlist
+from wishlists.services import (
+    add_gift_to_wishlist,
+    add_gifts_to_wishlist,
+    clone_wishlist,
+    create_and_add_gift_to_wishlist,
+    move_gift_between_wishlists,
+    remove_gift_from_wishlist,
+    reorder_gift_in_wishlist,
+    reserve_shared_gift,
+    share_wishlist,
+    unreserve_shared_gift,
+    unshare_wishlist,
+)
+from wishlists.exports import EXPORT_FORMATS, aiter_chunks, export_account
+from wishlists.imports import IMPORT_PARSERS, ImportEncodingError, import_gifts, open_text
 
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(
+    ConditionalGetMixin, SparseFieldsetViewMixin, FastListMixin, AsyncReadMixin, viewsets.ModelViewSet
+):
     queryset = Wishlist.objects.all()
     serializer_class = WishlistSerializer
     permission_classes = [IsAuthenticated]
 
+    expandable = ('gifts',)
+
     def get_queryset(self):
-        return Wishlist.objects.filter(user=self.request.user)
+        queryset = Wishlist.objects.filter(user=self.request.user, pending_deletion=False)
+        if self.expand_gifts:
+            # One query for the memberships of the whole page, gifts joined in.
+            queryset = queryset.prefetch_related(Prefetch(
+                'wishlistgift_set',
+                queryset=WishlistGift.objects.select_related('gift'),
+                to_attr='expanded_memberships',
+            ))
+        return queryset
+
+    def get_serializer_class(self):
+        if self.expand_gifts:
+            return WishlistExpandedSerializer
+        return super().get_serializer_class()
+
+    @property
+    def expand_gifts(self):
+        """Whether a read request asked for '?expand=gifts'."""
+        if self.request.method not in SAFE_METHODS:
+            return False
+        value = self.request.query_params.get('expand')
+        if value is None:
+            return False
+        expand = {name.strip() for name in value.split(',') if name.strip()}
+        unknown = expand - set(self.expandable)
+        if unknown:
+            raise ValidationError({'expand': [f"Unknown expansion(s): {', '.join(sorted(unknown))}."]})
+        return 'gifts' in expand
+
+    def get_list_state_aggregates(self):
+        # Membership rows are part of the representation (the gifts list).
+        state = {
+            'updated': Max('updated_at'),
+            'count': Count('pk', distinct=True),
+            'gifts_updated': Max('wishlistgift__updated_at'),
+            'gifts_count': Count('wishlistgift'),
+        }
+        if self.expand_gifts:
+            state['gift_rows_updated'] = Max('wishlistgift__gift__updated_at')
+        return state
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def destroy(self, request, *args, **kwargs):
+        """
+        With '?mode=background' the wishlist disappears at once and its
+        gifts are detached in batches by a worker; responds 202 with the
+        deletion job to poll.
+        """
+        if request.query_params.get('mode') != 'background':
+            return super().destroy(request, *args, **kwargs)
+        job = schedule_wishlist_deletion(user=request.user, wishlist=self.get_object())
+        return Response(
+            DeletionJobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('deletion-job', args=[job.pk])}
+        )
+
     @action(detail=True, methods=['post'], url_path='gifts')
     def add_gift(self, request, pk=None):
         """
         Add a gift to a wishlist.
-        Expects a POST request with 'gift_id' in the request body.
+        Expects a POST request with 'gift_id' in the request body,
+        or 'gift_ids' (a list) to add many gifts at once.
         """
         wishlist = self.get_object()
+        if 'gift_ids' in request.data:
+            return self._add_gifts(request, wishlist)
         gift_id = request.data.get('gift_id')
 
         if not gift_id:
@@ -36,13 +132,142 @@ class WishlistViewSet(viewsets.ModelViewSet):
                 {'error': 'gift_id is required'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        try:
+            gift_id = int(gift_id)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'gift_id must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         result = add_gift_to_wishlist(
             user=request.user,
             wishlist=wishlist,
-            gift_id=int(gift_id)
+            gift_id=gift_id
+        )
+
+        return Response(WishlistGiftSerializer(result.wishlist_gift, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
+
+    def _add_gifts(self, request, wishlist):
+        gift_ids = request.data.get('gift_ids')
+        if (
+            not isinstance(gift_ids, list)
+            or not gift_ids
+            or not all(isinstance(gift_id, int) for gift_id in gift_ids)
+        ):
+            return Response(
+                {'error': "'gift_ids' must be a non-empty list of integers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(gift_ids) > settings.GIFTS_BULK_MAX_ITEMS:
+            return Response(
+                {'error': f'At most {settings.GIFTS_BULK_MAX_ITEMS} gifts per request.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        result = add_gifts_to_wishlist(user=request.user, wishlist=wishlist, gift_ids=gift_ids)
+        return Response(
+            {
+                'added': result.added,
+                'already_present': result.already_present,
+                'not_found': result.not_found,
+            },
+            status=status.HTTP_200_OK
         )
 
-        return Response(WishlistGiftSerializer(result.wishlist_gift).data, status=status.HTTP_201_CREATED)
+    @action(detail=True, methods=['delete'], url_path=r'gifts/(?P<gift_id>[0-9]+)')
+    def remove_gift(self, request, pk=None, gift_id=None):
+        """
+        Remove a gift from the wishlist.
+        The gift itself is kept.
+        """
+        wishlist = self.get_object()
+        remove_gift_from_wishlist(user=request.user, wishlist=wishlist, gift_id=int(gift_id))
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=True, methods=['post'], url_path=r'gifts/(?P<gift_id>[0-9]+)/move')
+    def move_gift(self, request, pk=None, gift_id=None):
+        """
+        Move a gift to another wishlist of the user.
+        Expects a POST request with 'wishlist_id' (the target) in the request body.
+        """
+        wishlist = self.get_object()
+        target_wishlist_id = request.data.get('wishlist_id')
+        if not isinstance(target_wishlist_id, int):
+            return Response(
+                {'error': 'wishlist_id must be an integer'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        move_gift_between_wishlists(
+            user=request.user,
+            wishlist=wishlist,
+            gift_id=int(gift_id),
+            target_wishlist_id=target_wishlist_id
+        )
+        return Response({'gift_id': int(gift_id), 'wishlist_id': target_wishlist_id}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path=r'gifts/(?P<gift_id>[0-9]+)/reorder')
+    def reorder_gift(self, request, pk=None, gift_id=None):
+        """
+        Move a gift within the wishlist.
+        Expects 'after' and/or 'before' (ids of the neighbouring gifts) in the
+        request body; with neither the gift goes to the end.
+        """
+        wishlist = self.get_object()
+        neighbours = {key: request.data.get(key) for key in ('after', 'before')}
+        if not all(value is None or isinstance(value, int) for value in neighbours.values()):
+            return Response(
+                {'error': "'after' and 'before' must be gift ids or null"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        position = reorder_gift_in_wishlist(
+            user=request.user,
+            wishlist=wishlist,
+            gift_id=int(gift_id),
+            after_gift_id=neighbours['after'],
+            before_gift_id=neighbours['before']
+        )
+        return Response({'gift_id': int(gift_id), 'position': position}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], url_path='clone')
+    def clone(self, request, pk=None):
+        """
+        Copy the wishlist with its gift order.
+        Optional body fields: 'name' (defaults to "<name> (copy)") and
+        'copy_gifts' (true to duplicate the gifts instead of sharing them).
+        """
+        wishlist = self.get_object()
+        name = request.data.get('name')
+        copy_gifts = request.data.get('copy_gifts', False)
+        if name is not None and (not isinstance(name, str) or not name.strip() or len(name) > 255):
+            return Response(
+                {'error': 'name must be a non-empty string of at most 255 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(copy_gifts, bool):
+            return Response(
+                {'error': 'copy_gifts must be a boolean'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        clone = clone_wishlist(user=request.user, wishlist=wishlist, name=name, copy_gifts=copy_gifts)
+        return Response(self.get_serializer(clone).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['post', 'delete'], url_path='share')
+    def share(self, request, pk=None):
+        """
+        POST creates a public read-only link to the wishlist (a new one on
+        every call, the previous link stops working); DELETE revokes it.
+        """
+        wishlist = self.get_object()
+        if request.method == 'DELETE':
+            unshare_wishlist(user=request.user, wishlist=wishlist)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        token = share_wishlist(user=request.user, wishlist=wishlist)
+        url = request.build_absolute_uri(reverse('shared-wishlist', args=[token]))
+        return Response({'token': token, 'url': url}, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'], url_path='gifts/new')
     def create_gift(self, request, pk=None):
@@ -62,4 +287,153 @@ class WishlistViewSet(viewsets.ModelViewSet):
             wishlist=wishlist,
             gift_data=serializer.validated_data
         )
-        return Response(WishlistGiftSerializer(result.wishlist_gift).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        return Response(WishlistGiftSerializer(result.wishlist_gift, context=self.get_serializer_context()).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream all gifts, wishlists and memberships of the user.
+        Query params: 'type' ('ndjson' or 'csv', default 'ndjson'),
+        'gzip' ('1' to compress the download).
+        """
+        export_type = request.query_params.get('type', 'ndjson')
+        export_format = EXPORT_FORMATS.get(export_type)
+        if export_format is None:
+            return Response(
+                {'error': f"type must be one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        compress = request.query_params.get('gzip') in ('1', 'true')
+
+        filename = f'bestwishes-export.{export_format.extension}'
+        content_type = export_format.content_type
+        if compress:
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        content = export_account(user=request.user, export_format=export_format, compress=compress)
+        if isinstance(request._request, ASGIRequest):
+            content = aiter_chunks(content)
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_file(self, request):
+        """
+        Import gifts from an uploaded CSV or NDJSON 'file'.
+        The format is taken from the 'type' field or the file extension.
+        Invalid rows are skipped and listed in the returned report.
+        """
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'error': 'file is required'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        import_type = request.data.get('type') or Path(upload.name).suffix.lstrip('.').lower()
+        parser = IMPORT_PARSERS.get(import_type)
+        if parser is None:
+            return Response(
+                {'error': f"type must be one of: {', '.join(IMPORT_PARSERS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            stream = open_text(upload.file)
+        except ImportEncodingError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        report = import_gifts(user=request.user, rows=parser(stream))
+        return Response(report.as_dict(), status=status.HTTP_200_OK)
+
+
+class DeletionJobView(generics.RetrieveAPIView):
+    """Progress of a background deletion the user requested."""
+    serializer_class = DeletionJobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return DeletionJob.objects.filter(requested_by_id=self.request.user.pk)
+
+
+class SyncView(APIView):
+    """
+    Delta sync: ``GET /sync/?since=<cursor>`` returns the gifts, wishlists and
+    memberships changed since the cursor, tombstones of the deleted ones and
+    the cursor to send next. Start from ``since=0``; while ``has_more`` is
+    true, ask again straight away.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.SYNC_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'since and limit must be integers'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if since < 0 or not 1 <= limit <= settings.SYNC_MAX_PAGE_SIZE:
+            return Response(
+                {'error': f'since must be >= 0 and limit between 1 and {settings.SYNC_MAX_PAGE_SIZE}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response(changes_since(user=request.user, since=since, limit=limit).as_dict())
+
+
+class SharedWishlistView(APIView):
+    """
+    Public read-only view of a shared wishlist, no authentication.
+
+    The rendered body is cached under the share token and the wishlist's
+    ``version``, which every change to the wishlist, its memberships or its
+    gifts bumps (see wishlists.signals), so a hit costs one indexed lookup
+    and stale entries are never served, only left to expire.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request, token):
+        row = Wishlist.objects.filter(share_token=token).values_list('pk', 'version').first()
+        if row is None:
+            raise NotFound('Shared wishlist not found.')
+        wishlist_id, version = row
+
+        etag = f'"{wishlist_id}-{version}"'
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content = get_or_build(
+                f'share:{token}:{version}',
+                lambda: self.render_wishlist(wishlist_id),
+                timeout=settings.SHARE_CACHE_TTL,
+                lock_timeout=settings.SHARE_CACHE_LOCK_TIMEOUT,
+                wait=settings.SHARE_CACHE_WAIT,
+            )
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    @staticmethod
+    def render_wishlist(wishlist_id):
+        wishlist = Wishlist.objects.get(pk=wishlist_id)
+        return JSONRenderer().render(SharedWishlistSerializer(wishlist).data)
+
+
+class SharedGiftReservationView(APIView):
+    """
+    Guests holding a share link reserve (POST) and release (DELETE) gifts of
+    the shared wishlist. Gifts are only found through the token, so without
+    the current link a gift is a 404.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, token, gift_id):
+        reserve_shared_gift(user=request.user, token=token, gift_id=gift_id)
+        return Response({'id': gift_id, 'status': Gift.Status.RESERVED}, status=status.HTTP_200_OK)
+
+    def delete(self, request, token, gift_id):
+        unreserve_shared_gift(user=request.user, token=token, gift_id=gift_id)
+        return Response({'id': gift_id, 'status': Gift.Status.AVAILABLE}, status=status.HTTP_200_OK)
+